@@ -1,7 +1,7 @@
 from dotenv import load_dotenv
 load_dotenv()  # ADK reads GOOGLE_API_KEY from os.environ
 
-from fastapi import FastAPI, UploadFile, Form, Request, Query
+from fastapi import FastAPI, UploadFile, Form, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
@@ -10,24 +10,43 @@ from google.adk.sessions import InMemorySessionService
 from google.genai.types import Content, Part
 from agents.orchestrator import orchestrator
 from core.sse_queue import sse_queue
-from core.database import get_db, ComplaintDB
-from sqlalchemy.orm import Session
+from core.pipeline import StageGraph
+from core.executors import run_blocking, pools, pool_stats, shutdown_pools
+from core.outbox import outbox_dispatcher
+from core.backfill import backfill_worker
+from core.archive import archive_worker, archived_status_history
+from core.unit_of_work import UnitOfWorkFailed, unit_of_work
+from core.directory import directory
+from core.ingest import detect_format, ingest_file
+from core.rollups import dashboard_stats
+from core.upload_store import save_upload, RequestBodyLimit, UploadTooLarge
+from core.phash_index import phash_index, load_phash_index, phash_to_hex
+from core.imaging import ImageVariants, preprocess_upload, variant_url
+from core.geocode_cache import geocode_cache
+from core.outbound import outbound
+from core.memory_store import MemoryStore
+from core.config import settings
+from core.database import (get_async_db, init_db, ComplaintDB, DONE_STATUSES,
+                           async_engine, pool_metrics, async_pool_metrics)
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
 from fastapi.responses import JSONResponse
-from core.redis_client import (redis_client, log_status_change,
-                               get_status_history, get_cached_official_email,
+from core.redis_client import (redis_client, log_status_change, migrate_status_logs,
+                               get_status_history, get_status_histories,
+                               get_cached_official_email,
                                cache_official_email)
-import json, base64, os, logging
+import asyncio, json, base64, os, logging, tempfile
 from typing import Optional
 from datetime import datetime
+from contextlib import asynccontextmanager
 
 # Direct tool imports for fallback pipeline (when Gemini is rate-limited)
-from tools.gemini_tools import gemini_analyze_image
+from tools.gemini_tools import gemini_analyze_image, analysis_cache_stats
 from tools.maps_tools import geocode_address, reverse_geocode
 from tools.directory_tools import search_municipal_directory
-from tools.db_tools import save_complaint
+from tools.db_tools import gen_id, aget_complaint, asave_complaint_with_work_order
 from tools.sse_tools import sse_push_map_update
-from tools.gmail_tools import gmail_send_work_order
 from tools.gemini_tools import gemini_lookup_official_email
 from tools.exif_tools import extract_gps_from_image
 
@@ -43,13 +62,43 @@ logging.basicConfig(
 for _quiet in ("httpcore", "httpx", "urllib3", "google.auth", "google.adk"):
     logging.getLogger(_quiet).setLevel(logging.WARNING)
 
-app = FastAPI(title="CiviqAI Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_blocking("sqlite", init_db)
+    await run_blocking("redis", migrate_status_logs)
+    await run_blocking("sqlite", load_phash_index)
+    await pools["imaging"].warm()
+    await run_blocking("sqlite", geocode_cache.warm_start)
+    await run_blocking("redis", directory.reload)
+    directory.start()
+    outbox_dispatcher.start()
+    backfill_worker.start()
+    if settings.ARCHIVE_ENABLED:
+        archive_worker.start()
+    yield
+    await archive_worker.stop()
+    await backfill_worker.stop()
+    await outbox_dispatcher.stop()
+    outbound.close()
+    await async_engine.dispose()
+    directory.stop()
+    shutdown_pools()
+
+
+app = FastAPI(title="CiviqAI Backend", lifespan=lifespan)
+# Refuse oversized bodies while they stream in, before multipart parsing
+# buffers them (the form fields around the photo get a little headroom)
+app.add_middleware(RequestBodyLimit, limits={
+    "/complaint": settings.UPLOAD_MAX_BYTES + 64 * 1024,
+    "/complaints/bulk": settings.INGEST_MAX_BYTES,
+})
 app.add_middleware(CORSMiddleware, allow_origins=["*"],
-                   allow_methods=["*"], allow_headers=["*"])
+                   allow_methods=["*"], allow_headers=["*"],
+                   expose_headers=["X-Next-Cursor"])
 print(">>> CiviqAI LOADED — deterministic pipeline active <<<", flush=True)
 
-os.makedirs("uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
 session_service = InMemorySessionService()
 runner = Runner(agent=orchestrator, app_name="civiqai",
@@ -63,9 +112,38 @@ def health_check():
     return {"status": "healthy", "service": "civiqai"}
 
 
+# ── Runtime metrics ───────────────────────────────────────────────
+@app.get("/metrics")
+def metrics():
+    """Queue depth, latency and cache counters for the runtime subsystems."""
+    return {
+        "executors": pool_stats(),
+        "db_pool": pool_metrics.stats(),
+        "async_db_pool": async_pool_metrics.stats(),
+        "outbox": outbox_dispatcher.stats(),
+        "backfill": backfill_worker.stats(),
+        "archive": archive_worker.stats(),
+        "gemini_cache": analysis_cache_stats(),
+        "phash_index": phash_index.stats(),
+        "geocode_cache": geocode_cache.stats(),
+        "directory": directory.stats(),
+        "outbound": outbound.stats(),
+        "memory_store": (redis_client.info()
+                         if isinstance(redis_client, MemoryStore) else None),
+    }
+
+
+# ── Dashboard KPI counters (from complaint_rollups) ───────────────
+@app.get("/stats")
+def stats(days: Optional[int] = Query(default=None, ge=1)):
+    """Counts by status / zone / issue type / priority, open P1s and
+    resolution rate — all time, or the last `days` days."""
+    return dashboard_stats(days)
+
+
 # ── Reverse geocode endpoint (for GPS button) ────────────────────
 @app.get("/reverse-geocode")
-def reverse_geocode_endpoint(
+async def reverse_geocode_endpoint(
     lat: float = Query(...), lng: float = Query(...)
 ):
     """Convert GPS coordinates to address + municipality.
@@ -73,7 +151,7 @@ def reverse_geocode_endpoint(
     logger.info("=" * 60)
     logger.info("REVERSE GEOCODE REQUEST: lat=%s  lng=%s", lat, lng)
     try:
-        rev = reverse_geocode(lat, lng)
+        rev = await run_blocking("osm", reverse_geocode, lat, lng)
         logger.info("  Result: municipality=%s  area=%s  formatted=%s",
                     rev.get("municipality"), rev.get("area"),
                     rev.get("formatted_address", "")[:80])
@@ -87,8 +165,8 @@ def reverse_geocode_endpoint(
 
 # ── Status update endpoint ────────────────────────────────────────
 @app.patch("/complaints/{complaint_id}/status")
-def update_status(complaint_id: str, request_body: dict = {},
-                  db: Session = Depends(get_db)):
+async def update_status(complaint_id: str, request_body: dict = {},
+                        db: AsyncSession = Depends(get_async_db)):
     """
     Update a complaint's status.  Accepts JSON body:
       { "status": "open"|"in_progress"|"resolved"|"closed",
@@ -106,9 +184,7 @@ def update_status(complaint_id: str, request_body: dict = {},
             "error": f"Invalid status. Must be one of: {', '.join(sorted(VALID))}"
         })
 
-    complaint = db.query(ComplaintDB).filter(
-        ComplaintDB.id == complaint_id
-    ).first()
+    complaint = await db.get(ComplaintDB, complaint_id)
     if not complaint:
         return JSONResponse(status_code=404, content={
             "error": f"Complaint {complaint_id} not found"
@@ -121,12 +197,13 @@ def update_status(complaint_id: str, request_body: dict = {},
 
     # Update DB
     complaint.status = new_status  # type: ignore[assignment]
-    if new_status == "resolved":
+    if new_status in DONE_STATUSES and old_status not in DONE_STATUSES:
         complaint.resolved_at = datetime.utcnow()  # type: ignore[assignment]
-    db.commit()
+    await db.commit()
 
     # Log to Redis
-    log_entry = log_status_change(
+    log_entry = await run_blocking(
+        "redis", log_status_change,
         complaint_id, old_status, new_status, changed_by
     )
 
@@ -157,11 +234,60 @@ def update_status(complaint_id: str, request_body: dict = {},
 # ── Status history endpoint ───────────────────────────────────────
 @app.get("/complaints/{complaint_id}/history")
 def get_complaint_history(complaint_id: str):
-    """Get full status change log for a complaint from Redis."""
-    history = get_status_history(complaint_id)
+    """Get full status change log for a complaint from Redis (or from
+    the archive, once the complaint has been archived)."""
+    history = (get_status_history(complaint_id)
+               or archived_status_history(complaint_id))
     return {"complaint_id": complaint_id, "history": history}
 
 
+_MAX_HISTORY_IDS = 500     # keeps the query string well under URL limits
+
+
+@app.get("/status-histories")
+def get_status_histories_batch(ids: str = Query(..., description="comma-separated complaint ids")):
+    """Status logs for many live complaints in one pipelined Redis round
+    trip (dashboard tables); archived complaints come back empty."""
+    complaint_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if len(complaint_ids) > _MAX_HISTORY_IDS:
+        return JSONResponse(status_code=400, content={
+            "error": f"At most {_MAX_HISTORY_IDS} ids per request"})
+    return get_status_histories(complaint_ids)
+
+
+# ── Bulk ingestion (historical complaints from other systems) ─────
+@app.post("/complaints/bulk")
+async def bulk_ingest(request: Request,
+                      format: Optional[str] = Query(None, pattern="^(ndjson|csv|json)$")):
+    """Load many complaints from an NDJSON, CSV or JSON request body.
+
+    The format comes from ?format= or the Content-Type header.  Rows are
+    validated and inserted in batches; geocoding and classification of
+    incomplete rows run later in the backfill worker.  Returns counts
+    plus the first rejected rows with their line numbers."""
+    fmt = format or detect_format(None, request.headers.get("content-type"))
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.UPLOAD_CHUNK_BYTES * 8)
+    try:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.INGEST_MAX_BYTES:
+                return JSONResponse(status_code=413, content={
+                    "error": f"Body exceeds the {settings.INGEST_MAX_BYTES // (1024 * 1024)} MB limit"})
+            spool.write(chunk)
+        spool.seek(0)
+        try:
+            report = await run_blocking("sqlite", ingest_file, spool, fmt)
+        except ValueError as e:             # undecodable body, malformed JSON document
+            return JSONResponse(status_code=400, content={"error": str(e)[:200]})
+    finally:
+        spool.close()
+
+    if report.backfill_queued:
+        backfill_worker.notify()
+    return report.as_dict()
+
+
 # ── Citizen submits complaint with photo ──────────────────────────
 @app.post("/complaint")
 async def submit_complaint(
@@ -178,57 +304,71 @@ async def submit_complaint(
     if lat and lng:
         logger.info("GPS coordinates provided: lat=%s  lng=%s", lat, lng)
     
-    image_bytes = await image.read()
-    img_path = f"uploads/{image.filename}"
-    with open(img_path, "wb") as f:
-        f.write(image_bytes)
+    try:
+        stored = await save_upload(image)
+    except UploadTooLarge as e:
+        logger.warning("Upload rejected: %s", e)
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    img_path = stored.path
     logger.info("Image saved to: %s", img_path)
 
-    # ── Extract GPS from image EXIF metadata if not provided ──────
+    # ── Preprocess (variants + dHash) while reading EXIF GPS ──────
+    # Variants are re-encoded without EXIF, so GPS comes from the original.
+    preprocessing = asyncio.create_task(preprocess_upload(img_path))
     if not (lat and lng):
         logger.info("No GPS from form — trying EXIF metadata...")
-        exif_gps = extract_gps_from_image(img_path)
+        exif_gps = await run_blocking("files", extract_gps_from_image, img_path)
         if exif_gps:
             lat = exif_gps["lat"]
             lng = exif_gps["lng"]
             logger.info("  ✓ EXIF GPS: lat=%s  lng=%s", lat, lng)
         else:
             logger.info("  No EXIF GPS found in image")
+    variants = await preprocessing
 
-    # If still no location text, derive from coordinates
-    if not location and lat and lng:
-        try:
-            rev = reverse_geocode(lat, lng)
-            location = rev.get("formatted_address") or rev.get("area") or f"{lat}, {lng}"
-            logger.info("  Location from EXIF reverse-geocode: %s", location)
-        except Exception:
-            location = f"{lat}, {lng}"
-    elif not location:
+    # Without location text the pipeline's reverse-geocode stage supplies
+    # the formatted address, so no separate lookup is needed here.
+    if not location and not (lat and lng):
         location = "Unknown location"
 
     # Always use deterministic 7-step pipeline for complaint submissions.
     # The ADK orchestrator is unreliable here — the LLM often stops after
     # just 1 agent step.  ADK is still used for /chat where reasoning matters.
     return await _complaint_pipeline(img_path, location, citizen_email,
-                                     gps_lat=lat, gps_lng=lng)
+                                     gps_lat=lat, gps_lng=lng,
+                                     image_url=stored.url,
+                                     image_sha256=stored.sha256,
+                                     variants=variants)
 
 
 # ── Deterministic complaint pipeline ──────────────────────────────
-async def _complaint_pipeline(img_path: str, location: str,
+async def _complaint_pipeline(img_path: str, location: str | None,
                                citizen_email: str | None,
                                gps_lat: Optional[float] = None,
-                               gps_lng: Optional[float] = None):
+                               gps_lng: Optional[float] = None,
+                               image_url: Optional[str] = None,
+                               image_sha256: Optional[str] = None,
+                               variants: Optional[ImageVariants] = None):
     """
     Process a civic complaint through 7 deterministic steps.
     Calls tools directly for reliability (no LLM orchestration drift).
 
-    FLOW:
+    The steps run as a dependency graph; every blocking tool call runs
+    off the event loop, and independent branches overlap:
+
+      1. Image analysis  ─────────────┬──► 4. Directory ──► official email ─┐
+      2/3. Geocode → reverse geocode ─┴─────────────────────────────────────┴─► 5/6. Save ──► 7. SSE
+
+    A near-duplicate check (perceptual hash within PHASH_RADIUS_M and
+    PHASH_WINDOW_DAYS) runs first when GPS is known; a match reuses the
+    original's analysis and officer and attaches to its work order.
+
       1. Image analysis  (Gemini Vision — gracefully degrades)
       2. Geocode         (Nominatim / OSM — use GPS coords if provided)
       3. Reverse geocode (get ward/zone/municipality)
-      4. Directory lookup (find responsible officer + email from Redis)
-      5. Save to DB      (SQLite)
-      6. Email dispatch  (send work order to municipality)
+      4. Directory lookup (responsible officer + email, in-process index)
+      5. Save to DB      (SQLite — complaint + pending work order, one commit)
+      6. Email dispatch  (queued; core/outbox.py sends it in the background)
       7. SSE push        (notify dashboard)
     """
     logger.info("-" * 60)
@@ -236,103 +376,305 @@ async def _complaint_pipeline(img_path: str, location: str,
     logger.info("  img_path=%s  location=%s  gps=(%s, %s)",
                 img_path, location, gps_lat, gps_lng)
 
+    location_hint = location or f"{gps_lat}, {gps_lng}"
+    image_url = image_url or img_path.replace(os.sep, "/")
+    variants = variants or ImageVariants(mime="application/octet-stream")
+    image_phash = variants.phash
+    graph = StageGraph()
+
+    # ── Steps 2–3 — Geocode, then reverse geocode for ward/zone ───
+    @graph.stage("location")
+    async def location_stage(_):
+        logger.info("Step 2/7: Geocoding...")
+        lat, lng, formatted = gps_lat, gps_lng, location_hint
+        if lat and lng:
+            logger.info("  Using GPS coordinates directly: (%s, %s)", lat, lng)
+        else:
+            try:
+                geo = await run_blocking("osm", geocode_address, location_hint)
+                lat = geo.get("lat")
+                lng = geo.get("lng")
+                formatted = geo.get("formatted", location_hint)
+                logger.info("  Geocoded '%s' → (%s, %s)", location_hint, lat, lng)
+            except Exception as ge:
+                logger.warning("  Geocoding failed: %s", ge)
+
+        ward, zone, municipality = "Unknown", "Unknown", "unknown"
+        if lat and lng:
+            logger.info("Step 3/7: Reverse geocoding (%s, %s)...", lat, lng)
+            try:
+                rev_data = await run_blocking("osm", reverse_geocode, lat, lng)
+                ward         = rev_data.get("ward", "Unknown")
+                zone         = rev_data.get("zone", "Unknown")
+                municipality = rev_data.get("municipality", "unknown")
+                if rev_data.get("formatted_address"):
+                    formatted = rev_data["formatted_address"]
+                logger.info("  → Ward=%s  Zone=%s  Municipality=%s",
+                            ward, zone, municipality)
+            except Exception as re_:
+                logger.warning("  Reverse geocode failed: %s", re_)
+        else:
+            logger.info("Step 3/7: Skipped (no coordinates)")
+        return {"lat": lat, "lng": lng, "formatted": formatted,
+                "ward": ward, "zone": zone, "municipality": municipality}
+
+    # ── Near-duplicate check (perceptual hash, radius + time window) ─
+    # With GPS known up front this runs before image analysis, so a
+    # duplicate photo never reaches Gemini; otherwise it waits for the
+    # geocoding branch and only saves the work-order email.
+    have_gps = bool(gps_lat and gps_lng)
+
+    @graph.stage("duplicate", *(() if have_gps else ("location",)))
+    async def duplicate_stage(deps):
+        lat, lng = ((gps_lat, gps_lng) if have_gps else
+                    (deps["location"]["lat"], deps["location"]["lng"]))
+        if image_phash is None or not (lat and lng):
+            return None
+        matches = phash_index.nearest(image_phash, lat, lng)
+        if not matches and await run_blocking("sqlite", phash_index.load_near, lat, lng):
+            # another worker saved photos here since this one warmed up
+            matches = phash_index.nearest(image_phash, lat, lng)
+        for match in matches:
+            original = await aget_complaint(match["complaint_id"])
+            if original.get("duplicate_of"):
+                original = await aget_complaint(original["duplicate_of"])
+            if "error" in original or original["status"] in ("resolved", "closed"):
+                continue
+            logger.info("  ✓ Near-duplicate of #%s (hamming=%d, %.0fm away)",
+                        original["id"], match["hamming"], match["distance_m"])
+            return original
+        return None
+
     # ── Step 1 — Image analysis (try Gemini, gracefully degrade) ──
-    logger.info("Step 1/7: Image analysis (may degrade)...")
-    analysis = gemini_analyze_image(img_path, location)
-    issue_type  = analysis.get("issue_type", "other")
-    severity    = analysis.get("severity", "moderate")
-    description = analysis.get("description", "Civic issue reported by citizen")
-    logger.info("  Result: issue=%s  severity=%s  desc=%s",
-                issue_type, severity, description[:80])
-
-    # ── Step 2 — Geocode location (Google Maps, NOT Gemini) ───────
-    logger.info("Step 2/7: Geocoding...")
-    lat, lng, formatted = gps_lat, gps_lng, location
-    if lat and lng:
-        logger.info("  Using GPS coordinates directly: (%s, %s)", lat, lng)
-    else:
-        try:
-            geo = geocode_address(location)
-            lat = geo.get("lat")
-            lng = geo.get("lng")
-            formatted = geo.get("formatted", location)
-            logger.info("  Geocoded '%s' → (%s, %s)", location, lat, lng)
-        except Exception as ge:
-            logger.warning("  Geocoding failed: %s", ge)
-
-    # ── Step 3 — Reverse geocode for ward/zone/municipality ───────
-    ward, zone, municipality = "Unknown", "Unknown", "unknown"
-    rev_data = {}
-    if lat and lng:
-        logger.info("Step 3/7: Reverse geocoding (%s, %s)...", lat, lng)
+    @graph.stage("analysis", *(("duplicate",) if have_gps else ()))
+    async def analysis_stage(deps):
+        original = deps.get("duplicate")
+        if original:
+            logger.info("Step 1/7: Reusing analysis of #%s", original["id"])
+            return {
+                "issue_type":  original["issue_type"],
+                "severity":    original["severity"] or "moderate",
+                "description": original["description"]
+                               or "Civic issue reported by citizen",
+            }
+        logger.info("Step 1/7: Image analysis (may degrade)...")
+        analysis = await run_blocking("gemini", gemini_analyze_image,
+                                      variants.path("analysis", img_path),
+                                      location_hint, variants.mime_for_variants)
+        result = {
+            "issue_type":  analysis.get("issue_type", "other"),
+            "severity":    analysis.get("severity", "moderate"),
+            "description": analysis.get("description",
+                                        "Civic issue reported by citizen"),
+        }
+        logger.info("  Result: issue=%s  severity=%s  desc=%s",
+                    result["issue_type"], result["severity"],
+                    result["description"][:80])
+        return result
+
+    # ── Step 4 — Municipal directory lookup (in-process index) ────
+    @graph.stage("directory", "analysis", "location", "duplicate")
+    async def directory_stage(deps):
+        original = deps["duplicate"]
+        if original:
+            logger.info("Step 4/7: Using officer already assigned to #%s",
+                        original["id"])
+            return {
+                "officer_name": original["officer_name"] or "Duty Officer",
+                "email": original["dept_email"] or "complaints@chennaicorporation.gov.in",
+                "department": original["department"] or "Greater Chennai Corporation",
+            }
+        issue_type   = deps["analysis"]["issue_type"]
+        ward         = deps["location"]["ward"]
+        municipality = deps["location"]["municipality"]
+        logger.info("Step 4/7: Looking up responsible officer for '%s' / '%s'...",
+                    municipality, issue_type)
         try:
-            rev_data = reverse_geocode(lat, lng)
-            ward         = rev_data.get("ward", "Unknown")
-            zone         = rev_data.get("zone", "Unknown")
-            municipality = rev_data.get("municipality", "unknown")
-            if rev_data.get("formatted_address"):
-                formatted = rev_data["formatted_address"]
-            logger.info("  → Ward=%s  Zone=%s  Municipality=%s",
-                        ward, zone, municipality)
-        except Exception as re_:
-            logger.warning("  Reverse geocode failed: %s", re_)
-    else:
-        logger.info("Step 3/7: Skipped (no coordinates)")
+            # In-process index — no Redis round trip, so no executor hop
+            officer = search_municipal_directory(
+                ward=ward, issue_type=issue_type, municipality=municipality,
+                zone=deps["location"]["zone"]
+            )
+        except Exception as de:
+            logger.warning("  Directory lookup failed: %s", de)
+            officer = {
+                "officer_name": "Duty Officer",
+                "email": "complaints@chennaicorporation.gov.in",
+                "department": "Greater Chennai Corporation",
+                "municipality": "Greater Chennai Corporation",
+            }
+        logger.info("  → Officer: %s  Email: %s  Municipality: %s",
+                    officer.get("officer_name"),
+                    officer.get("email", "complaints@chennaicorporation.gov.in"),
+                    officer.get("municipality", officer.get("department", "Unknown")))
+        return officer
 
-    # ── Step 4 — Municipal directory lookup (Redis) ───────────────
-    logger.info("Step 4/7: Looking up responsible officer for '%s' / '%s'...",
-                municipality, issue_type)
-    officer = {}
-    try:
-        officer = search_municipal_directory(
-            ward=ward, issue_type=issue_type, municipality=municipality
-        )
-    except Exception as de:
-        logger.warning("  Directory lookup failed: %s", de)
-        officer = {
-            "officer_name": "Duty Officer",
-            "email": "complaints@chennaicorporation.gov.in",
-            "department": "Greater Chennai Corporation",
-            "municipality": "Greater Chennai Corporation",
+    # -- Fetch official corporation email via Google Search ----------
+    @graph.stage("official_email", "directory", "location", "duplicate")
+    async def official_email_stage(deps):
+        if deps["duplicate"]:
+            return None
+        officer  = deps["directory"]
+        muni_key = officer.get("ward", deps["location"]["municipality"] or "")
+        muni_name = officer.get("municipality", officer.get("department", "Unknown"))
+        official_email = None
+        if muni_key:
+            official_email = await run_blocking("redis", get_cached_official_email, muni_key)
+            if official_email:
+                logger.info("  → Official email (cached): %s", official_email)
+            else:
+                logger.info("  → Searching Google for official email of '%s'...", muni_name)
+                official_email = await run_blocking(
+                    "gemini", gemini_lookup_official_email, muni_name)
+                if official_email:
+                    await run_blocking("redis", cache_official_email,
+                                       muni_key, official_email)
+        if not official_email:
+            logger.info("  → No official email found; sending to officer only")
+        return official_email
+
+    # ── Steps 5–6 — Save complaint + queue work order (outbox) ────
+    # The complaint and its pending work-order email commit together;
+    # the outbox dispatcher sends the email in the background so Gmail
+    # latency never lands on the citizen's response.
+    @graph.stage("save", "analysis", "location", "directory",
+                 "official_email", "duplicate")
+    async def save_stage(deps):
+        a, loc, officer = deps["analysis"], deps["location"], deps["directory"]
+        official_email, original = deps["official_email"], deps["duplicate"]
+        muni_email = officer.get("email", "complaints@chennaicorporation.gov.in")
+        muni_name  = officer.get("municipality", officer.get("department", "Unknown"))
+        logger.info("Step 5/7: Saving complaint to database...")
+        cid = gen_id("CIV")
+        complaint = {
+            "id": cid,
+            "issue_type": a["issue_type"],
+            "description": a["description"],
+            "location_text": loc["formatted"],
+            "lat": loc["lat"], "lng": loc["lng"],
+            "ward": loc["ward"], "zone": loc["zone"],
+            "severity": a["severity"],
+            "citizen_email": citizen_email,
+            "image_url": image_url,
+            "thumbnail_url": variant_url(image_url, "thumb") if "thumb" in variants.paths else None,
+            "image_sha256": image_sha256,
+            "image_phash": phash_to_hex(image_phash) if image_phash is not None else None,
         }
+        work_order = None
+        if original:
+            # Attach to the existing complaint — no new work order
+            complaint.update(
+                duplicate_of=original["id"],
+                status=original["status"],
+                work_order_id=original["work_order_id"],
+                department=original["department"],
+                dept_email=original["dept_email"],
+                officer_name=original["officer_name"],
+            )
+        else:
+            subject, html_body = _work_order_email(
+                cid, a, loc, officer, official_email, citizen_email)
+            work_order = {
+                "department": officer.get("department"),
+                "dept_email": muni_email,
+                "officer_name": officer.get("officer_name"),
+                "subject": subject,
+                "email_body": html_body,
+                "cc_email": official_email,
+                "image_path": variants.path("email", img_path),
+            }
+        result = await asave_complaint_with_work_order(
+            complaint=complaint, work_order=work_order,
+        )
+        if result.get("status") != "saved":
+            logger.error("  → ❌ Save failed: %s", result.get("error"))
+            return {"complaint_id": "unknown", "email_status": "failed"}
+        logger.info("  → Saved as complaint #%s", cid)
+        if image_phash is not None and loc["lat"] and loc["lng"]:
+            phash_index.add(cid, image_phash, loc["lat"], loc["lng"])
+
+        if original:
+            logger.info("Step 6/7: Skipped — attached to #%s (work order %s)",
+                        original["id"], original["work_order_id"])
+            return {"complaint_id": cid, "email_status": "attached"}
+        logger.info("Step 6/7: Work order %s queued for %s (%s)",
+                    result["work_order_id"], muni_name, muni_email)
+        outbox_dispatcher.notify()
+        return {"complaint_id": cid, "email_status": "queued"}
+
+    # ── Step 7 — Push SSE update to dashboard ─────────────────────
+    @graph.stage("sse", "save", "analysis", "location")
+    async def sse_stage(deps):
+        logger.info("Step 7/7: Pushing SSE update to dashboard...")
+        try:
+            sse_push_map_update(
+                event_type="new_pin",
+                complaint_id=deps["save"]["complaint_id"],
+                lat=deps["location"]["lat"], lng=deps["location"]["lng"],
+                status="open",
+                issue_type=deps["analysis"]["issue_type"]
+            )
+            logger.info("  → SSE push sent")
+        except Exception:
+            logger.warning("  → SSE push skipped (no listeners)")
+
+    results = await graph.run()
+    a, loc, officer = results["analysis"], results["location"], results["directory"]
+    cid = results["save"]["complaint_id"]
+    email_status = results["save"]["email_status"]
+    official_email = results["official_email"]
+    issue_type, severity, description = a["issue_type"], a["severity"], a["description"]
+    formatted = loc["formatted"]
     muni_email = officer.get("email", "complaints@chennaicorporation.gov.in")
     muni_name  = officer.get("municipality", officer.get("department", "Unknown"))
-    logger.info("  → Officer: %s  Email: %s  Municipality: %s",
-                officer.get("officer_name"), muni_email, muni_name)
-
-    # ── Step 5 — Save complaint to database (SQLite) ──────────────
-    logger.info("Step 5/7: Saving complaint to database...")
-    result = save_complaint(
-        issue_type=issue_type,
-        description=description,
-        location_text=formatted,
-        lat=lat, lng=lng,
-        ward=ward, zone=zone,
-        severity=severity,
-        citizen_email=citizen_email,
-        image_url=f"uploads/{os.path.basename(img_path)}"
+
+    # ── Summary ───────────────────────────────────────────────────
+    original = results["duplicate"]
+    if original:
+        email_line = (f"📎 Already reported as #{original['id']} — "
+                      f"linked to its existing work order\n")
+    elif email_status == "queued":
+        email_line = f"📧 Work order queued for: {muni_email}\n"
+    else:
+        email_line = f"📧 Email dispatch: {email_status}\n"
+
+    org_line = (
+        f"🏢 Org Mail: {official_email}\n" if official_email else ""
     )
-    cid = result.get("complaint_id", "unknown")
-    logger.info("  → Saved as complaint #%s", cid)
 
-    # ── Step 6 — Email dispatch (send work order to municipality) ─
-    logger.info("Step 6/7: Sending work order email to %s (%s)...",
-                muni_name, muni_email)
+    summary = (
+        f"✅ Complaint #{cid} registered!\n\n"
+        f"📍 Location: {formatted}\n"
+        f"🔍 Issue: {issue_type} ({severity} severity)\n"
+        f"📝 {description}\n"
+        f"🏛️ Municipality: {muni_name}\n"
+        f"👤 Assigned to: {officer.get('officer_name', 'Duty Officer')} "
+        f"({officer.get('department', 'N/A')})\n"
+        f"{email_line}"
+        f"{org_line}\n"
+        f"Track your complaint at the portal feed."
+    )
+
+    logger.info("-" * 60)
+    logger.info("COMPLAINT PIPELINE COMPLETE")
+    logger.info("  Complaint: #%s", cid)
+    logger.info("  Municipality: %s", muni_name)
+    logger.info("  Officer: %s", officer.get("officer_name"))
+    logger.info("  Email to: %s → %s", muni_email, email_status)
+    if official_email:
+        logger.info("  Org Mail (CC): %s", official_email)
+    logger.info("=" * 60)
+    return {"status": "processing", "message": summary}
 
-    # -- Fetch official corporation email via Google Search ----------
-    official_email = None
-    muni_key = officer.get("ward", municipality or "")
-    if muni_key:
-        official_email = get_cached_official_email(muni_key)
-        if official_email:
-            logger.info("  → Official email (cached): %s", official_email)
-        else:
-            logger.info("  → Searching Google for official email of '%s'...", muni_name)
-            official_email = gemini_lookup_official_email(muni_name)
-            if official_email:
-                cache_official_email(muni_key, official_email)
-    if not official_email:
-        logger.info("  → No official email found; sending to officer only")
+
+def _work_order_email(cid: str, analysis: dict, loc: dict, officer: dict,
+                      official_email: str | None,
+                      citizen_email: str | None) -> tuple[str, str]:
+    """Render (subject, html_body) for a complaint's work order email."""
+    issue_type  = analysis["issue_type"]
+    severity    = analysis["severity"]
+    description = analysis["description"]
+    muni_name   = officer.get("municipality", officer.get("department", "Unknown"))
 
     # Build the org-mail row for the email body
     org_email_row = ""
@@ -344,10 +686,8 @@ async def _complaint_pipeline(img_path: str, location: str,
             f'{official_email}</a></td></tr>'
         )
 
-    email_status = "skipped"
-    try:
-        subject = f"[CiviqAI] Work Order — {issue_type.replace('_', ' ').title()} — #{cid}"
-        html_body = f"""
+    subject = f"[CiviqAI] Work Order — {issue_type.replace('_', ' ').title()} — #{cid}"
+    html_body = f"""
         <div style="font-family:sans-serif;max-width:600px;padding:20px;border:1px solid #e5e7eb;border-radius:12px">
           <h2 style="color:#1e40af;margin-bottom:4px">🏛️ CiviqAI Work Order</h2>
           <p style="color:#6b7280;font-size:13px;margin-top:0">Complaint #{cid}</p>
@@ -358,11 +698,11 @@ async def _complaint_pipeline(img_path: str, location: str,
             <tr><td style="padding:6px 0;color:#6b7280">Severity</td>
                 <td style="padding:6px 0;font-weight:600;color:{'#ef4444' if severity == 'critical' else '#f59e0b' if severity == 'high' else '#3b82f6'}">{severity.upper()}</td></tr>
             <tr><td style="padding:6px 0;color:#6b7280">Location</td>
-                <td style="padding:6px 0">{formatted}</td></tr>
+                <td style="padding:6px 0">{loc['formatted']}</td></tr>
             <tr><td style="padding:6px 0;color:#6b7280">Coordinates</td>
-                <td style="padding:6px 0">{lat}, {lng}</td></tr>
+                <td style="padding:6px 0">{loc['lat']}, {loc['lng']}</td></tr>
             <tr><td style="padding:6px 0;color:#6b7280">Ward / Zone</td>
-                <td style="padding:6px 0">{ward} / {zone}</td></tr>
+                <td style="padding:6px 0">{loc['ward']} / {loc['zone']}</td></tr>
             <tr><td style="padding:6px 0;color:#6b7280">Municipality</td>
                 <td style="padding:6px 0;font-weight:600">{muni_name}</td></tr>
             {org_email_row}
@@ -377,70 +717,7 @@ async def _complaint_pipeline(img_path: str, location: str,
           </p>
         </div>
         """
-        send_result = gmail_send_work_order(
-            to=muni_email,
-            complaint_id=str(cid),
-            subject=subject,
-            html_body=html_body,
-            image_path=img_path,
-            cc=official_email
-        )
-        email_status = send_result.get("status", "unknown")
-        logger.info("  → ✅ Email sent! Message ID: %s", send_result.get("message_id"))
-        if official_email:
-            logger.info("  → ✅ CC'd official corporation email: %s", official_email)
-    except Exception as email_err:
-        email_status = "failed"
-        logger.error("  → ❌ Email dispatch failed: %s", email_err)
-
-    # ── Step 7 — Push SSE update to dashboard ─────────────────────
-    logger.info("Step 7/7: Pushing SSE update to dashboard...")
-    try:
-        sse_push_map_update(
-            event_type="new_pin",
-            complaint_id=cid,
-            lat=lat, lng=lng,
-            status="open",
-            issue_type=issue_type
-        )
-        logger.info("  → SSE push sent")
-    except Exception:
-        logger.warning("  → SSE push skipped (no listeners)")
-
-    # ── Summary ───────────────────────────────────────────────────
-    email_line = (
-        f"📧 Work order emailed to: {muni_email}\n"
-        if email_status == "sent"
-        else f"📧 Email dispatch: {email_status}\n"
-    )
-
-    org_line = (
-        f"🏢 Org Mail: {official_email}\n" if official_email else ""
-    )
-
-    summary = (
-        f"✅ Complaint #{cid} registered!\n\n"
-        f"📍 Location: {formatted}\n"
-        f"🔍 Issue: {issue_type} ({severity} severity)\n"
-        f"📝 {description}\n"
-        f"🏛️ Municipality: {muni_name}\n"
-        f"👤 Assigned to: {officer.get('officer_name', 'Duty Officer')} "
-        f"({officer.get('department', 'N/A')})\n"
-        f"{email_line}"
-        f"{org_line}\n"
-        f"Track your complaint at the portal feed."
-    )
-
-    logger.info("-" * 60)
-    logger.info("COMPLAINT PIPELINE COMPLETE")
-    logger.info("  Complaint: #%s", cid)
-    logger.info("  Municipality: %s", muni_name)
-    logger.info("  Officer: %s", officer.get("officer_name"))
-    logger.info("  Email to: %s → %s", muni_email, email_status)
-    if official_email:
-        logger.info("  Org Mail (CC): %s", official_email)
-    logger.info("=" * 60)
-    return {"status": "processing", "message": summary}
+    return subject, html_body
 
 
 # ── Gmail Pub/Sub webhook ─────────────────────────────────────────
@@ -464,19 +741,23 @@ async def inbox_webhook(request: Request):
         state={"app:history_id": history_id}
     )
 
+    # Every db_tools write the agents make for this email commits once,
+    # at the end — or not at all if the run or any write fails, and the
+    # error (a 500) makes Pub/Sub redeliver the email
     try:
-        async for event in runner.run_async(
-            user_id="system",
-            session_id=session.id,
-            new_message=Content(role="user", parts=[Part(text=(
-                f"New email received in Gmail inbox.\n"
-                f"history_id: {history_id}\n"
-                f"from: {email_addr}\n"
-                f"Fetch the latest message and process it."
-            ))])
-        ):
-            if event.is_final_response():
-                break
+        with unit_of_work():
+            async for event in runner.run_async(
+                user_id="system",
+                session_id=session.id,
+                new_message=Content(role="user", parts=[Part(text=(
+                    f"New email received in Gmail inbox.\n"
+                    f"history_id: {history_id}\n"
+                    f"from: {email_addr}\n"
+                    f"Fetch the latest message and process it."
+                ))])
+            ):
+                if event.is_final_response():
+                    break
     except Exception as e:
         if "RESOURCE_EXHAUSTED" in str(e) or "429" in str(e):
             logger.warning("Gemini API rate limit hit on inbox: %s", e)
@@ -516,22 +797,28 @@ async def officer_chat(request: Request):
 
     response_text = ""
     try:
-        async for event in runner.run_async(
-            user_id=officer_id,
-            session_id=session_id,
-            new_message=Content(
-                role="user",
-                parts=[Part(text=message_text)]
-            )
-        ):
-            if event.is_final_response():
-                if event.content and event.content.parts:
-                    for part in event.content.parts:
-                        if part.text:
-                            response_text = part.text
-                            break
+        with unit_of_work():
+            async for event in runner.run_async(
+                user_id=officer_id,
+                session_id=session_id,
+                new_message=Content(
+                    role="user",
+                    parts=[Part(text=message_text)]
+                )
+            ):
+                if event.is_final_response():
+                    if event.content and event.content.parts:
+                        for part in event.content.parts:
+                            if part.text:
+                                response_text = part.text
+                                break
     except Exception as e:
         err_str = str(e)
+        if isinstance(e, UnitOfWorkFailed):
+            logger.error("Chat changes rolled back: %s", err_str)
+            return JSONResponse(status_code=500, content={
+                "reply": "❌ Your changes could not be saved, so none were applied. Please try again."
+            })
         if "RESOURCE_EXHAUSTED" in err_str or "429" in err_str:
             logger.warning("Gemini API rate limit hit on chat")
             return JSONResponse(status_code=429, content={
@@ -569,33 +856,115 @@ async def sse_stream():
 
 
 # ── Public portal — fetch complaints ─────────────────────────────
+# Output field → column.  `fields=` picks a subset (the map view only
+# needs id,lat,lng,status,issue_type); the default is every field.
+_COMPLAINT_FIELDS = {
+    "id":             ComplaintDB.id,
+    "issue_type":     ComplaintDB.issue_type,
+    "description":    ComplaintDB.description,
+    "location":       ComplaintDB.location_text,
+    "location_text":  ComplaintDB.location_text,
+    "lat":            ComplaintDB.lat,
+    "lng":            ComplaintDB.lng,
+    "severity":       ComplaintDB.severity,
+    "status":         ComplaintDB.status,
+    "priority":       ComplaintDB.priority,
+    "image_url":      ComplaintDB.image_url,
+    "thumbnail_url":  ComplaintDB.thumbnail_url,
+    "streetview_url": ComplaintDB.streetview_url,
+    "prediction":     ComplaintDB.prediction,
+    "department":     ComplaintDB.department,
+    "officer_name":   ComplaintDB.officer_name,
+    "work_order_id":  ComplaintDB.work_order_id,
+    "submitted_at":   ComplaintDB.submitted_at,
+}
+
+
+def _encode_cursor(submitted_at: Optional[datetime], complaint_id: str) -> str:
+    stamp = submitted_at.isoformat() if submitted_at is not None else None
+    raw = json.dumps([stamp, complaint_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[Optional[datetime], str]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    submitted_at, complaint_id = json.loads(raw)
+    if submitted_at is not None:
+        submitted_at = datetime.fromisoformat(submitted_at)
+    return submitted_at, str(complaint_id)
+
+
 @app.get("/complaints")
-def get_complaints(
+async def get_complaints(
+    response:   Response,
     status:     Optional[str] = None,
     issue_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    fields:     Optional[str] = None,
+    cursor:     Optional[str] = None,
+    limit:      int = Query(default=settings.COMPLAINTS_PAGE_SIZE, ge=1,
+                            le=settings.COMPLAINTS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    q = db.query(ComplaintDB)
-    if status:     q = q.filter(ComplaintDB.status == status)
-    if issue_type: q = q.filter(ComplaintDB.issue_type == issue_type)
-    complaints = q.order_by(ComplaintDB.submitted_at.desc()).limit(100).all()
+    """Newest-first complaint feed with keyset pagination.
+
+    Pass the X-Next-Cursor response header back as `cursor` to get the
+    next page; the header is absent on the last page."""
+    names = ([f.strip() for f in fields.split(",") if f.strip()]
+             if fields else list(_COMPLAINT_FIELDS))
+    unknown = [n for n in names if n not in _COMPLAINT_FIELDS]
+    if unknown:
+        return JSONResponse(status_code=400, content={
+            "error": f"Unknown fields: {', '.join(unknown)}",
+            "allowed": list(_COMPLAINT_FIELDS)})
+
+    # id + submitted_at are always read — they form the cursor
+    columns = [ComplaintDB.id, ComplaintDB.submitted_at] + [
+        _COMPLAINT_FIELDS[n] for n in names]
+    q = select(*columns)
+    if status:     q = q.where(ComplaintDB.status == status)
+    if issue_type: q = q.where(ComplaintDB.issue_type == issue_type)
+    after_at, after_id = None, None
+    if cursor:
+        try:
+            after_at, after_id = _decode_cursor(cursor)
+        except Exception:
+            return JSONResponse(status_code=400, content={"error": "Invalid cursor"})
+
+    # Dated rows first, newest first, seeking on (submitted_at, id); rows
+    # without a submitted_at follow by id so they stay reachable. Each
+    # segment is its own query so both keep the index seek.
+    rows = []
+    if not cursor or after_at is not None:
+        dated = q.where(ComplaintDB.submitted_at.isnot(None))
+        if cursor:
+            dated = dated.where(tuple_(ComplaintDB.submitted_at, ComplaintDB.id)
+                                < tuple_(after_at, after_id))
+        rows = (await db.execute(dated.order_by(ComplaintDB.submitted_at.desc(),
+                                                ComplaintDB.id.desc())
+                                 .limit(limit + 1))).all()
+    if len(rows) <= limit:
+        undated = q.where(ComplaintDB.submitted_at.is_(None))
+        if cursor and after_at is None:
+            undated = undated.where(ComplaintDB.id < after_id)
+        rows += (await db.execute(undated.order_by(ComplaintDB.id.desc())
+                                  .limit(limit + 1 - len(rows)))).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1][1], rows[-1][0])
     return [{
-        "id":           c.id,
-        "issue_type":   c.issue_type,
-        "description":  c.description,
-        "location":     c.location_text,
-        "location_text": c.location_text,
-        "lat":          c.lat,
-        "lng":          c.lng,
-        "severity":     c.severity,
-        "status":       c.status,
-        "priority":     c.priority,
-        "image_url":    c.image_url,
-        "streetview_url": c.streetview_url,
-        "prediction":   c.prediction,
-        "department":     c.department,
-        "officer_name":   c.officer_name,
-        "work_order_id":  c.work_order_id,
-        "submitted_at": str(c.submitted_at)
-    } for c in complaints]
+        name: (str(value) if name == "submitted_at" and value is not None else value)
+        for name, value in zip(names, row[2:])
+    } for row in rows]
+
+
+@app.get("/complaints/{complaint_id}")
+async def get_complaint_by_id(complaint_id: str):
+    """One complaint by id; archived complaints are read through from
+    complaint_archive and carry "archived": true."""
+    complaint = await aget_complaint(complaint_id)
+    if "error" in complaint:
+        status_code = 404 if complaint["error"].endswith("not found") else 500
+        return JSONResponse(status_code=status_code, content=complaint)
+    return complaint
 
@@ -0,0 +1,231 @@
+"""
+core/archive.py — hot/cold archival of long-resolved complaints.
+
+Complaints resolved or closed more than ARCHIVE_AFTER_DAYS ago — by
+resolved_at, or by submitted_at for legacy closed rows that never got
+one — are moved out of the live ``complaints`` table, together with
+their work orders and their Redis status log, into ``complaint_archive``
+— one row per complaint with a zlib-compressed JSON payload.  The live
+table and its indexes then only hold recent and open work.
+
+ArchiveWorker is off unless ARCHIVE_ENABLED is set.  It runs every
+ARCHIVE_INTERVAL_S and moves ARCHIVE_BATCH_SIZE complaints per
+transaction, pausing between batches so archival never holds the
+SQLite write lock for long.  Complaints with a work order still in the
+outbox are left alone until it is sent.
+
+Reads fall through to the archive: tools/db_tools.get_complaint and the
+history endpoint return archived complaints (marked "archived": true).
+complaint_rollups keeps counting archived complaints, so dashboard
+history is unchanged by archival.
+"""
+import asyncio
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import DateTime, bindparam, delete, exists, func, insert
+
+from core.config import settings
+from core.database import (SessionLocal, AsyncSessionLocal, ComplaintDB,
+                           WorkOrderDB, ComplaintArchiveDB, DONE_STATUSES)
+from core.executors import run_blocking
+from core.redis_client import get_status_histories, delete_status_history
+
+logger = logging.getLogger(__name__)
+
+# Rendered as literals so SQLite can match the partial index
+# ix_complaints_archivable (WHERE status IN ('resolved', 'closed')).
+_DONE = bindparam("archive_done", list(DONE_STATUSES),
+                  expanding=True, literal_execute=True)
+# Legacy closed rows have no resolved_at; they age from submission.
+# Matches the expression of ix_complaints_archivable (migration 006).
+_AGE = func.coalesce(ComplaintDB.resolved_at, ComplaintDB.submitted_at)
+_ROLLUP_COLUMNS = ("submitted_at", "resolved_at", "zone", "ward",
+                   "issue_type", "status", "priority", "severity")
+
+
+def _row_dict(obj) -> dict:
+    return {col.name: (value.isoformat() if isinstance(value, datetime) else value)
+            for col in obj.__table__.columns
+            for value in (getattr(obj, col.key),)}
+
+
+def _encode(payload: dict) -> bytes:
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode(), 6)
+
+
+def _decode(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob))
+
+
+# ── Moving rows (run on the sqlite pool) ──────────────────────────
+
+def archive_batch(cutoff: datetime, limit: int) -> int:
+    """Move up to ``limit`` complaints resolved before ``cutoff``.
+
+    One transaction inserts the archive rows and deletes the live
+    complaints and work orders; the Redis status logs are dropped after
+    it commits.  Deletes use Core statements, so the rollup flush hook
+    does not subtract archived complaints from complaint_rollups."""
+    in_outbox = exists().where(WorkOrderDB.complaint_id == ComplaintDB.id,
+                               WorkOrderDB.status.in_(("pending", "sending")))
+    still_archivable = (ComplaintDB.status.in_(_DONE), _AGE < cutoff)
+    db = SessionLocal()
+    try:
+        complaints = db.query(ComplaintDB).filter(
+            *still_archivable, ~in_outbox
+        ).order_by(_AGE).limit(limit).all()
+        if not complaints:
+            return 0
+        ids = [c.id for c in complaints]
+        histories = get_status_histories(ids)
+        work_orders: dict = {}
+        for wo in db.query(WorkOrderDB).filter(WorkOrderDB.complaint_id.in_(ids)):
+            work_orders.setdefault(wo.complaint_id, []).append(_row_dict(wo))
+
+        db.execute(insert(ComplaintArchiveDB.__table__), [{
+            "id": c.id,
+            **{name: getattr(c, name) for name in _ROLLUP_COLUMNS},
+            "archived_at": datetime.utcnow(),
+            "payload": _encode({
+                "complaint": _row_dict(c),
+                "work_orders": work_orders.get(c.id, []),
+                "status_history": histories[c.id],
+            }),
+        } for c in complaints])
+        db.execute(delete(WorkOrderDB.__table__).where(
+            WorkOrderDB.complaint_id.in_(ids)))
+        moved = db.execute(delete(ComplaintDB.__table__).where(
+            ComplaintDB.id.in_(ids), *still_archivable)).rowcount
+        if moved != len(ids):
+            # A complaint was reopened mid-batch; retry on the next run
+            db.rollback()
+            return 0
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    delete_status_history(*ids)
+    return len(ids)
+
+
+def count_archived() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(ComplaintArchiveDB).count()
+    finally:
+        db.close()
+
+
+# ── Read-through ──────────────────────────────────────────────────
+
+def load_archived(complaint_id: str) -> Optional[dict]:
+    """Archived payload for a complaint id, or None."""
+    db = SessionLocal()
+    try:
+        row = db.get(ComplaintArchiveDB, complaint_id)
+        return _decode(row.payload) if row else None
+    finally:
+        db.close()
+
+
+async def aload_archived(complaint_id: str) -> Optional[dict]:
+    async with AsyncSessionLocal() as db:
+        row = await db.get(ComplaintArchiveDB, complaint_id)
+        return _decode(row.payload) if row else None
+
+
+def archived_complaint(payload: dict) -> ComplaintDB:
+    """Transient (never added to a session) ComplaintDB for a payload."""
+    values = dict(payload["complaint"])
+    for col in ComplaintDB.__table__.columns:
+        if isinstance(col.type, DateTime) and values.get(col.name):
+            values[col.name] = datetime.fromisoformat(values[col.name])
+    return ComplaintDB(**{k: v for k, v in values.items()
+                          if k in ComplaintDB.__table__.columns})
+
+
+def archived_status_history(complaint_id: str) -> list:
+    payload = load_archived(complaint_id)
+    return payload["status_history"] if payload else []
+
+
+# ── Scheduler ─────────────────────────────────────────────────────
+
+class ArchiveWorker:
+    """Periodically moves long-resolved complaints to the archive."""
+
+    def __init__(self,
+                 after_days: int = settings.ARCHIVE_AFTER_DAYS,
+                 interval_s: float = settings.ARCHIVE_INTERVAL_S,
+                 batch_size: int = settings.ARCHIVE_BATCH_SIZE,
+                 batch_pause_s: float = settings.ARCHIVE_BATCH_PAUSE_S):
+        self.after_days = after_days
+        self.interval_s = interval_s
+        self.batch_size = batch_size
+        self.batch_pause_s = batch_pause_s
+
+        self._task: Optional[asyncio.Task] = None
+        self.archived = 0
+        self.runs = 0
+        self.last_run_at: Optional[datetime] = None
+
+    # -- lifecycle -----------------------------------------------------
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="archive-worker")
+            logger.info("✓ Archive worker started (complaints resolved > %d days ago)",
+                        self.after_days)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Archive run failed: %s", str(e)[:200])
+            await asyncio.sleep(self.interval_s)
+
+    async def run_once(self) -> int:
+        """Archive everything currently due, one batch at a time."""
+        cutoff = datetime.utcnow() - timedelta(days=self.after_days)
+        moved_total = 0
+        while True:
+            moved = await run_blocking("sqlite", archive_batch, cutoff, self.batch_size)
+            moved_total += moved
+            if moved < self.batch_size:
+                break
+            await asyncio.sleep(self.batch_pause_s)
+        self.archived += moved_total
+        self.runs += 1
+        self.last_run_at = datetime.utcnow()
+        if moved_total:
+            logger.info("✓ Archived %d resolved complaints", moved_total)
+        return moved_total
+
+    # -- metrics -------------------------------------------------------
+    def stats(self) -> dict:
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "archived": self.archived,
+            "archived_total": count_archived(),
+            "runs": self.runs,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+archive_worker = ArchiveWorker()
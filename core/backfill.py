@@ -0,0 +1,243 @@
+"""
+core/backfill.py — background enrichment of bulk-ingested complaints.
+
+core/ingest.py inserts historical rows as-is and records what is missing
+in complaints.backfill (comma-separated steps):
+
+  geocode   forward-geocode location_text when there are no coordinates,
+            then reverse-geocode for ward / zone / address
+  analysis  classify issue_type / severity from the description text
+
+BackfillWorker drains those rows oldest first, a small batch at a time,
+through the same rate-limited OSM and Gemini pools as live complaints,
+so a large import never starves citizen submissions.  A row whose
+enrichment raises stays pending and the rest of the batch carries on;
+after BACKFILL_MAX_ATTEMPTS failures it is parked as ``failed:<steps>``
+so it no longer holds up the queue.  Attempts are counted per process.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import func
+
+from core.config import settings
+from core.database import SessionLocal, ComplaintDB
+from core.executors import run_blocking
+
+logger = logging.getLogger(__name__)
+
+_PARKED = "failed:"      # backfill prefix of rows that kept failing
+
+
+# ── Storage helpers (run on the sqlite pool) ──────────────────────
+
+def pending_backfill(limit: int) -> list[dict]:
+    db = SessionLocal()
+    try:
+        rows = db.query(ComplaintDB).filter(
+            ComplaintDB.backfill.isnot(None),
+            ComplaintDB.backfill.notlike(f"{_PARKED}%"),
+        ).order_by(ComplaintDB.submitted_at).limit(limit).all()
+        return [{
+            "id":            c.id,
+            "steps":         c.backfill.split(","),
+            "lat":           c.lat,
+            "lng":           c.lng,
+            "location_text": c.location_text,
+            "ward":          c.ward,
+            "zone":          c.zone,
+            "issue_type":    c.issue_type,
+            "severity":      c.severity,
+            "description":   c.description,
+        } for c in rows]
+    finally:
+        db.close()
+
+
+def apply_backfill(complaint_id: str, updates: dict) -> None:
+    """Write enriched fields and clear the row's backfill steps."""
+    db = SessionLocal()
+    try:
+        c = db.get(ComplaintDB, complaint_id)
+        if c is None:
+            return
+        for name, value in updates.items():
+            setattr(c, name, value)
+        c.backfill = None  # type: ignore[assignment]
+        db.commit()        # ORM flush keeps geohash in sync with lat/lng
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def park_backfill(complaint_id: str) -> None:
+    """Take a row that keeps failing out of the queue, keeping its steps."""
+    db = SessionLocal()
+    try:
+        c = db.get(ComplaintDB, complaint_id)
+        if c is not None and c.backfill and not c.backfill.startswith(_PARKED):
+            c.backfill = _PARKED + c.backfill  # type: ignore[assignment]
+            db.commit()
+    finally:
+        db.close()
+
+
+def count_backfill_pending(parked: bool = False) -> int:
+    db = SessionLocal()
+    try:
+        query = db.query(func.count(ComplaintDB.id)).filter(ComplaintDB.backfill.isnot(None))
+        if parked:
+            query = query.filter(ComplaintDB.backfill.like(f"{_PARKED}%"))
+        else:
+            query = query.filter(ComplaintDB.backfill.notlike(f"{_PARKED}%"))
+        return query.scalar() or 0
+    finally:
+        db.close()
+
+
+# ── Enrichment ────────────────────────────────────────────────────
+
+async def enrich(row: dict) -> dict:
+    """Column updates for one pending row."""
+    from tools.maps_tools import geocode_address, reverse_geocode
+    from tools.gemini_tools import gemini_parse_complaint
+
+    updates: dict = {}
+    if "geocode" in row["steps"]:
+        lat, lng = row["lat"], row["lng"]
+        if lat is None or lng is None:
+            geo = await run_blocking("osm", geocode_address, row["location_text"])
+            lat, lng = (geo or {}).get("lat"), (geo or {}).get("lng")
+            if lat is None or lng is None:
+                raise ValueError(f"no geocode result for {row['location_text']!r}")
+            updates.update(lat=lat, lng=lng)
+        rev = await run_blocking("osm", reverse_geocode, lat, lng)
+        if not row["ward"]:
+            updates["ward"] = rev["ward"]
+        if not row["zone"]:
+            updates["zone"] = rev["zone"]
+        if not row["location_text"]:
+            updates["location_text"] = rev["formatted_address"]
+
+    if "analysis" in row["steps"]:
+        text = row["description"] or row["location_text"] or ""
+        parsed = await run_blocking("gemini", gemini_parse_complaint, text)
+        if row["issue_type"] in (None, "other") and parsed.get("issue_type"):
+            updates["issue_type"] = parsed["issue_type"]
+        if not row["severity"]:
+            updates["severity"] = parsed.get("severity") or "moderate"
+    return updates
+
+
+# ── Worker ────────────────────────────────────────────────────────
+
+class BackfillWorker:
+    """Drains complaints.backfill in the background."""
+
+    def __init__(self,
+                 poll_interval_s: float = settings.BACKFILL_POLL_INTERVAL_S,
+                 batch_size: int = settings.BACKFILL_BATCH_SIZE,
+                 max_attempts: int = settings.BACKFILL_MAX_ATTEMPTS):
+        self.poll_interval_s = poll_interval_s
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._attempts: dict[str, int] = {}     # complaint id → failed attempts
+
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake = asyncio.Event()
+
+        self.completed = 0
+        self.failed_rows = 0
+        self.parked = 0
+        self.failed_batches = 0
+
+    # -- lifecycle -----------------------------------------------------
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="backfill-worker")
+            logger.info("✓ Backfill worker started")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self) -> None:
+        """Wake the worker early (safe to call from any thread)."""
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # -- draining ------------------------------------------------------
+    async def _run(self) -> None:
+        while True:
+            try:
+                drained = await self.drain_once()
+            except Exception as e:
+                self.failed_batches += 1
+                logger.error("Backfill batch failed: %s", str(e)[:200])
+                drained = 0
+            if drained:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def drain_once(self) -> int:
+        """Enrich one batch of pending rows; returns how many were done.
+
+        A failing row is skipped (and parked after max_attempts), so a
+        batch of nothing but failures returns 0 and the worker waits out
+        the poll interval before retrying them."""
+        rows = await run_blocking("sqlite", pending_backfill, self.batch_size)
+        done = 0
+        for row in rows:
+            try:
+                updates = await enrich(row)
+                await run_blocking("sqlite", apply_backfill, row["id"], updates)
+            except Exception as e:
+                await self._row_failed(row["id"], e)
+                continue
+            self._attempts.pop(row["id"], None)
+            self.completed += 1
+            done += 1
+        return done
+
+    async def _row_failed(self, complaint_id: str, error: Exception) -> None:
+        self.failed_rows += 1
+        attempts = self._attempts.get(complaint_id, 0) + 1
+        if attempts < self.max_attempts:
+            self._attempts[complaint_id] = attempts
+            logger.warning("Backfill of %s failed (attempt %d/%d): %s", complaint_id,
+                           attempts, self.max_attempts, str(error)[:200])
+            return
+        self._attempts.pop(complaint_id, None)
+        await run_blocking("sqlite", park_backfill, complaint_id)
+        self.parked += 1
+        logger.error("Backfill of %s failed %d times, parked: %s", complaint_id,
+                     attempts, str(error)[:200])
+
+    # -- metrics -------------------------------------------------------
+    def stats(self) -> dict:
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "pending": count_backfill_pending(),
+            "parked": count_backfill_pending(parked=True),
+            "completed": self.completed,
+            "failed_rows": self.failed_rows,
+            "failed_batches": self.failed_batches,
+        }
+
+
+backfill_worker = BackfillWorker()
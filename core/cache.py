@@ -0,0 +1,142 @@
+"""
+core/cache.py — small caching primitives shared by the tool layer.
+
+LRUCache    in-process, thread-safe, size-bounded with per-entry TTL.
+TieredCache LRUCache in front of a shared Redis tier (JSON values), so
+            every uvicorn worker benefits from results cached by others.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU with a max entry count and a TTL per entry."""
+
+    def __init__(self, maxsize: int, ttl_s: Optional[float] = None):
+        self.maxsize = max(1, maxsize)
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, tuple[float | None, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl_s: Optional[float] = None) -> None:
+        ttl = ttl_s if ttl_s is not None else self.ttl_s
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+class TieredCache:
+    """In-process LRU backed by a shared Redis tier.
+
+    Values must be JSON-serialisable.  Shared-tier failures are logged
+    and treated as misses, so a Redis outage only costs cache hits.
+    """
+
+    def __init__(self, namespace: str, maxsize: int, ttl_s: float,
+                 shared=None):
+        self.namespace = namespace
+        self.ttl_s = ttl_s
+        self.local = LRUCache(maxsize, ttl_s)
+        self._shared = shared
+        self._lock = threading.Lock()       # guards the counters below
+        self.shared_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def _shared_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self._shared is not None:
+            try:
+                raw = self._shared.get(self._shared_key(key))
+            except Exception as e:
+                logger.debug("Shared cache read failed (%s): %s", self.namespace, e)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        self.local.set(key, value)
+        with self._lock:
+            self.stores += 1
+        if self._shared is not None:
+            try:
+                self._shared.set(self._shared_key(key), json.dumps(value),
+                                 ex=int(self.ttl_s))
+            except Exception as e:
+                logger.debug("Shared cache write failed (%s): %s", self.namespace, e)
+
+    def stats(self) -> dict:
+        local = self.local.stats()
+        local_hits = local["hits"]
+        with self._lock:
+            shared_hits, misses, stores = self.shared_hits, self.misses, self.stores
+        total = local_hits + shared_hits + misses
+        return {
+            "local": local,
+            "local_hits": local_hits,
+            "shared_hits": shared_hits,
+            "misses": misses,
+            "stores": stores,
+            "hit_rate": round((local_hits + shared_hits) / total, 3) if total else 0.0,
+        }
@@ -27,5 +27,94 @@ class Settings(BaseSettings):
     CLUSTER_THRESHOLD: int = 3
     PREDICTION_THRESHOLD: int = 60
     P1_THRESHOLD: int = 80
+    COMPLAINTS_PAGE_SIZE: int = 100          # GET /complaints default page
+    COMPLAINTS_MAX_PAGE_SIZE: int = 5000
+
+    # SQLite connection profile — applied to every pooled connection
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_POOL_OVERFLOW: int = 8     # beyond SQLITE_POOL_SIZE, for request threads
+    SQLITE_POOL_TIMEOUT_S: float = 30.0
+
+    # Uploads — content-addressed, hash-sharded storage
+    UPLOAD_DIR: str = "uploads"
+    UPLOAD_MAX_BYTES: int = 15 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+
+    # Executor pools — max concurrent blocking calls per dependency
+    GEMINI_POOL_SIZE: int = 4
+    OSM_POOL_SIZE: int = 2
+    GMAIL_POOL_SIZE: int = 2
+    SQLITE_POOL_SIZE: int = 4
+    REDIS_POOL_SIZE: int = 4
+    FILES_POOL_SIZE: int = 4
+    IMAGE_POOL_SIZE: int = 2          # worker processes for image encoding
+
+    # Image preprocessing — long-edge bounds (px) for derived variants
+    IMAGE_ANALYSIS_MAX_PX: int = 1568
+    IMAGE_EMAIL_MAX_PX: int = 1280
+    IMAGE_THUMB_MAX_PX: int = 320
+    IMAGE_JPEG_QUALITY: int = 85
+
+    # Near-duplicate photo detection (perceptual hash)
+    PHASH_MAX_DISTANCE: int = 8
+    PHASH_RADIUS_M: int = 100
+    PHASH_WINDOW_DAYS: int = 14
+
+    # Outbound OSM calls — per-host rate limits (requests/second)
+    NOMINATIM_RATE_PER_S: float = 1.0
+    OSRM_RATE_PER_S: float = 1.0
+    OVERPASS_RATE_PER_S: float = 0.5
+    OUTBOUND_DEADLINE_S: float = 5.0     # max wait for a rate-limit slot
+    OUTBOUND_POOL_SIZE: int = 4          # keep-alive connections per host
+    OUTBOUND_KEEPALIVE_S: float = 60.0
+
+    # Nominatim geocode cache (memory LRU + SQLite)
+    GEOCODE_CACHE_MAX_ENTRIES: int = 4096
+    GEOCODE_CACHE_TTL_S: int = 30 * 24 * 3600
+    GEOCODE_NEGATIVE_TTL_S: int = 24 * 3600      # "no result" answers
+    GEOCODE_REVERSE_PRECISION: int = 8           # geohash chars (~38 m × 19 m)
+    GEOCODE_WARM_ENTRIES: int = 2048
+
+    # In-process municipal directory index (core/directory.py)
+    DIRECTORY_POLL_INTERVAL_S: float = 5.0   # version-key check / pub/sub wait
+
+    # In-memory Redis fallback (core/memory_store.py)
+    MEMORY_STORE_MAX_BYTES: int = 256 * 1024 * 1024   # 0 = unbounded
+    MEMORY_STORE_EVICTION_POLICY: str = "volatile-lru"  # only TTL keys | allkeys-lru | noeviction
+    MEMORY_STORE_EXPIRE_INTERVAL_S: float = 1.0
+
+    # Gemini image-analysis result cache
+    GEMINI_CACHE_MAX_ENTRIES: int = 1024
+    GEMINI_CACHE_TTL_S: int = 7 * 24 * 3600
+
+    # Work-order outbox dispatcher
+    OUTBOX_POLL_INTERVAL_S: float = 5.0
+    OUTBOX_BATCH_SIZE: int = 10
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_BACKOFF_BASE_S: float = 30.0
+    OUTBOX_BACKOFF_MAX_S: float = 1800.0
+    OUTBOX_LEASE_S: float = 120.0
+    OUTBOX_SEND_RATE_PER_MIN: int = 30
+
+    # Bulk ingestion (POST /complaints/bulk, seed/load_complaints.py)
+    INGEST_BATCH_SIZE: int = 5000            # rows per transaction
+    INGEST_MAX_BYTES: int = 512 * 1024 * 1024
+    INGEST_MAX_ERRORS: int = 100             # rejected rows listed in the report
+
+    # Background backfill of bulk-ingested rows (geocode, classification)
+    BACKFILL_POLL_INTERVAL_S: float = 30.0
+    BACKFILL_BATCH_SIZE: int = 20
+    BACKFILL_MAX_ATTEMPTS: int = 5           # then the row is parked as failed:<steps>
+
+    # Hot/cold archival of long-resolved complaints (core/archive.py)
+    ARCHIVE_ENABLED: bool = False            # opt in: archival deletes live rows
+    ARCHIVE_AFTER_DAYS: int = 180            # resolved/closed for longer than this
+    ARCHIVE_INTERVAL_S: float = 3600.0
+    ARCHIVE_BATCH_SIZE: int = 200            # complaints per transaction
+    ARCHIVE_BATCH_PAUSE_S: float = 1.0       # between batches, frees the write lock
 
 settings = Settings()
@@ -1,15 +1,130 @@
-from sqlalchemy import (create_engine, Column, String,
-                         Float, Integer, DateTime, Text)
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import (create_engine, event, inspect, Column, String,
+                         Float, Integer, DateTime, Text, LargeBinary, Index, text)
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import (AsyncEngine, async_sessionmaker,
+                                    create_async_engine)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 from datetime import datetime
 from typing import Optional
+import threading
 from core.config import settings
+from core.geo import geohash_encode
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+
+# ── Engine / connection profile ───────────────────────────────────
+# WAL lets readers (the dashboard /complaints polls) run alongside a
+# writer instead of queueing behind every commit; busy_timeout makes a
+# second writer wait for the lock rather than fail "database is locked".
+def sqlite_pragmas() -> dict:
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous":  settings.SQLITE_SYNCHRONOUS,   # NORMAL is durable in WAL mode
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size":   -settings.SQLITE_CACHE_SIZE_KB,  # negative = KiB, not pages
+        "mmap_size":    settings.SQLITE_MMAP_SIZE,
+        "temp_store":   "MEMORY",
+    }
+
+
+class PoolMetrics:
+    """Connection-pool counters, updated from pool events."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.opened = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_connect(self, dbapi_conn, record):
+        with self._lock:
+            self.opened += 1
+
+    def _on_checkout(self, dbapi_conn, record, proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_conn, record):
+        with self._lock:
+            self.checked_out -= 1
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        return {
+            "pool": pool.__class__.__name__,
+            "size": getattr(pool, "size", lambda: None)(),
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "checked_out": self.checked_out,
+            "peak_checked_out": self.peak_checked_out,
+            "connections_opened": self.opened,
+            "checkouts": self.checkouts,
+        }
+
+
+def make_engine(url: str, pragmas: Optional[dict] = None) -> Engine:
+    """Engine with the SQLite concurrency profile applied to every connection.
+
+    The pool holds SQLITE_POOL_SIZE connections — one per "sqlite"
+    executor thread — plus SQLITE_POOL_OVERFLOW for the request and
+    background threads that open sessions directly."""
+    if not url.startswith("sqlite"):
+        return create_engine(url)
+
+    kwargs = {}
+    if ":memory:" not in url and url.rstrip("/") != "sqlite:":
+        kwargs = dict(pool_size=settings.SQLITE_POOL_SIZE,
+                      max_overflow=settings.SQLITE_POOL_OVERFLOW,
+                      pool_timeout=settings.SQLITE_POOL_TIMEOUT_S)
+    eng = create_engine(url, connect_args={"check_same_thread": False}, **kwargs)
+    _install_pragmas(eng, sqlite_pragmas() if pragmas is None else pragmas)
+    return eng
+
+
+def make_async_engine(url: str, pragmas: Optional[dict] = None) -> AsyncEngine:
+    """aiosqlite-backed twin of make_engine for the async endpoints.
+
+    Same file, same pragma profile; its pool is sized like the sync one
+    since each aiosqlite connection runs on its own thread."""
+    if not url.startswith("sqlite"):
+        return create_async_engine(url)
+    url = url.replace("sqlite://", "sqlite+aiosqlite://", 1).replace(
+        "sqlite+pysqlite://", "sqlite+aiosqlite://", 1)
+    kwargs = {}
+    if ":memory:" not in url and url.rstrip("/") != "sqlite+aiosqlite:":
+        kwargs = dict(pool_size=settings.SQLITE_POOL_SIZE,
+                      max_overflow=settings.SQLITE_POOL_OVERFLOW,
+                      pool_timeout=settings.SQLITE_POOL_TIMEOUT_S)
+    eng = create_async_engine(url, **kwargs)
+    _install_pragmas(eng.sync_engine, sqlite_pragmas() if pragmas is None else pragmas)
+    return eng
+
+
+def _install_pragmas(eng: Engine, pragmas: dict) -> None:
+    @event.listens_for(eng, "connect")
+    def _apply_pragmas(dbapi_conn, record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+engine = make_engine(settings.DATABASE_URL)
+pool_metrics = PoolMetrics(engine)
 SessionLocal = sessionmaker(bind=engine)
+
+# Async path for the FastAPI endpoints; ADK tools keep SessionLocal.
+async_engine = make_async_engine(settings.DATABASE_URL)
+async_pool_metrics = PoolMetrics(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 Base = declarative_base()
 
 class ComplaintDB(Base):
@@ -20,6 +135,7 @@ class ComplaintDB(Base):
     location_text   = Column(String,   nullable=True)
     lat             = Column(Float,    nullable=True)   # ← nullable
     lng             = Column(Float,    nullable=True)   # ← nullable
+    geohash         = Column(String,   nullable=True)   # kept in sync with lat/lng
     ward            = Column(String,   nullable=True)
     zone            = Column(String,   nullable=True)
     severity        = Column(String,   nullable=True)
@@ -27,6 +143,10 @@ class ComplaintDB(Base):
     priority        = Column(String,   default="P3")
     cluster_id      = Column(String,   nullable=True)
     image_url       = Column(String,   nullable=True)
+    thumbnail_url   = Column(String,   nullable=True)
+    image_sha256    = Column(String,   nullable=True)
+    image_phash     = Column(String,   nullable=True)   # 64-bit dHash, hex
+    duplicate_of    = Column(String,   nullable=True)   # near-duplicate photo of
     streetview_url  = Column(String,   nullable=True)
     citizen_email   = Column(String,   nullable=True)
     department      = Column(String,   nullable=True)
@@ -36,6 +156,34 @@ class ComplaintDB(Base):
     prediction      = Column(Text,     nullable=True)
     submitted_at    = Column(DateTime, default=datetime.utcnow)
     resolved_at     = Column(DateTime, nullable=True)
+    backfill        = Column(String,   nullable=True)   # pending enrichment steps (core/backfill.py)
+
+    # Mirrors migrations 002–007 (core/migrations.py) for fresh databases
+    __table_args__ = (
+        Index("ix_complaints_submitted_at", "submitted_at", "id"),
+        Index("ix_complaints_status_submitted", "status", "submitted_at", "id"),
+        Index("ix_complaints_type_submitted", "issue_type", "submitted_at", "id"),
+        Index("ix_complaints_open_priority", "priority", "submitted_at",
+              sqlite_where=text("status = 'open'")),
+        Index("ix_complaints_type_geohash", "issue_type", "geohash", "submitted_at"),
+        Index("ix_complaints_backfill", "submitted_at",
+              sqlite_where=text("backfill IS NOT NULL")),
+        Index("ix_complaints_archivable", text("COALESCE(resolved_at, submitted_at)"),
+              sqlite_where=text("status IN ('resolved', 'closed')")),
+        Index("ix_complaints_phash_geohash", "geohash", "submitted_at",
+              sqlite_where=text("image_phash IS NOT NULL")),
+    )
+
+GEOHASH_PRECISION = 9       # ~4.8 m × 4.8 m; radius queries match by prefix
+
+
+@event.listens_for(ComplaintDB, "before_insert")
+@event.listens_for(ComplaintDB, "before_update")
+def _sync_geohash(mapper, connection, target):
+    if target.lat is not None and target.lng is not None:
+        target.geohash = geohash_encode(target.lat, target.lng, GEOHASH_PRECISION)
+    else:
+        target.geohash = None
 
 class ClusterDB(Base):
     __tablename__ = "clusters"
@@ -60,11 +208,188 @@ class WorkOrderDB(Base):
     dept_email   = Column(String,   nullable=True)
     officer_name = Column(String,   nullable=True)
     email_body   = Column(Text,     nullable=True)
-    status       = Column(String,   default="sent")
+    status       = Column(String,   default="sent")     # pending → sending → sent | failed
     sent_at      = Column(DateTime, default=datetime.utcnow)
     replied_at   = Column(DateTime, nullable=True)
+    # Outbox fields — used when the email is queued instead of sent inline
+    subject         = Column(String,   nullable=True)
+    cc_email        = Column(String,   nullable=True)
+    image_path      = Column(String,   nullable=True)
+    message_id      = Column(String,   nullable=True)
+    attempts        = Column(Integer,  default=0)
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error      = Column(Text,     nullable=True)
+    created_at      = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_work_orders_outbox", "next_attempt_at",
+              sqlite_where=text("status IN ('pending', 'sending')")),
+        Index("ix_work_orders_complaint", "complaint_id"),
+    )
+
+class ComplaintArchiveDB(Base):
+    """Cold storage for long-resolved complaints (core/archive.py).
+
+    ``payload`` is zlib-compressed JSON holding the full complaint row,
+    its work orders and its status history.  The rollup dimensions stay
+    as plain columns so rebuild_rollups still counts archived rows."""
+    __tablename__ = "complaint_archive"
+    id           = Column(String,      primary_key=True)
+    submitted_at = Column(DateTime,    nullable=True)
+    resolved_at  = Column(DateTime,    nullable=True)
+    zone         = Column(String,      nullable=True)
+    ward         = Column(String,      nullable=True)
+    issue_type   = Column(String,      nullable=True)
+    status       = Column(String,      nullable=True)
+    priority     = Column(String,      nullable=True)
+    severity     = Column(String,      nullable=True)
+    archived_at  = Column(DateTime,    default=datetime.utcnow)
+    payload      = Column(LargeBinary, nullable=False)
+
+class GeocodeCacheDB(Base):
+    """Persistent tier of the Nominatim cache (core/geocode_cache.py)."""
+    __tablename__ = "geocode_cache"
+    key        = Column(String,   primary_key=True)   # fwd:<address> | rev:<geohash>
+    payload    = Column(Text,     nullable=True)      # JSON; "null" = no result
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ComplaintRollupDB(Base):
+    """Complaint counts per day × zone × ward × issue_type × status ×
+    priority × severity, kept current by _maintain_rollups.  Dashboard
+    counters and trends read these buckets (core/rollups.py) instead of
+    scanning complaints.  NULL dimensions are stored as 'unknown'."""
+    __tablename__ = "complaint_rollups"
+    day          = Column(String,  primary_key=True)   # YYYY-MM-DD of submitted_at
+    zone         = Column(String,  primary_key=True)
+    ward         = Column(String,  primary_key=True)
+    issue_type   = Column(String,  primary_key=True)
+    status       = Column(String,  primary_key=True)
+    priority     = Column(String,  primary_key=True)
+    severity     = Column(String,  primary_key=True)
+    count        = Column(Integer, nullable=False, default=0)
+    resolution_s = Column(Float,   nullable=False, default=0.0)  # Σ resolved_at − submitted_at
+    resolution_n = Column(Integer, nullable=False, default=0)    # rows in resolution_s
+
+    __table_args__ = (
+        Index("ix_complaint_rollups_status_day", "status", "day"),
+    )
+
+ROLLUP_DIMENSIONS = ("zone", "ward", "issue_type", "status", "priority", "severity")
+DONE_STATUSES = ("resolved", "closed")   # resolved_at is stamped on entering these
+
+
+def _rollup_key(values: dict) -> tuple:
+    at = values["submitted_at"]
+    return (at.date().isoformat() if at else "unknown",
+            *("unknown" if values[d] is None else values[d] for d in ROLLUP_DIMENSIONS))
+
+
+def _rollup_delta(values: dict, sign: int) -> tuple:
+    at, done = values["submitted_at"], values["resolved_at"]
+    if values["status"] in DONE_STATUSES and at and done:
+        return sign, sign * (done - at).total_seconds(), sign
+    return sign, 0.0, 0
+
+
+def rollup_deltas(changes) -> list[dict]:
+    """Collapse (row values, +1/-1) pairs into per-bucket delta rows."""
+    deltas: dict = {}
+    for values, sign in changes:
+        key = _rollup_key(values)
+        n, secs, res_n = _rollup_delta(values, sign)
+        acc = deltas.setdefault(key, [0, 0.0, 0])
+        acc[0] += n; acc[1] += secs; acc[2] += res_n
+    return [dict(zip(("day",) + ROLLUP_DIMENSIONS, key),
+                 count=n, resolution_s=secs, resolution_n=res_n)
+            for key, (n, secs, res_n) in deltas.items() if n or res_n]
+
+
+_ROLLUP_FIELDS = ("submitted_at", "resolved_at") + ROLLUP_DIMENSIONS
+
+
+def _flush_changes(session):
+    for obj in session.new:
+        if isinstance(obj, ComplaintDB):
+            # Fill column defaults now so the bucket matches the stored row
+            if obj.submitted_at is None:
+                obj.submitted_at = datetime.utcnow()
+            if obj.status is None:
+                obj.status = "open"
+            if obj.priority is None:
+                obj.priority = "P3"
+            yield {f: getattr(obj, f) for f in _ROLLUP_FIELDS}, +1
+    for obj in session.dirty:
+        if isinstance(obj, ComplaintDB) and session.is_modified(obj):
+            state = inspect(obj)
+            old, new = {}, {}
+            for f in _ROLLUP_FIELDS:
+                hist = state.attrs[f].history
+                new[f] = getattr(obj, f)
+                old[f] = hist.deleted[0] if hist.deleted else new[f]
+            if old != new:
+                yield old, -1
+                yield new, +1
+    for obj in session.deleted:
+        if isinstance(obj, ComplaintDB):
+            yield {f: getattr(obj, f) for f in _ROLLUP_FIELDS}, -1
+
+
+@event.listens_for(Session, "before_flush")
+def _maintain_rollups(session, flush_context, instances):
+    """Apply this flush's complaint inserts / changes / deletes to
+    complaint_rollups, in the same transaction."""
+    rows = rollup_deltas(_flush_changes(session))
+    if rows:
+        apply_rollup_deltas(session.connection(), rows)
+
+
+def apply_rollup_deltas(conn, rows: list[dict]) -> None:
+    """Add count / resolution deltas to their buckets (upsert)."""
+    stmt = sqlite_insert(ComplaintRollupDB.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day", *ROLLUP_DIMENSIONS],
+        set_={c: getattr(ComplaintRollupDB.__table__.c, c) + getattr(stmt.excluded, c)
+              for c in ("count", "resolution_s", "resolution_n")})
+    conn.execute(stmt, rows)
+    if any(r["count"] < 0 for r in rows):
+        conn.execute(ComplaintRollupDB.__table__.delete().where(
+            ComplaintRollupDB.count <= 0))
+
+
+def rebuild_rollups(conn) -> int:
+    """Recompute complaint_rollups from complaints; returns bucket count."""
+    dims = ", ".join(f"COALESCE({d}, 'unknown')" for d in ROLLUP_DIMENSIONS)
+    resolved = ("status IN ('resolved', 'closed') "
+                "AND resolved_at IS NOT NULL AND submitted_at IS NOT NULL")
+    # Archived complaints (core/archive.py) still count towards history
+    source = " UNION ALL ".join(
+        f"SELECT submitted_at, resolved_at, {', '.join(ROLLUP_DIMENSIONS)} FROM {table}"
+        for table in ("complaints", "complaint_archive"))
+    conn.execute(text("DELETE FROM complaint_rollups"))
+    conn.execute(text(f"""
+        INSERT INTO complaint_rollups (day, {", ".join(ROLLUP_DIMENSIONS)},
+                                       count, resolution_s, resolution_n)
+        SELECT COALESCE(date(submitted_at), 'unknown'), {dims}, COUNT(*),
+               SUM(CASE WHEN {resolved} THEN
+                   (julianday(resolved_at) - julianday(submitted_at)) * 86400
+                   ELSE 0 END),
+               SUM(CASE WHEN {resolved} THEN 1 ELSE 0 END)
+        FROM ({source})
+        GROUP BY 1, {", ".join(str(i) for i in range(2, len(ROLLUP_DIMENSIONS) + 2))}
+    """))
+    return conn.execute(text("SELECT COUNT(*) FROM complaint_rollups")).scalar_one()
+
+
+def init_db(bind: Engine = engine) -> int:
+    """Create missing tables, then apply pending migrations (changes to
+    existing tables go through core/migrations.py).  Run by the app
+    lifespan and the seed scripts — never on import, so importing this
+    module does not touch the database.  Returns the schema version."""
+    from core.migrations import run_migrations
+    Base.metadata.create_all(bind=bind)
+    return run_migrations(bind)
 
-Base.metadata.create_all(bind=engine)
 
 def get_db():
     db = SessionLocal()
@@ -72,3 +397,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,207 @@
+"""
+core/directory.py — in-process index of the municipal directory.
+
+The directory lives in Redis as ``municipality:<key>:<category>`` JSON
+strings and changes rarely, yet every complaint needs an officer from
+it.  DirectoryIndex is an immutable snapshot of all of it, so a lookup
+is a few dict probes — no network hop, no JSON decoding:
+
+    officer, matched = directory.index.lookup("roads", ward="Ward 173")
+
+Besides the exact <key>, entries are reachable through aliases taken
+from their own fields (ward name, area, municipality name) and, failing
+that, through their zone and then any officer for the category.
+
+Writers call core.redis_client.bump_directory_version() after changing
+the directory.  That increments ``directory:version`` and publishes on
+``directory:invalidate``; the watcher thread started by
+Directory.start() rebuilds the index on the message, or at its next
+version check at the latest, and swaps it in with a single reference
+assignment.
+"""
+import logging
+import threading
+from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from core.config import settings
+from core.redis_client import (redis_client, DIRECTORY_CHANNEL,
+                               get_directory_version, get_municipalities)
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "municipality:"
+_ALIAS_FIELDS = ("ward", "area", "municipality")
+_EMPTY: Mapping = MappingProxyType({})
+
+
+@lru_cache(maxsize=4096)
+def directory_key(name: str) -> str:
+    """Normalised directory key, as set_municipality writes it."""
+    return name.strip().lower().replace(" ", "_")
+
+
+def _freeze(groups: dict) -> Mapping:
+    return MappingProxyType({k: MappingProxyType(v) for k, v in groups.items()})
+
+
+class DirectoryIndex:
+    """Immutable snapshot: key → category → officer, plus aliases, zone
+    and per-category fallbacks.  Entries are read-only mappings."""
+
+    __slots__ = ("version", "loaded_at", "entries", "_by_name",
+                 "_by_zone", "_by_category")
+
+    def __init__(self, records: dict, version: int = 0):
+        by_key: dict = {}
+        aliases: dict = {}
+        by_zone: dict = {}
+        by_category: dict = {}
+        # Sorted so alias / fallback winners are deterministic
+        for (key, category), data in sorted(records.items()):
+            entry = MappingProxyType(dict(data))
+            by_key.setdefault(key, {})[category] = entry
+            for field in _ALIAS_FIELDS:
+                if data.get(field):
+                    aliases.setdefault(directory_key(str(data[field])), key)
+            if data.get("zone"):
+                by_zone.setdefault(directory_key(str(data["zone"])), {}).setdefault(
+                    category, entry)
+            by_category.setdefault(category, entry)
+
+        self.version = version
+        self.loaded_at = datetime.utcnow()
+        self.entries = len(records)
+        # Keys and aliases in one mapping (exact keys win) — one probe per name
+        self._by_name = _freeze({**{alias: by_key[key] for alias, key in aliases.items()},
+                                 **by_key})
+        self._by_zone = _freeze(by_zone)
+        self._by_category = MappingProxyType(by_category)
+
+    def _for_name(self, name: Optional[str]) -> Mapping:
+        if not name:
+            return _EMPTY
+        return self._by_name.get(directory_key(name), _EMPTY)
+
+    def lookup(self, category: str, ward: Optional[str] = None,
+               municipality: Optional[str] = None,
+               zone: Optional[str] = None) -> tuple[Optional[Mapping], str]:
+        """(officer, how it matched) — how is "municipality", "ward",
+        "zone", "category" or "none"."""
+        entry = self._for_name(municipality).get(category)
+        if entry is not None:
+            return entry, "municipality"
+        entry = self._for_name(ward).get(category)
+        if entry is not None:
+            return entry, "ward"
+        if zone:
+            entry = self._by_zone.get(directory_key(zone), _EMPTY).get(category)
+            if entry is not None:
+                return entry, "zone"
+        entry = self._by_category.get(category)
+        if entry is not None:
+            return entry, "category"
+        return None, "none"
+
+
+def load_directory_index() -> DirectoryIndex:
+    """Read the whole directory from Redis (index set + chunked MGET)."""
+    version = get_directory_version()      # read first: a racing change re-triggers a load
+    records = {}
+    for key, data in get_municipalities().items():
+        name, _, category = key[len(_PREFIX):].rpartition(":")
+        if name:
+            records[(name, category)] = data
+    return DirectoryIndex(records, version)
+
+
+class Directory:
+    """Holds the current DirectoryIndex and keeps it fresh."""
+
+    def __init__(self, poll_interval_s: float = settings.DIRECTORY_POLL_INTERVAL_S):
+        self.poll_interval_s = poll_interval_s
+        self._index: Optional[DirectoryIndex] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reloads = 0
+        self.failed_reloads = 0
+
+    @property
+    def index(self) -> DirectoryIndex:
+        index = self._index
+        return index if index is not None else self.reload()
+
+    def reload(self) -> DirectoryIndex:
+        with self._reload_lock:
+            index = load_directory_index()
+            self._index = index               # atomic swap; readers never block
+            self.reloads += 1
+        logger.info("✓ Directory index v%d loaded (%d entries)", index.version, index.entries)
+        return index
+
+    def check_version(self) -> bool:
+        """Rebuild if directory:version moved; True if it did."""
+        current = self._index
+        if current is not None and get_directory_version() == current.version:
+            return False
+        self.reload()
+        return True
+
+    # -- watcher -------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="directory-watcher",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval_s + 1)
+            self._thread = None
+
+    def _watch(self) -> None:
+        pubsub = None
+        while not self._stop.is_set():
+            try:
+                if pubsub is None and hasattr(redis_client, "pubsub"):
+                    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(DIRECTORY_CHANNEL)
+                if pubsub is not None:
+                    # Wakes on an invalidation, else after the poll interval
+                    pubsub.get_message(timeout=self.poll_interval_s)
+                else:
+                    self._stop.wait(self.poll_interval_s)
+                if not self._stop.is_set():
+                    self.check_version()
+            except Exception as e:
+                self.failed_reloads += 1
+                logger.warning("Directory refresh failed: %s", str(e)[:200])
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+                    pubsub = None
+                self._stop.wait(self.poll_interval_s)
+        if pubsub is not None:
+            pubsub.close()
+
+    # -- metrics -------------------------------------------------------
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            "version": index.version if index else None,
+            "entries": index.entries if index else 0,
+            "loaded_at": index.loaded_at.isoformat() if index else None,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "watching": bool(self._thread and self._thread.is_alive()),
+        }
+
+
+directory = Directory()
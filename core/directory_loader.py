@@ -0,0 +1,132 @@
+"""
+core/directory_loader.py — bulk-load the municipal directory into Redis.
+
+Reads directory rows from an .xlsx workbook (first sheet, header row)
+or from JSON — an array, {"municipalities": [...]} as in
+data/municipalities.xlsx's placeholder, or NDJSON — and hands them to
+core.redis_client.bulk_set_municipalities, which diffs each chunk
+against Redis and writes only changed keys in one MULTI per chunk:
+
+    report = load_directory_file("data/municipalities.xlsx")
+
+Each row needs a category and a directory key (``key``, ``ward_key``,
+or else ``ward``); the remaining columns are stored as the entry.
+Workbooks need openpyxl, which is imported only when one is read.
+"""
+import json
+import logging
+from typing import Iterator
+
+from core.redis_client import bulk_set_municipalities
+
+logger = logging.getLogger(__name__)
+
+_KEY_COLUMNS = ("key", "ward_key")
+_FLOAT_COLUMNS = ("lat", "lng")
+
+
+class DirectoryRowError(ValueError):
+    """A directory row failed validation."""
+
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def iter_directory_rows(path: str) -> Iterator[tuple[int, dict]]:
+    """(row number, raw row) pairs, streamed where the format allows."""
+    with open(path, "rb") as f:
+        is_zip = f.read(4) == b"PK\x03\x04"
+    if is_zip:
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("Reading .xlsx workbooks needs openpyxl "
+                               "(pip install openpyxl)")
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = [str(h).strip().lower() if h is not None else "" for h in next(rows, ())]
+            for n, values in enumerate(rows, start=2):
+                if any(not _blank(v) for v in values):
+                    yield n, dict(zip(header, values))
+        finally:
+            wb.close()
+        return
+
+    with open(path, encoding="utf-8-sig") as f:
+        text = f.read()
+    try:
+        doc = json.loads(text)
+    except json.JSONDecodeError:
+        # NDJSON: one object per line; a bad line is one rejected row
+        for n, line in enumerate(text.splitlines(), start=1):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    record = DirectoryRowError(f"invalid JSON: {e.msg}")
+                yield n, record
+        return
+    records = doc.get("municipalities", []) if isinstance(doc, dict) else doc
+    for n, record in enumerate(records, start=1):
+        yield n, record
+
+
+def validate_directory_row(raw: object) -> tuple[str, str, dict]:
+    """(directory key, category, entry) for one row; raises DirectoryRowError."""
+    if isinstance(raw, DirectoryRowError):
+        raise raw                       # found unreadable by iter_directory_rows
+    if not isinstance(raw, dict):
+        raise DirectoryRowError("row is not an object")
+    row = {str(k).strip().lower(): (v.strip() if isinstance(v, str) else v)
+           for k, v in raw.items() if k is not None and not _blank(v)}
+    category = str(row.pop("category", "")).lower()
+    if not category:
+        raise DirectoryRowError("category is required")
+    key = next((str(row.pop(c)) for c in _KEY_COLUMNS if c in row), None)
+    key = key or (str(row["ward"]) if "ward" in row else None)
+    if not key:
+        raise DirectoryRowError("needs a key, ward_key or ward")
+    for column in _KEY_COLUMNS:
+        row.pop(column, None)
+    if "email" in row and "@" not in str(row["email"]):
+        raise DirectoryRowError(f"email: not an email address: {row['email']!r}")
+    for column in _FLOAT_COLUMNS:
+        if column in row:
+            try:
+                row[column] = float(row[column])
+            except (TypeError, ValueError):
+                raise DirectoryRowError(f"{column}: not a number: {row[column]!r}")
+    return key, category, row
+
+
+def load_directory_file(path: str, chunk_size: int = 500, prune: bool = False,
+                        max_errors: int = 100) -> dict:
+    """Validate and load one file.  ``prune`` deletes directory keys the
+    file does not list — skipped if any row was rejected, so a typo can
+    never wipe entries."""
+    rejected: list = []
+
+    def rows():
+        for n, raw in iter_directory_rows(path):
+            try:
+                yield validate_directory_row(raw)
+            except DirectoryRowError as e:
+                if len(rejected) < max_errors:
+                    rejected.append({"row": n, "error": str(e)})
+                else:
+                    rejected.append(None)
+
+    # Prune needs the full file validated first
+    entries = list(rows()) if prune else rows()
+    report = bulk_set_municipalities(entries, chunk_size=chunk_size,
+                                     prune=prune and not rejected)
+    report["rejected"] = len(rejected)
+    report["errors"] = [e for e in rejected if e]
+    if prune and rejected:
+        report["prune_skipped"] = True
+    logger.info("✓ Directory load %s: %d rows, %d written, %d unchanged, "
+                "%d deleted, %d rejected", path, report["received"], report["written"],
+                report["unchanged"], report["deleted"], report["rejected"])
+    return report
@@ -0,0 +1,188 @@
+"""
+core/executors.py — per-dependency bounded thread pools.
+
+Every blocking call made from an async endpoint goes through the pool of
+the external dependency it talks to.  Each pool has its own concurrency
+cap, so a slow Gemini call can only tie up Gemini workers — the event
+loop, SSE clients and calls to other dependencies keep running.
+
+    result = await run_blocking("osm", reverse_geocode, lat, lng)
+
+CPU-bound work (image decoding/encoding) goes to the "imaging" pool,
+which is backed by worker processes so it never holds the GIL on the
+request path.  Functions sent there must be picklable (module-level).
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyPool:
+    """Bounded thread pool for one external dependency, with metrics."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._executor = self._create_executor()
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._peak_queued = 0
+        self._wait_s = 0.0
+        self._run_s = 0.0
+
+    def _create_executor(self):
+        return ThreadPoolExecutor(max_workers=self.max_workers,
+                                  thread_name_prefix=f"civiq-{self.name}")
+
+    @property
+    def in_flight(self) -> int:
+        return self._submitted - self._completed - self._failed
+
+    @property
+    def queued(self) -> int:
+        """Calls waiting for a free worker (in flight beyond the cap)."""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` on this pool without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, fn, *args, **kwargs)
+        enqueued = time.perf_counter()
+        with self._lock:
+            self._submitted += 1
+            self._peak_queued = max(self._peak_queued, self.queued)
+
+        def _worker():
+            started = time.perf_counter()
+            with self._lock:
+                self._active += 1
+                self._wait_s += started - enqueued
+            ok = False
+            try:
+                result = call()
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._run_s += time.perf_counter() - started
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        return await loop.run_in_executor(self._executor, _worker)
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "peak_queued": self._peak_queued,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(self._wait_s / done * 1000, 2) if done else 0.0,
+                "avg_run_ms": round(self._run_s / done * 1000, 2) if done else 0.0,
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _timed_call(fn: Callable[..., Any], args: tuple, kwargs: dict):
+    """Child-process wrapper: returns (started, finished, result)."""
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time(), result
+
+
+class ProcessDependencyPool(DependencyPool):
+    """Pool of worker processes for CPU-bound work, same metrics API.
+
+    Workers are spawned (not forked) so they never inherit the server's
+    threads or open sockets.
+    """
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        enqueued = time.time()
+        with self._lock:
+            self._submitted += 1
+            self._peak_queued = max(self._peak_queued, self.queued)
+        ok = False
+        try:
+            started, finished, result = await loop.run_in_executor(
+                self._executor, _timed_call, fn, args, kwargs)
+            ok = True
+            with self._lock:
+                self._wait_s += max(0.0, started - enqueued)
+                self._run_s += finished - started
+            return result
+        finally:
+            with self._lock:
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["active"] = min(self.in_flight, self.max_workers)
+        return stats
+
+    async def warm(self) -> None:
+        """Start every worker process up front (spawning takes ~1 s)."""
+        await asyncio.gather(*(self.run(time.time) for _ in range(self.max_workers)))
+
+
+pools: dict[str, DependencyPool] = {
+    "gemini": DependencyPool("gemini", settings.GEMINI_POOL_SIZE),
+    "osm":    DependencyPool("osm",    settings.OSM_POOL_SIZE),      # Nominatim / OSRM / Overpass
+    "gmail":  DependencyPool("gmail",  settings.GMAIL_POOL_SIZE),
+    "sqlite": DependencyPool("sqlite", settings.SQLITE_POOL_SIZE),
+    "redis":  DependencyPool("redis",  settings.REDIS_POOL_SIZE),
+    "files":  DependencyPool("files",  settings.FILES_POOL_SIZE),    # local disk / EXIF
+    "imaging": ProcessDependencyPool("imaging", settings.IMAGE_POOL_SIZE),  # Pillow encode
+}
+
+
+async def run_blocking(dependency: str, fn: Callable[..., Any],
+                       *args, **kwargs) -> Any:
+    """Run a blocking call on the pool that owns ``dependency``."""
+    try:
+        pool = pools[dependency]
+    except KeyError:
+        raise ValueError(f"Unknown dependency pool '{dependency}'") from None
+    return await pool.run(fn, *args, **kwargs)
+
+
+def pool_stats() -> dict:
+    """Snapshot of every pool's queue depth and latency counters."""
+    return {name: pool.stats() for name, pool in pools.items()}
+
+
+def shutdown_pools(wait: bool = False) -> None:
+    for pool in pools.values():
+        pool.shutdown(wait=wait)
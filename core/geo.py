@@ -0,0 +1,113 @@
+"""
+core/geo.py — geodesy helpers: haversine distance and geohash cells.
+"""
+import math
+
+EARTH_RADIUS_M = 6_371_000
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def bounding_box(lat: float, lng: float, radius_m: float) -> tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) enclosing a circle of radius_m."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-12)
+    dlng = math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 9) -> str:
+    """Standard base-32 geohash of a point."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(gh: str) -> tuple[float, float, float, float]:
+    """(min_lat, min_lng, max_lat, max_lng) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for c in gh:
+        val = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (val >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lng_lo, lat_hi, lng_hi
+
+
+def geohash_neighbors(gh: str) -> list[str]:
+    """The cell itself plus its 8 neighbours (same precision)."""
+    lat_lo, lng_lo, lat_hi, lng_hi = geohash_bounds(gh)
+    dlat, dlng = lat_hi - lat_lo, lng_hi - lng_lo
+    clat, clng = (lat_lo + lat_hi) / 2, (lng_lo + lng_hi) / 2
+    cells = []
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            nlat = clat + i * dlat
+            nlng = (clng + j * dlng + 180) % 360 - 180
+            if -90 <= nlat <= 90:
+                cells.append(geohash_encode(nlat, nlng, len(gh)))
+    return list(dict.fromkeys(cells))
+
+
+def cell_size_m(precision: int, lat: float = 13.0) -> tuple[float, float]:
+    """Approximate (height_m, width_m) of a geohash cell at a latitude."""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    height = 180.0 / 2 ** lat_bits * 111_320
+    width = 360.0 / 2 ** lng_bits * 111_320 * math.cos(math.radians(lat))
+    return height, width
+
+
+def precision_for_radius(radius_m: float, lat: float = 13.0) -> int:
+    """Finest geohash precision whose cells are at least ``radius_m`` on each side,
+    so a radius query never reaches beyond the 3×3 neighbourhood."""
+    for precision in range(9, 0, -1):
+        if min(cell_size_m(precision, lat)) >= radius_m:
+            return precision
+    return 1
@@ -0,0 +1,165 @@
+"""
+core/geocode_cache.py — two-tier cache for Nominatim lookups.
+
+Nominatim's usage policy allows ~1 request/second, which caps how fast
+complaints can be geocoded.  Most lookups repeat: the same landmark
+typed slightly differently, or GPS fixes a few metres apart.  So:
+
+  forward  key = normalised address text      fwd:<text>
+  reverse  key = geohash of the coordinate    rev:<geohash>
+             (GEOCODE_REVERSE_PRECISION chars; 8 ≈ 38 m × 19 m cells)
+
+Tier 1 is an in-process LRUCache; tier 2 is the geocode_cache SQLite
+table, so answers survive restarts.  The most recent rows are loaded
+into memory at startup.  "No result" answers are cached too, with a
+shorter TTL, so a bad address does not hit Nominatim on every retry.
+"""
+import json
+import logging
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from core.cache import LRUCache
+from core.config import settings
+from core.database import SessionLocal, GeocodeCacheDB
+from core.geo import geohash_encode
+from core.outbound import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_PUNCT_RE = re.compile(r"[^\w\s,]+")
+_SPACE_RE = re.compile(r"\s+")
+_COMMA_RE = re.compile(r"\s*,[\s,]*")
+
+
+def normalize_address(address: str) -> str:
+    """Case-, accent-width- and punctuation-insensitive form of an address."""
+    text = unicodedata.normalize("NFKC", address or "").lower()
+    text = _PUNCT_RE.sub(" ", text)
+    text = _SPACE_RE.sub(" ", text)
+    text = _COMMA_RE.sub(", ", text)
+    return text.strip(" ,")
+
+
+def forward_key(address: str) -> str:
+    return f"fwd:{normalize_address(address)}"
+
+
+def reverse_key(lat: float, lng: float,
+                precision: int = settings.GEOCODE_REVERSE_PRECISION) -> str:
+    return f"rev:{geohash_encode(lat, lng, precision)}"
+
+
+class GeocodeCache:
+    """In-memory LRU in front of the persistent geocode_cache table."""
+
+    def __init__(self, maxsize: int = settings.GEOCODE_CACHE_MAX_ENTRIES,
+                 ttl_s: float = settings.GEOCODE_CACHE_TTL_S,
+                 negative_ttl_s: float = settings.GEOCODE_NEGATIVE_TTL_S):
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.local = LRUCache(maxsize, ttl_s)
+        self.persistent_hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.warmed = 0
+        self._flights = SingleFlight()
+
+    # -- persistent tier -----------------------------------------------
+    def _load(self, key: str) -> Any:
+        db = SessionLocal()
+        try:
+            row = db.get(GeocodeCacheDB, key)
+            if row is None or row.expires_at <= datetime.utcnow():
+                return _MISSING
+            return json.loads(row.payload) if row.payload else None
+        except Exception as e:
+            logger.debug("Geocode cache read failed: %s", e)
+            return _MISSING
+        finally:
+            db.close()
+
+    def _store(self, key: str, value: Any, ttl_s: float) -> None:
+        db = SessionLocal()
+        try:
+            db.merge(GeocodeCacheDB(
+                key=key, payload=json.dumps(value),
+                expires_at=datetime.utcnow() + timedelta(seconds=ttl_s),
+                created_at=datetime.utcnow(),
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.debug("Geocode cache write failed: %s", e)
+        finally:
+            db.close()
+
+    # -- public API ----------------------------------------------------
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any]) -> Optional[dict]:
+        """Cached value for ``key``, else ``fetch()`` and cache its result.
+
+        ``fetch`` should raise on transport errors — only real answers
+        (including "no result" → None) are cached.
+        """
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self._load(key)
+        if value is not _MISSING:
+            self.persistent_hits += 1
+            self.local.set(key, value)
+            return value
+
+        self.misses += 1
+
+        def _fetch_and_store():
+            self.upstream_calls += 1
+            fetched = fetch()
+            ttl = self.ttl_s if fetched is not None else self.negative_ttl_s
+            self.local.set(key, fetched, ttl_s=ttl)
+            self._store(key, fetched, ttl)
+            return fetched
+
+        # Concurrent misses for one key (e.g. two GPS fixes in the same
+        # geohash cell) share a single upstream call.
+        value, _ = self._flights.do(key, _fetch_and_store)
+        return value
+
+    def warm_start(self, limit: int = settings.GEOCODE_WARM_ENTRIES) -> int:
+        """Purge expired rows and load the most recent ones into memory."""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.query(GeocodeCacheDB).filter(
+                GeocodeCacheDB.expires_at <= now).delete(synchronize_session=False)
+            db.commit()
+            rows = db.query(GeocodeCacheDB).order_by(
+                GeocodeCacheDB.created_at.desc()).limit(limit).all()
+            for row in reversed(rows):          # most recent ends up MRU
+                remaining = (row.expires_at - now).total_seconds()
+                value = json.loads(row.payload) if row.payload else None
+                self.local.set(row.key, value, ttl_s=remaining)
+            self.warmed = len(rows)
+        finally:
+            db.close()
+        logger.info("✓ Geocode cache warmed: %d entries", self.warmed)
+        return self.warmed
+
+    def stats(self) -> dict:
+        local_hits = self.local.hits
+        total = local_hits + self.persistent_hits + self.misses
+        return {
+            "local": self.local.stats(),
+            "local_hits": local_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "upstream_calls": self.upstream_calls,
+            "warmed": self.warmed,
+            "hit_rate": round((local_hits + self.persistent_hits) / total, 3) if total else 0.0,
+        }
+
+
+geocode_cache = GeocodeCache()
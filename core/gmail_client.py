@@ -39,23 +39,19 @@ def get_gmail_service():
     _gmail_service = build("gmail", "v1", credentials=creds)
     return _gmail_service
 
-def _guess_image_mime(filename: str) -> tuple:
-    """Return (maintype, subtype) for common image formats."""
-    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'jpeg'
-    mime_map = {
-        'jpg': ('image', 'jpeg'), 'jpeg': ('image', 'jpeg'),
-        'png': ('image', 'png'), 'gif': ('image', 'gif'),
-        'webp': ('image', 'webp'), 'bmp': ('image', 'bmp'),
-    }
-    return mime_map.get(ext, ('application', 'octet-stream'))
-
-
 def build_email(to: str, subject: str, html_body: str,
                 attachment_path: str | None = None,
                 cc: str | None = None) -> dict:
-    """Build a MIME email with optional inline image + attachment + CC."""
+    """Build a MIME email with an optional inline image + CC.
+
+    The image is read once and sent as a single inline part that also
+    carries a filename, so mail clients both render it in the body and
+    offer it for download.  Pass the email-size variant from
+    core/imaging.py, not the raw upload.
+    """
     from email.mime.image import MIMEImage
     import os
+    from core.imaging import detect_mime
 
     # Use 'related' so inline images render in the HTML body
     msg = MIMEMultipart("related")
@@ -84,10 +80,9 @@ def build_email(to: str, subject: str, html_body: str,
             inline_html = html_body + img_block
         msg.attach(MIMEText(inline_html, "html"))
 
-        # Attach as inline image
         with open(attachment_path, "rb") as f:
             img_data = f.read()
-        maintype, subtype = _guess_image_mime(filename)
+        maintype, subtype = detect_mime(img_data, filename).split("/", 1)
         if maintype == 'image':
             img_part = MIMEImage(img_data, _subtype=subtype)
         else:
@@ -98,15 +93,6 @@ def build_email(to: str, subject: str, html_body: str,
         img_part.add_header("Content-Disposition", "inline",
                             filename=filename)
         msg.attach(img_part)
-
-        # Also attach as a downloadable file
-        with open(attachment_path, "rb") as f:
-            attach_part = MIMEBase(maintype, subtype)
-            attach_part.set_payload(f.read())
-            encoders.encode_base64(attach_part)
-            attach_part.add_header("Content-Disposition", "attachment",
-                                   filename=filename)
-            msg.attach(attach_part)
     else:
         msg.attach(MIMEText(html_body, "html"))
 
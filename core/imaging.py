@@ -0,0 +1,146 @@
+"""
+core/imaging.py — complaint photo preprocessing.
+
+Phone photos arrive as multi-megabyte JPEGs/PNGs/HEIC-converted files.
+Nothing downstream needs the full resolution, so each upload is decoded
+once and re-encoded into bounded JPEG variants stored beside the
+original in content-addressed storage:
+
+    uploads/ab/cd/<sha>.jpg            original (kept for the record)
+    uploads/ab/cd/<sha>.analysis.jpg   Gemini Vision input
+    uploads/ab/cd/<sha>.email.jpg      work-order email attachment
+    uploads/ab/cd/<sha>.thumb.jpg      dashboard / portal cards
+
+Variants are re-encoded without EXIF, so citizens' GPS metadata never
+leaves the server.  preprocess_image() is CPU-bound and runs on the
+"imaging" process pool (see core/executors.py).
+"""
+import logging
+import mimetypes
+import os
+import uuid
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Optional
+
+from core.config import settings
+from core.executors import run_blocking
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = ("analysis", "email", "thumb")
+
+
+@dataclass
+class ImageVariants:
+    mime: str                        # detected MIME type of the original
+    width: int = 0
+    height: int = 0
+    phash: Optional[int] = None      # 64-bit dHash (core/phash_index.py)
+    paths: dict = field(default_factory=dict)   # variant name → file path
+
+    def path(self, variant: str, fallback: str) -> str:
+        """Path of a variant, or ``fallback`` if it could not be produced."""
+        return self.paths.get(variant) or fallback
+
+    @property
+    def mime_for_variants(self) -> str:
+        return "image/jpeg" if self.paths else self.mime
+
+
+def detect_mime(data: bytes, filename: str | None = None) -> str:
+    """MIME type from the image content, falling back to the file name."""
+    try:
+        from PIL import Image
+        with Image.open(BytesIO(data)) as img:
+            mime = img.get_format_mimetype()
+            if mime:
+                return mime
+    except Exception:
+        pass
+    guessed = mimetypes.guess_type(filename or "")[0]
+    return guessed or "application/octet-stream"
+
+
+def _variant_path(original_path: str, variant: str) -> str:
+    stem = os.path.splitext(original_path)[0]
+    return f"{stem}.{variant}.jpg"
+
+
+def _bounds() -> dict:
+    return {
+        "analysis": settings.IMAGE_ANALYSIS_MAX_PX,
+        "email":    settings.IMAGE_EMAIL_MAX_PX,
+        "thumb":    settings.IMAGE_THUMB_MAX_PX,
+    }
+
+
+def _save_jpeg(img, path: str, quality: int) -> None:
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        img.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def preprocess_image(path: str) -> ImageVariants:
+    """Decode ``path`` once; write the bounded JPEG variants and dHash.
+
+    Runs in a worker process.  Variants already on disk (same content
+    hash) are reused.  An undecodable file yields an ImageVariants with
+    no paths, so callers fall back to the original.
+    """
+    from PIL import Image, ImageOps
+    from core.phash_index import dhash_image
+
+    try:
+        with Image.open(path) as src:
+            mime = src.get_format_mimetype() or "application/octet-stream"
+            img = ImageOps.exif_transpose(src)
+            img.load()
+    except Exception as e:
+        logger.info("     Could not decode image for preprocessing: %s", str(e)[:100])
+        with open(path, "rb") as f:
+            head = f.read(64)
+        return ImageVariants(mime=detect_mime(head, path))
+
+    result = ImageVariants(mime=mime, width=img.width, height=img.height,
+                           phash=dhash_image(img))
+
+    if img.mode in ("RGBA", "LA", "P"):
+        rgba = img.convert("RGBA")
+        img = Image.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.getchannel("A"))
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+
+    # Largest first, each variant downscaled from the previous one
+    current = img
+    for variant, max_px in sorted(_bounds().items(), key=lambda kv: -kv[1]):
+        out_path = _variant_path(path, variant)
+        if max(current.size) > max_px:
+            current = current.copy()
+            current.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+        if not os.path.exists(out_path):
+            quality = settings.IMAGE_JPEG_QUALITY if variant != "thumb" else 75
+            _save_jpeg(current, out_path, quality)
+        result.paths[variant] = out_path
+    return result
+
+
+async def preprocess_upload(path: str) -> ImageVariants:
+    """Run preprocess_image() on the imaging process pool."""
+    variants = await run_blocking("imaging", preprocess_image, path)
+    if variants.paths:
+        sizes = {v: os.path.getsize(p) for v, p in variants.paths.items()}
+        logger.info("Image variants: %dx%d %s → %s", variants.width, variants.height,
+                    variants.mime, ", ".join(f"{v}={n // 1024}KB" for v, n in sizes.items()))
+    return variants
+
+
+def variant_url(image_url: str, variant: str) -> str:
+    """URL of a variant beside a stored upload's URL."""
+    return _variant_path(image_url, variant)
@@ -0,0 +1,274 @@
+"""
+core/ingest.py — bulk complaint ingestion (NDJSON / CSV / JSON).
+
+Used by POST /complaints/bulk and seed/load_complaints.py to migrate
+historical complaints from other municipal systems.  Rows are validated
+one by one, then written in large transactions with a single Core
+INSERT … executemany per batch — no ORM objects, no per-row refresh:
+
+    report = ingest_file(open("export.ndjson", "rb"), "ndjson")
+
+Rows keep their source ``id`` when they have one, and ids already in
+the table are skipped, so re-running an import is safe.  Slow
+enrichment is not done inline: rows without coordinates / ward / zone,
+or without an issue type / severity, are tagged in the ``backfill``
+column and completed later by core/backfill.py.
+"""
+import csv
+import io
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from sqlalchemy import insert, select, union_all
+
+from core.config import settings
+from core.database import (GEOHASH_PRECISION, ComplaintDB, ComplaintArchiveDB,
+                           engine, apply_rollup_deltas, rollup_deltas)
+from core.geo import geohash_encode
+from tools.db_tools import gen_id
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "csv", "json")
+
+VALID_STATUS = {"open", "in_progress", "resolved", "closed"}
+VALID_PRIORITY = {"P1", "P2", "P3"}
+VALID_SEVERITY = {"low", "moderate", "high", "critical"}
+
+# Columns a source row may set; everything else in the row is ignored.
+_TEXT_FIELDS = ("id", "issue_type", "description", "location_text", "ward",
+                "zone", "severity", "status", "priority", "citizen_email",
+                "image_url", "department", "officer_name", "dept_email",
+                "work_order_id")
+_ALIASES = {"location": "location_text", "type": "issue_type",
+            "latitude": "lat", "longitude": "lng", "lon": "lng",
+            "created_at": "submitted_at"}
+
+
+class RowError(ValueError):
+    """A source row failed validation."""
+
+
+@dataclass
+class IngestReport:
+    received: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    backfill_queued: int = 0
+    errors: list = field(default_factory=list)   # first INGEST_MAX_ERRORS
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "backfill_queued": self.backfill_queued,
+            "rows_per_s": round(self.received / self.seconds) if self.seconds else 0,
+            "errors": self.errors,
+        }
+
+
+# ── Parsing ───────────────────────────────────────────────────────
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson",
+                        "application/jsonl", "application/jsonlines"):
+        return "ndjson"
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type == "application/json":
+        return "json"
+    ext = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    return {"jsonl": "ndjson", "ndjson": "ndjson", "csv": "csv",
+            "json": "json"}.get(ext, "ndjson")
+
+
+def iter_records(src: BinaryIO, fmt: str) -> Iterator[tuple[int, object]]:
+    """(line number, raw record) pairs; malformed lines yield a RowError."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    text = io.TextIOWrapper(src, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        # Line numbers assume one physical line per row (header is line 1)
+        for n, record in enumerate(csv.DictReader(text), start=2):
+            yield n, record
+    elif fmt == "json":
+        # A JSON array, or {"complaints": [...]} as in data/complaints_seed.json
+        doc = json.load(text)
+        records = doc.get("complaints", []) if isinstance(doc, dict) else doc
+        for n, record in enumerate(records, start=1):
+            yield n, record
+    else:
+        for n, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield n, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield n, RowError(f"invalid JSON: {e.msg}")
+
+
+# ── Validation ────────────────────────────────────────────────────
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _parse_datetime(value, name: str) -> Optional[datetime]:
+    if _blank(value):
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise RowError(f"{name}: not an ISO-8601 timestamp: {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _parse_coord(value, name: str, bound: float) -> Optional[float]:
+    if _blank(value):
+        return None
+    try:
+        coord = float(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{name}: not a number: {value!r}")
+    if not -bound <= coord <= bound:
+        raise RowError(f"{name}: out of range: {coord}")
+    return coord
+
+
+def validate_row(raw: object, now: Optional[datetime] = None) -> dict:
+    """Normalise one source record into a complaints-table row.
+
+    Raises RowError with a short reason when the record is unusable."""
+    if isinstance(raw, RowError):
+        raise raw
+    if not isinstance(raw, dict):
+        raise RowError("record is not an object")
+    src = {_ALIASES.get(k.strip().lower(), k.strip().lower()): v
+           for k, v in raw.items() if isinstance(k, str)}
+
+    row = {name: (None if _blank(src.get(name)) else str(src[name]).strip())
+           for name in _TEXT_FIELDS}
+    row["lat"] = _parse_coord(src.get("lat"), "lat", 90)
+    row["lng"] = _parse_coord(src.get("lng"), "lng", 180)
+    row["submitted_at"] = (_parse_datetime(src.get("submitted_at"), "submitted_at")
+                           or now or datetime.utcnow())
+    row["resolved_at"] = _parse_datetime(src.get("resolved_at"), "resolved_at")
+
+    if (row["lat"] is None) != (row["lng"] is None):
+        raise RowError("lat and lng must be given together")
+    if row["lat"] is None and not row["location_text"]:
+        raise RowError("needs lat/lng or a location")
+    if not row["issue_type"] and not row["description"]:
+        raise RowError("needs an issue_type or a description")
+
+    row["status"] = (row["status"] or "open").lower()
+    if row["status"] not in VALID_STATUS:
+        raise RowError(f"status: expected one of {', '.join(sorted(VALID_STATUS))}")
+    row["priority"] = (row["priority"] or "P3").upper()
+    if row["priority"] not in VALID_PRIORITY:
+        raise RowError(f"priority: expected one of {', '.join(sorted(VALID_PRIORITY))}")
+    if row["severity"]:
+        row["severity"] = row["severity"].lower()
+        if row["severity"] not in VALID_SEVERITY:
+            raise RowError(f"severity: expected one of {', '.join(sorted(VALID_SEVERITY))}")
+    if row["citizen_email"] and "@" not in row["citizen_email"]:
+        raise RowError("citizen_email: not an email address")
+
+    # Enrichment deferred to core/backfill.py
+    steps = []
+    if row["lat"] is None or not (row["ward"] and row["zone"]):
+        steps.append("geocode")
+    if not row["issue_type"] or not row["severity"]:
+        steps.append("analysis")
+    row["backfill"] = ",".join(steps) or None
+
+    row["id"] = row["id"] or gen_id("CIV")
+    row["issue_type"] = row["issue_type"] or "other"
+    row["geohash"] = (geohash_encode(row["lat"], row["lng"], GEOHASH_PRECISION)
+                      if row["lat"] is not None else None)
+    return row
+
+
+# ── Loading ───────────────────────────────────────────────────────
+
+def _insert_batch(batch: list[dict]) -> int:
+    """One transaction, one executemany; returns the number of new rows.
+
+    Core inserts skip the ORM flush hook, so the rollup buckets for the
+    new rows are added here, in the same transaction.  Ids already moved
+    to complaint_archive count as existing too."""
+    ids = [row["id"] for row in batch]
+    with engine.begin() as conn:
+        existing = set(conn.execute(union_all(
+            select(ComplaintDB.id).where(ComplaintDB.id.in_(ids)),
+            select(ComplaintArchiveDB.id).where(ComplaintArchiveDB.id.in_(ids)),
+        )).scalars())
+        new_rows = [row for row in batch if row["id"] not in existing]
+        if not new_rows:
+            return 0
+        conn.execute(insert(ComplaintDB.__table__), new_rows)
+        apply_rollup_deltas(conn, rollup_deltas((row, +1) for row in new_rows))
+        return len(new_rows)
+
+
+def ingest_records(records: Iterable[tuple[int, object]],
+                   batch_size: int = settings.INGEST_BATCH_SIZE,
+                   max_errors: int = settings.INGEST_MAX_ERRORS) -> IngestReport:
+    """Validate and insert (line, record) pairs in batches of ``batch_size``."""
+    report = IngestReport()
+    started = datetime.utcnow()
+    batch: list[dict] = []
+    seen: set[str] = set()
+
+    def flush():
+        inserted = _insert_batch(batch)
+        report.inserted += inserted
+        report.duplicates += len(batch) - inserted
+        batch.clear()
+
+    for line, record in records:
+        report.received += 1
+        try:
+            row = validate_row(record, now=started)
+        except RowError as e:
+            report.rejected += 1
+            if len(report.errors) < max_errors:
+                report.errors.append({"line": line, "error": str(e)})
+            continue
+        if row["id"] in seen:           # repeated within this import
+            report.duplicates += 1
+            continue
+        seen.add(row["id"])
+        if row["backfill"]:
+            report.backfill_queued += 1
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if report.inserted >= batch_size:
+        # Refresh planner statistics after a large load
+        with engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA optimize")
+
+    report.seconds = (datetime.utcnow() - started).total_seconds()
+    logger.info("✓ Ingested %d/%d complaints (%d duplicate, %d rejected, "
+                "%d queued for backfill) in %.1fs", report.inserted,
+                report.received, report.duplicates, report.rejected,
+                report.backfill_queued, report.seconds)
+    return report
+
+
+def ingest_file(src: BinaryIO, fmt: str, **kwargs) -> IngestReport:
+    return ingest_records(iter_records(src, fmt), **kwargs)
@@ -0,0 +1,1017 @@
+"""
+core/memory_store.py — in-process, Redis-compatible store.
+
+core/redis_client.py falls back to MemoryStore when no Redis server is
+reachable, so it speaks the redis-py API (decode_responses=True) the
+rest of the code uses:
+
+  keys      get/set (ex, px, nx, xx, keepttl), mget/mset, setex, setnx,
+            incr/decr/incrby/decrby/incrbyfloat, append, strlen,
+            delete/unlink, exists, type, keys, scan/scan_iter, dbsize,
+            expire/pexpire/ttl/pttl/persist, flushdb/flushall
+  lists     lpush/rpush, lpop/rpop, lrange, llen, lindex, ltrim, lrem
+  hashes    hset (mapping=), hsetnx, hget, hmget, hgetall, hdel, hexists,
+            hlen, hkeys, hvals, hincrby, hincrbyfloat
+  sets      sadd, srem, smembers, sismember, scard, spop, sinter, sunion,
+            sscan_iter
+  zsets     zadd (nx, xx, ch, incr), zrem, zscore, zincrby, zcard, zcount,
+            zrange/zrevrange, zrangebyscore/zrevrangebyscore, zrank/zrevrank,
+            zremrangebyscore, zpopmin/zpopmax
+  other     pipeline (atomic execute, watch/multi), pubsub/publish, info, ping
+
+Every command holds one re-entrant lock, and a pipeline holds it for its
+whole execute(), so the store is safe to share across FastAPI's thread
+pool and pipelines behave like MULTI/EXEC.
+
+Expiry is lazy (a key is dropped when touched after its deadline) plus
+periodic: a daemon thread pops due keys off a deadline heap every
+expire_interval_s.  With max_memory_bytes set, memory use is estimated
+per key and writes evict least-recently-used keys with a TTL
+(volatile-lru, the default: primary data such as status history never
+has one), any key (allkeys-lru), or none (noeviction); a write that
+would stay over the limit fails with OOM, as under Redis'
+maxmemory-policy.  Errors are raised as redis-py's ResponseError /
+DataError so callers handle both backends the same way.
+"""
+import bisect
+import fnmatch
+import functools
+import heapq
+import itertools
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import timedelta
+from typing import Any, Iterable, Iterator, Optional
+
+try:
+    from redis.exceptions import DataError, ResponseError, WatchError
+except ImportError:                      # redis-py is optional in dev mode
+    class ResponseError(Exception):
+        pass
+
+    class DataError(Exception):
+        pass
+
+    class WatchError(Exception):
+        pass
+
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+NOT_INTEGER = "value is not an integer or out of range"
+NOT_FLOAT = "value is not a valid float"
+OOM = "OOM command not allowed when used memory > 'maxmemory'."
+
+EVICTION_POLICIES = ("allkeys-lru", "volatile-lru", "noeviction")
+
+# Rough per-entry overheads for the memory estimate (CPython objects)
+_KEY_OVERHEAD = 96
+_ITEM_OVERHEAD = 56
+
+
+def _encode(value: Any) -> str:
+    """redis-py's argument encoding with decode_responses=True."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, bool):
+        raise DataError(f"Invalid input of type: 'bool'. Convert to a bytes, string, "
+                        f"int or float first.")
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    raise DataError(f"Invalid input of type: '{type(value).__name__}'. "
+                    f"Convert to a bytes, string, int or float first.")
+
+
+def _seconds(value) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+def _as_int(value: Optional[str]) -> int:
+    try:
+        return int(value) if value is not None else 0
+    except ValueError:
+        raise ResponseError(NOT_INTEGER)
+
+
+def _as_float(value: Optional[str]) -> float:
+    try:
+        return float(value) if value is not None else 0.0
+    except ValueError:
+        raise ResponseError(NOT_FLOAT)
+
+
+def _format_float(value: float) -> str:
+    text = repr(float(value))
+    return text[:-2] if text.endswith(".0") else text
+
+
+def _keys_arg(keys, args) -> list[str]:
+    return ([keys] if isinstance(keys, str) else list(keys)) + list(args)
+
+
+def _slice(start: int, end: int, n: int) -> Optional[tuple[int, int]]:
+    """Redis inclusive (start, end) with negative indices → python slice bounds."""
+    if start < 0:
+        start = max(n + start, 0)
+    if end < 0:
+        end = n + end
+    end = min(end, n - 1)
+    if start > end or start >= n:
+        return None
+    return start, end + 1
+
+
+def _score_bound(value) -> tuple[float, bool]:
+    """(score, exclusive) for a ZRANGEBYSCORE bound like 5, "(5", "-inf"."""
+    if isinstance(value, str):
+        if value.startswith("("):
+            return _as_float(value[1:]), True
+        if value in ("-inf", "+inf", "inf"):
+            return float(value), False
+        return _as_float(value), False
+    return float(value), False
+
+
+def _in_range(score: float, low: tuple[float, bool], high: tuple[float, bool]) -> bool:
+    (lo, lo_ex), (hi, hi_ex) = low, high
+    return (score > lo if lo_ex else score >= lo) and (score < hi if hi_ex else score <= hi)
+
+
+class _ZSet:
+    """Sorted set: member → score, plus (score, member) pairs kept sorted."""
+    __slots__ = ("scores", "order")
+
+    def __init__(self):
+        self.scores: dict[str, float] = {}
+        self.order: list[tuple[float, str]] = []
+
+    def add(self, member: str, score: float) -> None:
+        old = self.scores.get(member)
+        if old is not None:
+            del self.order[bisect.bisect_left(self.order, (old, member))]
+        self.scores[member] = score
+        bisect.insort(self.order, (score, member))
+
+    def remove(self, member: str) -> bool:
+        old = self.scores.pop(member, None)
+        if old is None:
+            return False
+        del self.order[bisect.bisect_left(self.order, (old, member))]
+        return True
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+
+_TYPES = {str: "string", deque: "list", dict: "hash", set: "set", _ZSet: "zset"}
+
+
+def _command(write: bool = False, grows: bool = True):
+    """Run a store method under the lock; writes also enforce maxmemory.
+    Writes that only free memory (grows=False) are allowed over the
+    limit, as Redis allows DEL under noeviction."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def locked(self, *args, **kwargs):
+            with self._lock:
+                if write and grows:
+                    self._check_oom()
+                result = fn(self, *args, **kwargs)
+                if write:
+                    self._enforce_memory()
+                return result
+        return locked
+    return wrap
+
+
+class MemoryPipeline:
+    """Buffers commands; execute() runs them in order under the store
+    lock (atomic, like MULTI/EXEC) and returns their results.
+
+    watch() works as in redis-py: commands run immediately until multi(),
+    and execute() raises WatchError if a watched key's value or TTL
+    changed since it was watched (a write that restores the same value
+    goes unnoticed, unlike Redis)."""
+
+    def __init__(self, store: "MemoryStore", transaction: bool = True):
+        self._store = store
+        self._commands: list = []
+        self._watched: dict = {}
+        self._immediate = False
+        self.transaction = transaction
+
+    def __getattr__(self, name: str):
+        method = getattr(self._store, name)
+        if self._immediate:
+            return method
+        def queue_command(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue_command
+
+    def watch(self, *keys: str) -> None:
+        with self._store._lock:
+            for key in keys:
+                self._watched[key] = self._store._snapshot(key)
+        self._immediate = True
+
+    def unwatch(self) -> None:
+        self._watched = {}
+        self._immediate = False
+
+    def multi(self) -> None:
+        self._immediate = False
+
+    def execute(self, raise_on_error: bool = True) -> list:
+        commands, self._commands = self._commands, []
+        watched = self._watched
+        self.unwatch()
+        results: list = []
+        with self._store._lock:
+            if any(self._store._snapshot(k) != snap for k, snap in watched.items()):
+                raise WatchError("Watched variable changed.")
+            for method, args, kwargs in commands:
+                try:
+                    results.append(method(*args, **kwargs))
+                except ResponseError as e:
+                    results.append(e)
+        if raise_on_error:
+            for result in results:
+                if isinstance(result, ResponseError):
+                    raise result
+        return results
+
+    def reset(self) -> None:
+        self._commands = []
+        self.unwatch()
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+
+class MemoryPubSub:
+    """In-process PubSub: receives what this store's publish() sends."""
+
+    def __init__(self, store: "MemoryStore", ignore_subscribe_messages: bool = False):
+        self._store = store
+        self._ignore = ignore_subscribe_messages
+        self._queue: "queue.Queue[dict]" = queue.Queue()
+        self.channels: set[str] = set()
+
+    def subscribe(self, *channels: str) -> None:
+        with self._store._lock:
+            for channel in channels:
+                self.channels.add(channel)
+                self._store._subscribers.setdefault(channel, set()).add(self)
+                if not self._ignore:
+                    self._queue.put({"type": "subscribe", "pattern": None,
+                                     "channel": channel, "data": len(self.channels)})
+
+    def unsubscribe(self, *channels: str) -> None:
+        with self._store._lock:
+            for channel in channels or tuple(self.channels):
+                self.channels.discard(channel)
+                self._store._subscribers.get(channel, set()).discard(self)
+
+    def get_message(self, ignore_subscribe_messages: bool = False,
+                    timeout: float = 0.0) -> Optional[dict]:
+        try:
+            return self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self.unsubscribe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryStore:
+    """Thread-safe Redis-compatible store (see module docstring)."""
+
+    def __init__(self, max_memory_bytes: int = 0,
+                 eviction_policy: str = "volatile-lru",
+                 expire_interval_s: float = 1.0):
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f"eviction_policy must be one of {', '.join(EVICTION_POLICIES)}")
+        self.max_memory_bytes = max_memory_bytes
+        self.eviction_policy = eviction_policy
+        self.expire_interval_s = expire_interval_s
+
+        self._lock = threading.RLock()
+        self._data: "OrderedDict[str, Any]" = OrderedDict()   # least recently used first
+        self._expires: dict[str, float] = {}
+        self._deadlines: list[tuple[float, str]] = []           # heap; may hold stale entries
+        self._sizes: dict[str, int] = {}
+        self._subscribers: dict[str, set] = {}
+        self.used_memory = 0
+
+        self._sweeper: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired_keys = 0
+        self.evicted_keys = 0
+
+    # ── internals (lock held) ─────────────────────────────────────
+    def _alive(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self._remove(key)
+            self.expired_keys += 1
+            return False
+        return key in self._data
+
+    def _lookup(self, key: str, kind: Optional[type] = None, read: bool = False):
+        if not self._alive(key):
+            if read:
+                self.misses += 1
+            return None
+        value = self._data[key]
+        if kind is not None and not isinstance(value, kind):
+            raise ResponseError(WRONGTYPE)
+        self._data.move_to_end(key)
+        if read:
+            self.hits += 1
+        return value
+
+    def _container(self, key: str, kind: type):
+        value = self._lookup(key, kind)
+        if value is None:
+            value = self._data[key] = kind()
+            self._sizes[key] = _KEY_OVERHEAD + len(key)
+            self.used_memory += self._sizes[key]
+        return value
+
+    def _account(self, key: str, delta: int) -> None:
+        self._sizes[key] += delta
+        self.used_memory += delta
+
+    def _drop_if_empty(self, key: str, value) -> None:
+        if not value:
+            self._remove(key)
+
+    def _put_string(self, key: str, value: str, keep_ttl: bool = False) -> None:
+        if key in self._data:
+            ttl = self._expires.get(key) if keep_ttl else None
+            self._remove(key)
+            if ttl is not None:
+                self._set_deadline(key, ttl)
+        self._data[key] = value
+        self._sizes[key] = _KEY_OVERHEAD + len(key) + len(value)
+        self.used_memory += self._sizes[key]
+
+    def _remove(self, key: str) -> bool:
+        if key not in self._data:
+            return False
+        del self._data[key]
+        self._expires.pop(key, None)
+        self.used_memory -= self._sizes.pop(key, 0)
+        return True
+
+    def _set_deadline(self, key: str, deadline: float) -> None:
+        self._expires[key] = deadline
+        heapq.heappush(self._deadlines, (deadline, key))
+        if len(self._deadlines) > 2 * len(self._expires) + 1024:
+            self._deadlines = [(d, k) for k, d in self._expires.items()]
+            heapq.heapify(self._deadlines)
+        self._ensure_sweeper()
+
+    def _check_oom(self) -> None:
+        """Before a write that can grow memory: evict if over the limit,
+        and refuse the write if nothing (more) may be evicted."""
+        if not self.max_memory_bytes or self.used_memory <= self.max_memory_bytes:
+            return
+        self._enforce_memory()
+        if self.used_memory > self.max_memory_bytes:
+            raise ResponseError(OOM)
+
+    def _enforce_memory(self) -> None:
+        if not self.max_memory_bytes or self.eviction_policy == "noeviction":
+            return
+        while self.used_memory > self.max_memory_bytes and self._data:
+            if self.eviction_policy == "allkeys-lru":
+                victim = next(iter(self._data))
+            else:
+                victim = next((k for k in self._data if k in self._expires), None)
+                if victim is None:
+                    return
+            self._remove(victim)
+            self.evicted_keys += 1
+
+    def _snapshot(self, key: str):
+        """Comparable copy of a key's type, value and deadline (WATCH)."""
+        if not self._alive(key):
+            return None
+        value = self._data[key]
+        kind = type(value)
+        if isinstance(value, _ZSet):
+            value = dict(value.scores)
+        elif not isinstance(value, str):
+            value = kind(value)
+        return kind, value, self._expires.get(key)
+
+    # ── periodic expiry ───────────────────────────────────────────
+    def _ensure_sweeper(self) -> None:
+        if self.expire_interval_s and (self._sweeper is None or not self._sweeper.is_alive()):
+            self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True,
+                                             name="memory-store-expiry")
+            self._sweeper.start()
+
+    def _sweep_loop(self) -> None:
+        while not self._closed.wait(self.expire_interval_s):
+            self.expire_due()
+
+    def expire_due(self) -> int:
+        """Drop every key whose TTL has passed; returns how many."""
+        removed = 0
+        with self._lock:
+            now = time.time()
+            while self._deadlines and self._deadlines[0][0] <= now:
+                deadline, key = heapq.heappop(self._deadlines)
+                if self._expires.get(key) == deadline:
+                    self._remove(key)
+                    removed += 1
+            self.expired_keys += removed
+        return removed
+
+    def close(self) -> None:
+        self._closed.set()
+
+    # ── keys ──────────────────────────────────────────────────────
+    @_command()
+    def ping(self) -> bool:
+        return True
+
+    @_command(write=True, grows=False)
+    def delete(self, *keys: str) -> int:
+        return sum(self._alive(k) and self._remove(k) for k in keys)
+
+    unlink = delete
+
+    @_command()
+    def exists(self, *keys: str) -> int:
+        return sum(1 for k in keys if self._alive(k))
+
+    @_command()
+    def type(self, key: str) -> str:
+        value = self._lookup(key)
+        return "none" if value is None else _TYPES[type(value)]
+
+    @_command()
+    def keys(self, pattern: str = "*") -> list[str]:
+        return [k for k in list(self._data)
+                if fnmatch.fnmatchcase(k, pattern) and self._alive(k)]
+
+    def scan(self, cursor: int = 0, match: Optional[str] = None,
+             count: Optional[int] = None, _type: Optional[str] = None) -> tuple[int, list]:
+        """One-shot SCAN: the whole keyspace in the first call (cursor 0)."""
+        if cursor:
+            return 0, []
+        keys = self.keys(match or "*")
+        if _type:
+            keys = [k for k in keys if self.type(k) == _type]
+        return 0, keys
+
+    def scan_iter(self, match: Optional[str] = None, count: Optional[int] = None,
+                  _type: Optional[str] = None) -> Iterator[str]:
+        return iter(self.scan(0, match, count, _type)[1])
+
+    @_command()
+    def dbsize(self) -> int:
+        return sum(1 for k in list(self._data) if self._alive(k))
+
+    @_command(write=True, grows=False)
+    def flushdb(self, asynchronous: bool = False) -> bool:
+        self._data.clear()
+        self._expires.clear()
+        self._deadlines.clear()
+        self._sizes.clear()
+        self.used_memory = 0
+        return True
+
+    flushall = flushdb
+
+    @_command(write=True, grows=False)
+    def expire(self, key: str, time_s) -> bool:
+        if not self._alive(key):
+            return False
+        self._set_deadline(key, time.time() + _seconds(time_s))
+        return True
+
+    def pexpire(self, key: str, time_ms) -> bool:
+        ms = time_ms.total_seconds() * 1000 if isinstance(time_ms, timedelta) else time_ms
+        return self.expire(key, ms / 1000)
+
+    @_command()
+    def pttl(self, key: str) -> int:
+        if not self._alive(key):
+            return -2
+        deadline = self._expires.get(key)
+        return -1 if deadline is None else max(int((deadline - time.time()) * 1000), 0)
+
+    def ttl(self, key: str) -> int:
+        ms = self.pttl(key)
+        return ms if ms < 0 else (ms + 500) // 1000
+
+    @_command(write=True, grows=False)
+    def persist(self, key: str) -> bool:
+        return self._alive(key) and self._expires.pop(key, None) is not None
+
+    # ── strings ───────────────────────────────────────────────────
+    @_command()
+    def get(self, key: str) -> Optional[str]:
+        return self._lookup(key, str, read=True)
+
+    @_command()
+    def mget(self, keys, *args) -> list[Optional[str]]:
+        out = []
+        for key in _keys_arg(keys, args):
+            value = self._lookup(key, read=True)
+            out.append(value if isinstance(value, str) else None)
+        return out
+
+    @_command(write=True)
+    def set(self, key: str, value, ex=None, px=None, nx: bool = False, xx: bool = False,
+            keepttl: bool = False, get: bool = False):
+        old = self._lookup(key, str if get else None)
+        exists = old is not None
+        if (nx and exists) or (xx and not exists):
+            return old if get else None
+        self._put_string(key, _encode(value), keep_ttl=keepttl)
+        if ex is not None or px is not None:
+            seconds = _seconds(ex) if ex is not None else _seconds(px) / 1000
+            self._set_deadline(key, time.time() + seconds)
+        return old if get else True
+
+    def setex(self, key: str, time_s, value) -> bool:
+        return self.set(key, value, ex=time_s)
+
+    def setnx(self, key: str, value) -> bool:
+        return bool(self.set(key, value, nx=True))
+
+    @_command(write=True)
+    def mset(self, mapping: dict) -> bool:
+        for key, value in mapping.items():
+            self._put_string(key, _encode(value))
+        return True
+
+    @_command(write=True)
+    def incrby(self, key: str, amount: int = 1) -> int:
+        value = _as_int(self._lookup(key, str)) + int(amount)
+        self._put_string(key, str(value), keep_ttl=True)
+        return value
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return self.incrby(key, amount)
+
+    def decrby(self, key: str, amount: int = 1) -> int:
+        return self.incrby(key, -amount)
+
+    def decr(self, key: str, amount: int = 1) -> int:
+        return self.incrby(key, -amount)
+
+    @_command(write=True)
+    def incrbyfloat(self, key: str, amount: float = 1.0) -> float:
+        value = _as_float(self._lookup(key, str)) + float(amount)
+        self._put_string(key, _format_float(value), keep_ttl=True)
+        return value
+
+    @_command(write=True)
+    def append(self, key: str, value) -> int:
+        new = (self._lookup(key, str) or "") + _encode(value)
+        self._put_string(key, new, keep_ttl=True)
+        return len(new)
+
+    @_command()
+    def strlen(self, key: str) -> int:
+        return len(self._lookup(key, str) or "")
+
+    # ── lists ─────────────────────────────────────────────────────
+    @_command(write=True)
+    def rpush(self, key: str, *values) -> int:
+        items = self._container(key, deque)
+        encoded = [_encode(v) for v in values]
+        items.extend(encoded)
+        self._account(key, sum(len(v) + _ITEM_OVERHEAD for v in encoded))
+        return len(items)
+
+    @_command(write=True)
+    def lpush(self, key: str, *values) -> int:
+        items = self._container(key, deque)
+        encoded = [_encode(v) for v in values]
+        items.extendleft(encoded)
+        self._account(key, sum(len(v) + _ITEM_OVERHEAD for v in encoded))
+        return len(items)
+
+    def _pop(self, key: str, count: Optional[int], left: bool):
+        items = self._lookup(key, deque)
+        if items is None:
+            return None
+        popped = [items.popleft() if left else items.pop()
+                  for _ in range(min(count or 1, len(items)))]
+        self._account(key, -sum(len(v) + _ITEM_OVERHEAD for v in popped))
+        self._drop_if_empty(key, items)
+        return popped if count is not None else popped[0]
+
+    @_command(write=True, grows=False)
+    def lpop(self, key: str, count: Optional[int] = None):
+        return self._pop(key, count, left=True)
+
+    @_command(write=True, grows=False)
+    def rpop(self, key: str, count: Optional[int] = None):
+        return self._pop(key, count, left=False)
+
+    @_command()
+    def lrange(self, key: str, start: int, end: int) -> list[str]:
+        items = self._lookup(key, deque, read=True)
+        bounds = _slice(start, end, len(items)) if items else None
+        if bounds is None:
+            return []
+        return list(itertools.islice(items, *bounds))
+
+    @_command()
+    def llen(self, key: str) -> int:
+        return len(self._lookup(key, deque) or ())
+
+    @_command()
+    def lindex(self, key: str, index: int) -> Optional[str]:
+        items = self._lookup(key, deque, read=True) or ()
+        return items[index] if -len(items) <= index < len(items) else None
+
+    @_command(write=True, grows=False)
+    def ltrim(self, key: str, start: int, end: int) -> bool:
+        items = self._lookup(key, deque)
+        if items is None:
+            return True
+        bounds = _slice(start, end, len(items))
+        kept = deque(itertools.islice(items, *bounds)) if bounds else deque()
+        self._account(key, sum(len(v) + _ITEM_OVERHEAD for v in kept)
+                      - sum(len(v) + _ITEM_OVERHEAD for v in items))
+        self._data[key] = kept
+        self._drop_if_empty(key, kept)
+        return True
+
+    @_command(write=True, grows=False)
+    def lrem(self, key: str, count: int, value) -> int:
+        items = self._lookup(key, deque)
+        if items is None:
+            return 0
+        value = _encode(value)
+        seq = list(items) if count >= 0 else list(reversed(items))
+        limit = abs(count) or len(seq)
+        kept, removed = [], 0
+        for item in seq:
+            if item == value and removed < limit:
+                removed += 1
+            else:
+                kept.append(item)
+        if count < 0:
+            kept.reverse()
+        self._data[key] = deque(kept)
+        self._account(key, -removed * (len(value) + _ITEM_OVERHEAD))
+        self._drop_if_empty(key, kept)
+        return removed
+
+    # ── hashes ────────────────────────────────────────────────────
+    @_command(write=True)
+    def hset(self, name: str, key=None, value=None, mapping: Optional[dict] = None,
+             items: Optional[list] = None) -> int:
+        pairs = list((mapping or {}).items())
+        if key is not None:
+            pairs.insert(0, (key, value))
+        if items:
+            pairs.extend(zip(items[::2], items[1::2]))
+        if not pairs:
+            raise DataError("'hset' with no key value pairs")
+        fields = self._container(name, dict)
+        added = 0
+        for field, val in pairs:
+            field, val = _encode(field), _encode(val)
+            old = fields.get(field)
+            if old is None:
+                added += 1
+                self._account(name, len(field) + len(val) + _ITEM_OVERHEAD)
+            else:
+                self._account(name, len(val) - len(old))
+            fields[field] = val
+        return added
+
+    @_command(write=True)
+    def hsetnx(self, name: str, key, value) -> bool:
+        fields = self._lookup(name, dict)
+        if fields is not None and _encode(key) in fields:
+            return False
+        return bool(self.hset(name, key, value))
+
+    @_command()
+    def hget(self, name: str, key) -> Optional[str]:
+        return (self._lookup(name, dict, read=True) or {}).get(_encode(key))
+
+    @_command()
+    def hmget(self, name: str, keys, *args) -> list[Optional[str]]:
+        fields = self._lookup(name, dict, read=True) or {}
+        return [fields.get(_encode(k)) for k in _keys_arg(keys, args)]
+
+    @_command()
+    def hgetall(self, name: str) -> dict[str, str]:
+        return dict(self._lookup(name, dict, read=True) or {})
+
+    @_command(write=True, grows=False)
+    def hdel(self, name: str, *keys) -> int:
+        fields = self._lookup(name, dict)
+        if fields is None:
+            return 0
+        removed = 0
+        for key in map(_encode, keys):
+            old = fields.pop(key, None)
+            if old is not None:
+                removed += 1
+                self._account(name, -(len(key) + len(old) + _ITEM_OVERHEAD))
+        self._drop_if_empty(name, fields)
+        return removed
+
+    @_command()
+    def hexists(self, name: str, key) -> bool:
+        return _encode(key) in (self._lookup(name, dict) or {})
+
+    @_command()
+    def hlen(self, name: str) -> int:
+        return len(self._lookup(name, dict) or {})
+
+    @_command()
+    def hkeys(self, name: str) -> list[str]:
+        return list(self._lookup(name, dict) or {})
+
+    @_command()
+    def hvals(self, name: str) -> list[str]:
+        return list((self._lookup(name, dict) or {}).values())
+
+    @_command(write=True)
+    def hincrby(self, name: str, key, amount: int = 1) -> int:
+        value = _as_int((self._lookup(name, dict) or {}).get(_encode(key))) + int(amount)
+        self.hset(name, key, str(value))
+        return value
+
+    @_command(write=True)
+    def hincrbyfloat(self, name: str, key, amount: float = 1.0) -> float:
+        value = _as_float((self._lookup(name, dict) or {}).get(_encode(key))) + float(amount)
+        self.hset(name, key, _format_float(value))
+        return value
+
+    # ── sets ──────────────────────────────────────────────────────
+    @_command(write=True)
+    def sadd(self, name: str, *values) -> int:
+        members = self._container(name, set)
+        added = 0
+        for value in map(_encode, values):
+            if value not in members:
+                members.add(value)
+                added += 1
+                self._account(name, len(value) + _ITEM_OVERHEAD)
+        return added
+
+    @_command(write=True, grows=False)
+    def srem(self, name: str, *values) -> int:
+        members = self._lookup(name, set)
+        if members is None:
+            return 0
+        removed = 0
+        for value in map(_encode, values):
+            if value in members:
+                members.discard(value)
+                removed += 1
+                self._account(name, -(len(value) + _ITEM_OVERHEAD))
+        self._drop_if_empty(name, members)
+        return removed
+
+    @_command()
+    def smembers(self, name: str) -> "set[str]":
+        return set(self._lookup(name, set, read=True) or ())
+
+    @_command()
+    def sismember(self, name: str, value) -> bool:
+        return _encode(value) in (self._lookup(name, set) or ())
+
+    @_command()
+    def scard(self, name: str) -> int:
+        return len(self._lookup(name, set) or ())
+
+    @_command(write=True, grows=False)
+    def spop(self, name: str, count: Optional[int] = None):
+        members = self._lookup(name, set)
+        if not members:
+            return [] if count is not None else None
+        picked = random.sample(sorted(members), min(count or 1, len(members)))
+        self.srem(name, *picked)
+        return picked if count is not None else picked[0]
+
+    @_command()
+    def sinter(self, keys, *args) -> "set[str]":
+        sets = [self._lookup(k, set) or set() for k in _keys_arg(keys, args)]
+        return set.intersection(*sets) if sets else set()
+
+    @_command()
+    def sunion(self, keys, *args) -> "set[str]":
+        sets = [self._lookup(k, set) or set() for k in _keys_arg(keys, args)]
+        return set().union(*sets)
+
+    def sscan_iter(self, name: str, match: Optional[str] = None,
+                   count: Optional[int] = None) -> Iterator[str]:
+        return iter([m for m in self.smembers(name)
+                     if match is None or fnmatch.fnmatchcase(m, match)])
+
+    # ── sorted sets ───────────────────────────────────────────────
+    @_command(write=True)
+    def zadd(self, name: str, mapping: dict, nx: bool = False, xx: bool = False,
+             ch: bool = False, incr: bool = False):
+        if nx and xx:
+            raise DataError("ZADD allows either 'nx' or 'xx', not both")
+        if incr and len(mapping) != 1:
+            raise DataError("ZADD option 'incr' only works when passing a single "
+                            "element/score pair")
+        zset = self._lookup(name, _ZSet)
+        if zset is None and xx:
+            return None if incr else 0
+        zset = zset if zset is not None else self._container(name, _ZSet)
+        added = changed = 0
+        result = None
+        for member, score in mapping.items():
+            member, score = _encode(member), float(score)
+            old = zset.scores.get(member)
+            if (nx and old is not None) or (xx and old is None):
+                continue
+            if incr:
+                score += old or 0.0
+                result = score
+            if old is None:
+                added += 1
+                self._account(name, len(member) + _ITEM_OVERHEAD)
+            elif old != score:
+                changed += 1
+            zset.add(member, score)
+        self._drop_if_empty(name, zset)
+        if incr:
+            return result
+        return added + changed if ch else added
+
+    @_command(write=True)
+    def zincrby(self, name: str, amount: float, value) -> float:
+        return self.zadd(name, {value: amount}, incr=True)
+
+    @_command(write=True, grows=False)
+    def zrem(self, name: str, *values) -> int:
+        zset = self._lookup(name, _ZSet)
+        if zset is None:
+            return 0
+        removed = 0
+        for value in map(_encode, values):
+            if zset.remove(value):
+                removed += 1
+                self._account(name, -(len(value) + _ITEM_OVERHEAD))
+        self._drop_if_empty(name, zset)
+        return removed
+
+    @_command()
+    def zscore(self, name: str, value) -> Optional[float]:
+        return (self._lookup(name, _ZSet, read=True) or _ZSet()).scores.get(_encode(value))
+
+    @_command()
+    def zcard(self, name: str) -> int:
+        return len(self._lookup(name, _ZSet) or ())
+
+    @_command()
+    def zcount(self, name: str, min, max) -> int:
+        low, high = _score_bound(min), _score_bound(max)
+        zset = self._lookup(name, _ZSet) or _ZSet()
+        return sum(1 for score, _ in zset.order if _in_range(score, low, high))
+
+    @staticmethod
+    def _pairs(entries: Iterable[tuple[float, str]], withscores: bool,
+               score_cast_func=float) -> list:
+        if withscores:
+            return [(member, score_cast_func(score)) for score, member in entries]
+        return [member for _, member in entries]
+
+    @_command()
+    def zrange(self, name: str, start: int, end: int, desc: bool = False,
+               withscores: bool = False, score_cast_func=float) -> list:
+        zset = self._lookup(name, _ZSet, read=True)
+        if not zset:
+            return []
+        order = zset.order[::-1] if desc else zset.order
+        bounds = _slice(start, end, len(order))
+        return self._pairs(order[slice(*bounds)] if bounds else [], withscores,
+                           score_cast_func)
+
+    def zrevrange(self, name: str, start: int, end: int, withscores: bool = False,
+                  score_cast_func=float) -> list:
+        return self.zrange(name, start, end, desc=True, withscores=withscores,
+                           score_cast_func=score_cast_func)
+
+    @_command()
+    def zrangebyscore(self, name: str, min, max, start: Optional[int] = None,
+                      num: Optional[int] = None, withscores: bool = False,
+                      score_cast_func=float) -> list:
+        low, high = _score_bound(min), _score_bound(max)
+        zset = self._lookup(name, _ZSet, read=True) or _ZSet()
+        entries = [e for e in zset.order if _in_range(e[0], low, high)]
+        if start is not None:
+            entries = entries[start:start + num if num is not None and num >= 0 else None]
+        return self._pairs(entries, withscores, score_cast_func)
+
+    @_command()
+    def zrevrangebyscore(self, name: str, max, min, start: Optional[int] = None,
+                         num: Optional[int] = None, withscores: bool = False,
+                         score_cast_func=float) -> list:
+        low, high = _score_bound(min), _score_bound(max)
+        zset = self._lookup(name, _ZSet, read=True) or _ZSet()
+        entries = [e for e in reversed(zset.order) if _in_range(e[0], low, high)]
+        if start is not None:
+            entries = entries[start:start + num if num is not None and num >= 0 else None]
+        return self._pairs(entries, withscores, score_cast_func)
+
+    @_command()
+    def zrank(self, name: str, value) -> Optional[int]:
+        zset = self._lookup(name, _ZSet)
+        member = _encode(value)
+        if not zset or member not in zset.scores:
+            return None
+        return bisect.bisect_left(zset.order, (zset.scores[member], member))
+
+    @_command()
+    def zrevrank(self, name: str, value) -> Optional[int]:
+        rank = self.zrank(name, value)
+        return None if rank is None else len(self._lookup(name, _ZSet)) - 1 - rank
+
+    @_command(write=True, grows=False)
+    def zremrangebyscore(self, name: str, min, max) -> int:
+        low, high = _score_bound(min), _score_bound(max)
+        zset = self._lookup(name, _ZSet)
+        if zset is None:
+            return 0
+        doomed = [m for score, m in zset.order if _in_range(score, low, high)]
+        return self.zrem(name, *doomed) if doomed else 0
+
+    def _zpop(self, name: str, count: Optional[int], highest: bool) -> list:
+        zset = self._lookup(name, _ZSet)
+        if not zset:
+            return []
+        n = min(count or 1, len(zset))
+        entries = zset.order[-n:][::-1] if highest else zset.order[:n]
+        self.zrem(name, *[m for _, m in entries])
+        return [(member, score) for score, member in entries]
+
+    @_command(write=True, grows=False)
+    def zpopmin(self, name: str, count: Optional[int] = None) -> list:
+        return self._zpop(name, count, highest=False)
+
+    @_command(write=True, grows=False)
+    def zpopmax(self, name: str, count: Optional[int] = None) -> list:
+        return self._zpop(name, count, highest=True)
+
+    # ── pipelines, pub/sub, info ──────────────────────────────────
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self, transaction)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> MemoryPubSub:
+        return MemoryPubSub(self, ignore_subscribe_messages)
+
+    @_command()
+    def publish(self, channel: str, message) -> int:
+        subscribers = self._subscribers.get(channel, ())
+        for sub in subscribers:
+            sub._queue.put({"type": "message", "pattern": None,
+                            "channel": channel, "data": _encode(message)})
+        return len(subscribers)
+
+    @_command()
+    def info(self, section: Optional[str] = None) -> dict:
+        return {
+            "redis_mode": "memory",
+            "used_memory": self.used_memory,
+            "maxmemory": self.max_memory_bytes,
+            "maxmemory_policy": self.eviction_policy,
+            "keys": len(self._data),
+            "expires": len(self._expires),
+            "expired_keys": self.expired_keys,
+            "evicted_keys": self.evicted_keys,
+            "keyspace_hits": self.hits,
+            "keyspace_misses": self.misses,
+        }
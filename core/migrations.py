@@ -0,0 +1,184 @@
+"""
+core/migrations.py — versioned schema migrations for the SQLite database.
+
+Base.metadata.create_all() only creates missing tables; it never alters
+an existing one.  Every change to an existing table is therefore a
+numbered migration here, applied once and recorded in schema_version:
+
+    MIGRATIONS = [
+        Migration(1, "outbox and photo columns", _m001_columns),
+        ...
+    ]
+
+Rules: append new migrations with the next number, never edit one that
+has shipped, and keep each step idempotent (IF NOT EXISTS / column
+checks) — SQLite runs DDL outside the surrounding transaction, so a
+step interrupted half-way must be safe to re-run.  Indexes are declared
+on the models too, so fresh databases get them from create_all.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl_type: str) -> None:
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+# ── Migrations ────────────────────────────────────────────────────
+
+def _m001_columns(conn: Connection) -> None:
+    """Columns added since the original schema (outbox, photo storage)."""
+    for column, ddl_type in [
+        ("subject", "VARCHAR"), ("cc_email", "VARCHAR"),
+        ("image_path", "VARCHAR"), ("message_id", "VARCHAR"),
+        ("attempts", "INTEGER"), ("next_attempt_at", "DATETIME"),
+        ("last_error", "TEXT"), ("created_at", "DATETIME"),
+    ]:
+        _add_column(conn, "work_orders", column, ddl_type)
+    for column, ddl_type in [
+        ("thumbnail_url", "VARCHAR"), ("image_sha256", "VARCHAR"),
+        ("image_phash", "VARCHAR"), ("duplicate_of", "VARCHAR"),
+    ]:
+        _add_column(conn, "complaints", column, ddl_type)
+
+
+def _m002_hot_filter_indexes(conn: Connection) -> None:
+    """Indexes for the feed, analytics, clustering and outbox queries."""
+    for ddl in (
+        # /complaints with no filter; date-range scans (analytics, trends).
+        # The feed indexes end in id so (submitted_at, id) keyset pages
+        # are read straight from the index, with no sort step.
+        "CREATE INDEX IF NOT EXISTS ix_complaints_submitted_at "
+        "ON complaints (submitted_at, id)",
+        # /complaints?status=…, ordered newest first
+        "CREATE INDEX IF NOT EXISTS ix_complaints_status_submitted "
+        "ON complaints (status, submitted_at, id)",
+        # /complaints?issue_type=… (find_nearby_complaints: see 003)
+        "CREATE INDEX IF NOT EXISTS ix_complaints_type_submitted "
+        "ON complaints (issue_type, submitted_at, id)",
+        # open complaints by priority (analytics agent, escalation) —
+        # partial, so it only holds the small open fraction of the table
+        "CREATE INDEX IF NOT EXISTS ix_complaints_open_priority "
+        "ON complaints (priority, submitted_at) WHERE status = 'open'",
+        # outbox: due pending/sending work orders
+        "CREATE INDEX IF NOT EXISTS ix_work_orders_outbox "
+        "ON work_orders (next_attempt_at) WHERE status IN ('pending', 'sending')",
+    ):
+        conn.execute(text(ddl))
+    # Give the planner row-count statistics for the new indexes
+    conn.execute(text("ANALYZE"))
+
+
+def _m003_complaint_geohash(conn: Connection) -> None:
+    """Geohash column + (issue_type, geohash, submitted_at) for radius queries."""
+    from core.database import GEOHASH_PRECISION
+    from core.geo import geohash_encode
+
+    _add_column(conn, "complaints", "geohash", "VARCHAR")
+    conn.connection.driver_connection.create_function(
+        "geohash_encode", 3, geohash_encode, deterministic=True)
+    conn.execute(text(
+        "UPDATE complaints SET geohash = geohash_encode(lat, lng, :p) "
+        "WHERE geohash IS NULL AND lat IS NOT NULL AND lng IS NOT NULL"),
+        {"p": GEOHASH_PRECISION})
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_complaints_type_geohash "
+        "ON complaints (issue_type, geohash, submitted_at)"))
+    conn.execute(text("ANALYZE complaints"))
+
+
+def _m004_backfill_queue(conn: Connection) -> None:
+    """backfill column + partial index for bulk-ingested rows awaiting enrichment."""
+    _add_column(conn, "complaints", "backfill", "VARCHAR")
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_complaints_backfill "
+        "ON complaints (submitted_at) WHERE backfill IS NOT NULL"))
+    conn.execute(text("ANALYZE complaints"))
+
+
+def _m005_complaint_rollups(conn: Connection) -> None:
+    """Fill complaint_rollups (table created by create_all) from existing rows."""
+    from core.database import rebuild_rollups
+    rebuild_rollups(conn)
+
+
+def _m006_archive_indexes(conn: Connection) -> None:
+    """Indexes for archival: resolved/closed rows by age, work orders by
+    complaint.  Age is COALESCE(resolved_at, submitted_at) so closed rows
+    that never got a resolved_at are archived too."""
+    for ddl in (
+        "CREATE INDEX IF NOT EXISTS ix_complaints_archivable "
+        "ON complaints (COALESCE(resolved_at, submitted_at)) "
+        "WHERE status IN ('resolved', 'closed')",
+        "CREATE INDEX IF NOT EXISTS ix_work_orders_complaint "
+        "ON work_orders (complaint_id)",
+    ):
+        conn.execute(text(ddl))
+    conn.execute(text("ANALYZE"))
+
+
+def _m007_phash_index(conn: Connection) -> None:
+    """Photo hashes by geohash, for the near-duplicate index's read-through
+    to rows other workers saved."""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_complaints_phash_geohash "
+        "ON complaints (geohash, submitted_at) WHERE image_phash IS NOT NULL"))
+    conn.execute(text("ANALYZE complaints"))
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "outbox and photo columns", _m001_columns),
+    Migration(2, "hot-filter indexes", _m002_hot_filter_indexes),
+    Migration(3, "complaint geohash", _m003_complaint_geohash),
+    Migration(4, "bulk ingestion backfill queue", _m004_backfill_queue),
+    Migration(5, "complaint rollups", _m005_complaint_rollups),
+    Migration(6, "archive indexes", _m006_archive_indexes),
+    Migration(7, "photo hash index", _m007_phash_index),
+]
+
+
+# ── Runner ────────────────────────────────────────────────────────
+
+def current_version(conn: Connection) -> int:
+    return conn.execute(text(
+        "SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar_one()
+
+
+def run_migrations(engine: Engine, migrations: list[Migration] = MIGRATIONS) -> int:
+    """Apply pending migrations in order; returns the resulting version."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            " version INTEGER PRIMARY KEY,"
+            " name VARCHAR NOT NULL,"
+            " applied_at DATETIME NOT NULL)"))
+        version = current_version(conn)
+
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= version:
+            continue
+        with engine.begin() as conn:
+            migration.apply(conn)
+            conn.execute(text(
+                "INSERT OR IGNORE INTO schema_version (version, name, applied_at) "
+                "VALUES (:v, :n, :t)"),
+                {"v": migration.version, "n": migration.name, "t": datetime.now(timezone.utc).replace(tzinfo=None)})
+        logger.info("✓ Applied migration %03d: %s", migration.version, migration.name)
+        version = migration.version
+    return version
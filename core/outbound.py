@@ -0,0 +1,392 @@
+"""
+core/outbound.py — shared client for outbound calls to public OSM services.
+
+Nominatim, the OSRM demo server and Overpass are free services with
+strict usage policies (Nominatim: 1 request/second).  Every call from
+tools/maps_tools.py goes through ``outbound`` so that:
+
+  • each upstream host has its own rate limit, shared by all uvicorn
+    workers through redis_client (GCRA in a Lua script; a local lock
+    when running on the in-memory dev store);
+  • identical in-flight requests are coalesced — N callers wait on one
+    upstream call and share its result (or its exception);
+  • a caller whose turn would come after its deadline fails fast with
+    RateLimitTimeout instead of queueing behind the limit;
+  • connections are pooled and kept alive per host (HTTP/2 when `h2`
+    is installed), so most calls skip the TCP + TLS handshake.
+
+    data = outbound.get_json("https://nominatim.openstreetmap.org/search",
+                             params={...}, deadline_s=3)
+
+The API is synchronous; async handlers reach it through
+run_blocking("osm", ...), whose pool keeps the event loop free.
+"""
+import importlib.util
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from core.config import settings
+from core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "CiviqAI/1.0 (civic-complaint-platform)"
+
+
+class RateLimitTimeout(Exception):
+    """The host's rate limit would delay this call past its deadline."""
+
+    def __init__(self, host: str, wait_s: float, deadline_s: float):
+        super().__init__(f"{host}: next slot in {wait_s:.1f}s exceeds "
+                         f"the {deadline_s:.1f}s deadline")
+        self.host = host
+        self.wait_s = wait_s
+        self.deadline_s = deadline_s
+
+
+# ── Rate limiting (GCRA) ──────────────────────────────────────────
+# Each host keeps a theoretical arrival time (TAT).  A call reserves the
+# next slot: it may start once now >= TAT - (burst-1)*interval, and
+# pushes TAT forward by one interval.  Reservations that would have to
+# wait longer than max_wait are refused without consuming a slot.
+
+_GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tau = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local wait = tat - tau - now
+if wait < 0 then wait = 0 end
+if wait > max_wait then return -wait end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now + 1000)
+return wait
+"""
+
+
+@dataclass
+class HostLimit:
+    rate_per_s: float
+    burst: int = 1
+    max_connections: int = 0        # 0 → OUTBOUND_POOL_SIZE
+
+    @property
+    def interval_ms(self) -> int:
+        return int(1000 / self.rate_per_s)
+
+
+class RateLimiter:
+    """Per-host GCRA limiter; shared via Redis when it is available."""
+
+    def __init__(self, store=redis_client):
+        self._store = store
+        self._script = None
+        if hasattr(store, "register_script"):
+            self._script = store.register_script(_GCRA_LUA)
+        self._lock = threading.Lock()
+        self._local_tat: dict[str, float] = {}
+
+    def _reserve_local(self, host: str, limit: HostLimit, max_wait_ms: int) -> int:
+        now = time.time() * 1000
+        interval = limit.interval_ms
+        tau = (limit.burst - 1) * interval
+        with self._lock:
+            tat = max(self._local_tat.get(host, now), now)
+            wait = max(0, tat - tau - now)
+            if wait > max_wait_ms:
+                return -int(wait)
+            self._local_tat[host] = tat + interval
+        return int(wait)
+
+    def reserve(self, host: str, limit: HostLimit, max_wait_s: float) -> float:
+        """Reserve the next slot for ``host``; returns seconds to wait.
+
+        Raises RateLimitTimeout (without reserving) if that wait would
+        exceed ``max_wait_s``.
+        """
+        max_wait_ms = int(max_wait_s * 1000)
+        wait_ms = None
+        if self._script is not None:
+            try:
+                wait_ms = int(self._script(
+                    keys=[f"ratelimit:{host}"],
+                    args=[limit.interval_ms, (limit.burst - 1) * limit.interval_ms,
+                          max_wait_ms]))
+            except Exception as e:
+                logger.debug("Shared rate limiter unavailable (%s): %s", host, e)
+        if wait_ms is None:
+            wait_ms = self._reserve_local(host, limit, max_wait_ms)
+        if wait_ms < 0:
+            raise RateLimitTimeout(host, -wait_ms / 1000, max_wait_s)
+        return wait_ms / 1000
+
+
+# ── Single-flight ─────────────────────────────────────────────────
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key onto one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        """Run ``fn`` or join the in-flight call for ``key``.
+
+        Returns (result, shared) — ``shared`` is True for callers that
+        got another caller's result.  Exceptions propagate to everyone.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+# ── Connection pools ──────────────────────────────────────────────
+# One httpx client per upstream host, so each host gets its own pool
+# size.  Connections are kept alive between calls, and HTTP/2 is used
+# when the optional `h2` package is installed (httpx[http2]).  A trace
+# hook records TCP connect and TLS handshake times, so /metrics shows
+# how often calls reuse a warm connection.
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+class HostStats:
+    """Per-host counters, updated from tool threads and the event loop."""
+
+    __slots__ = ("requests", "coalesced", "rejected", "errors",
+                 "throttled", "wait_s", "upstream_s",
+                 "connections", "connect_s", "tls_handshakes", "tls_s",
+                 "http_versions", "_lock")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = self.coalesced = self.rejected = 0
+        self.errors = self.throttled = 0
+        self.wait_s = self.upstream_s = 0.0
+        self.connections = self.tls_handshakes = 0
+        self.connect_s = self.tls_s = 0.0
+        self.http_versions: dict[str, int] = {}
+
+    def add(self, **deltas: float) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def count_version(self, version: str) -> None:
+        with self._lock:
+            self.http_versions[version] = self.http_versions.get(version, 0) + 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return self._as_dict()
+
+    def _as_dict(self) -> dict:
+        upstream = self.requests - self.coalesced - self.rejected
+        reused = max(0, upstream - self.connections)
+        return {
+            "requests": self.requests,
+            "upstream_calls": upstream,
+            "coalesced": self.coalesced,
+            "rejected_deadline": self.rejected,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "avg_wait_ms": round(self.wait_s / upstream * 1000, 1) if upstream > 0 else 0.0,
+            "avg_upstream_ms": round(self.upstream_s / upstream * 1000, 1) if upstream > 0 else 0.0,
+            "connections_opened": self.connections,
+            "connection_reuse_rate": round(reused / upstream, 3) if upstream > 0 else 0.0,
+            "avg_connect_ms": round(self.connect_s / self.connections * 1000, 1)
+                              if self.connections else 0.0,
+            "avg_tls_handshake_ms": round(self.tls_s / self.tls_handshakes * 1000, 1)
+                                    if self.tls_handshakes else 0.0,
+            "http_versions": dict(self.http_versions),
+        }
+
+
+class _Trace:
+    """httpcore trace hook that times TCP connects and TLS handshakes."""
+
+    def __init__(self, stats: HostStats):
+        self.stats = stats
+        self._started: dict[str, float] = {}
+
+    def _record(self, event: str) -> None:
+        name, _, phase = event.rpartition(".")
+        if phase == "started":
+            self._started[name] = time.perf_counter()
+        elif phase == "complete" and name in self._started:
+            elapsed = time.perf_counter() - self._started.pop(name)
+            if name == "connection.connect_tcp":
+                self.stats.add(connections=1, connect_s=elapsed)
+            elif name == "connection.start_tls":
+                self.stats.add(tls_handshakes=1, tls_s=elapsed)
+
+    def __call__(self, event: str, info: dict) -> None:
+        self._record(event)
+
+
+# ── Outbound client ───────────────────────────────────────────────
+
+class OutboundClient:
+    """Rate-limited, coalescing, connection-pooled HTTP client for the
+    OSM upstreams."""
+
+    def __init__(self, limits: dict[str, HostLimit],
+                 default_deadline_s: float = settings.OUTBOUND_DEADLINE_S,
+                 limiter: Optional[RateLimiter] = None):
+        self.limits = limits
+        self.default_deadline_s = default_deadline_s
+        self.limiter = limiter or RateLimiter()
+        self.flights = SingleFlight()
+        self._stats: dict[str, HostStats] = {}
+        self._stats_lock = threading.Lock()
+        self._clients: dict[str, httpx.Client] = {}
+
+    def _host_stats(self, host: str) -> HostStats:
+        with self._stats_lock:
+            return self._stats.setdefault(host, HostStats())
+
+    def _pool_kwargs(self, host: str) -> dict:
+        limit = self.limits.get(host)
+        size = (limit.max_connections if limit and limit.max_connections
+                else settings.OUTBOUND_POOL_SIZE)
+        return {
+            "http2": HTTP2,
+            "limits": httpx.Limits(max_connections=size,
+                                   max_keepalive_connections=size,
+                                   keepalive_expiry=settings.OUTBOUND_KEEPALIVE_S),
+            "headers": {"User-Agent": USER_AGENT},
+        }
+
+    def _client(self, host: str) -> httpx.Client:
+        client = self._clients.get(host)
+        if client is None:
+            with self._stats_lock:
+                client = self._clients.get(host)
+                if client is None:
+                    client = self._clients[host] = httpx.Client(**self._pool_kwargs(host))
+        return client
+
+    @staticmethod
+    def _key(method: str, url: str, params, data) -> str:
+        return json.dumps([method.upper(), url, params, data],
+                          sort_keys=True, default=str)
+
+    def _reserve(self, host: str, stats: HostStats,
+                 deadline_s: Optional[float]) -> float:
+        limit = self.limits.get(host)
+        if limit is None:
+            return 0.0
+        deadline = self.default_deadline_s if deadline_s is None else deadline_s
+        try:
+            wait = self.limiter.reserve(host, limit, deadline)
+        except RateLimitTimeout:
+            stats.add(rejected=1)
+            raise
+        if wait > 0:
+            stats.add(throttled=1, wait_s=wait)
+        return wait
+
+    @staticmethod
+    def _finish(resp: httpx.Response, stats: HostStats) -> httpx.Response:
+        stats.count_version(resp.http_version)
+        resp.raise_for_status()
+        return resp
+
+    def request(self, method: str, url: str, *,
+                params: Optional[dict] = None,
+                data: Optional[dict] = None,
+                timeout: float = 5,
+                deadline_s: Optional[float] = None) -> httpx.Response:
+        """Send one request through the host's limiter, coalescing
+        identical concurrent requests.  The response must be treated as
+        read-only, since coalesced callers share it."""
+        host = urlsplit(url).hostname or ""
+        stats = self._host_stats(host)
+        stats.add(requests=1)
+
+        def _leader():
+            wait = self._reserve(host, stats, deadline_s)
+            if wait:
+                time.sleep(wait)
+            started = time.perf_counter()
+            try:
+                resp = self._client(host).request(
+                    method, url, params=params, data=data, timeout=timeout,
+                    extensions={"trace": _Trace(stats)})
+                return self._finish(resp, stats)
+            except Exception:
+                stats.add(errors=1)
+                raise
+            finally:
+                stats.add(upstream_s=time.perf_counter() - started)
+
+        resp, shared = self.flights.do(self._key(method, url, params, data), _leader)
+        if shared:
+            stats.add(coalesced=1)
+        return resp
+
+    def get_json(self, url: str, params: Optional[dict] = None, **kw) -> Any:
+        return self.request("GET", url, params=params, **kw).json()
+
+    def post_json(self, url: str, data: Optional[dict] = None, **kw) -> Any:
+        return self.request("POST", url, data=data, **kw).json()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"http2": HTTP2,
+                    "hosts": {host: s.as_dict() for host, s in self._stats.items()}}
+
+    def close(self) -> None:
+        """Close every pooled connection (called on app shutdown)."""
+        for client in list(self._clients.values()):
+            client.close()
+        self._clients.clear()
+
+
+outbound = OutboundClient({
+    "nominatim.openstreetmap.org": HostLimit(settings.NOMINATIM_RATE_PER_S, max_connections=2),
+    "router.project-osrm.org":     HostLimit(settings.OSRM_RATE_PER_S, max_connections=2),
+    "overpass-api.de":             HostLimit(settings.OVERPASS_RATE_PER_S, max_connections=2),
+})
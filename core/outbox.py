@@ -0,0 +1,270 @@
+"""
+core/outbox.py — background dispatcher for queued work-order emails.
+
+The complaint pipeline commits the complaint and a 'pending' WorkOrderDB
+row in one transaction and returns immediately.  OutboxDispatcher drains
+those rows in the background: it claims due rows with a lease (so several
+uvicorn workers never send the same row twice), sends them through Gmail
+at a capped rate, and retries failures with exponential backoff until
+OUTBOX_MAX_ATTEMPTS is reached, after which the row is marked 'failed'.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import bindparam, func, or_
+
+from core.config import settings
+from core.database import SessionLocal, WorkOrderDB
+from core.executors import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Rendered as literals so SQLite can match the partial index
+# ix_work_orders_outbox (WHERE status IN ('pending', 'sending')).
+_ACTIVE = bindparam("outbox_active", ["pending", "sending"],
+                    expanding=True, literal_execute=True)
+
+
+# ── Outbox storage helpers (run on the sqlite pool) ───────────────
+
+def claim_due_work_orders(limit: int, lease_s: float) -> list[dict]:
+    """Lease up to ``limit`` due work orders and return their payloads.
+
+    A row is due when it is 'pending' and its next_attempt_at has passed,
+    or when it is stuck in 'sending' after its lease expired (the worker
+    that claimed it died).  Each claim is a conditional UPDATE, so only
+    one dispatcher wins a given row.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        candidates = db.query(WorkOrderDB.id).filter(
+            WorkOrderDB.status.in_(_ACTIVE),
+            or_(WorkOrderDB.next_attempt_at.is_(None),
+                WorkOrderDB.next_attempt_at <= now)
+        ).order_by(WorkOrderDB.next_attempt_at).limit(limit).all()
+
+        claimed = []
+        lease_until = now + timedelta(seconds=lease_s)
+        for (wo_id,) in candidates:
+            won = db.query(WorkOrderDB).filter(
+                WorkOrderDB.id == wo_id,
+                WorkOrderDB.status.in_(("pending", "sending")),
+                or_(WorkOrderDB.next_attempt_at.is_(None),
+                    WorkOrderDB.next_attempt_at <= now)
+            ).update({"status": "sending", "next_attempt_at": lease_until},
+                     synchronize_session=False)
+            if won:
+                claimed.append(wo_id)
+        db.commit()
+
+        rows = db.query(WorkOrderDB).filter(WorkOrderDB.id.in_(claimed)).all()
+        return [{
+            "id":           wo.id,
+            "complaint_id": wo.complaint_id,
+            "to":           wo.dept_email,
+            "cc":           wo.cc_email,
+            "subject":      wo.subject,
+            "html_body":    wo.email_body,
+            "image_path":   wo.image_path,
+            "attempts":     wo.attempts or 0,
+        } for wo in rows]
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def mark_work_order_sent(work_order_id: str, message_id: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        db.query(WorkOrderDB).filter(WorkOrderDB.id == work_order_id).update({
+            "status": "sent",
+            "message_id": message_id,
+            "sent_at": datetime.utcnow(),
+            "attempts": WorkOrderDB.attempts + 1,
+            "next_attempt_at": None,
+            "last_error": None,
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def mark_work_order_failed(work_order_id: str, error: str,
+                           retry_at: Optional[datetime]) -> None:
+    """Record a failed attempt; ``retry_at=None`` gives up on the row."""
+    db = SessionLocal()
+    try:
+        db.query(WorkOrderDB).filter(WorkOrderDB.id == work_order_id).update({
+            "status": "pending" if retry_at else "failed",
+            "attempts": WorkOrderDB.attempts + 1,
+            "next_attempt_at": retry_at,
+            "last_error": error[:1000],
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_work_orders_by_status() -> dict:
+    db = SessionLocal()
+    try:
+        rows = db.query(WorkOrderDB.status, func.count(WorkOrderDB.id)).filter(
+            WorkOrderDB.status.in_(("pending", "sending", "failed"))
+        ).group_by(WorkOrderDB.status).all()
+        return {status: n for status, n in rows}
+    finally:
+        db.close()
+
+
+# ── Dispatcher ────────────────────────────────────────────────────
+
+class OutboxDispatcher:
+    """Drains the work-order outbox with retry, backoff and a send-rate cap."""
+
+    def __init__(self,
+                 poll_interval_s: float = settings.OUTBOX_POLL_INTERVAL_S,
+                 batch_size: int = settings.OUTBOX_BATCH_SIZE,
+                 max_attempts: int = settings.OUTBOX_MAX_ATTEMPTS,
+                 backoff_base_s: float = settings.OUTBOX_BACKOFF_BASE_S,
+                 backoff_max_s: float = settings.OUTBOX_BACKOFF_MAX_S,
+                 lease_s: float = settings.OUTBOX_LEASE_S,
+                 rate_per_min: int = settings.OUTBOX_SEND_RATE_PER_MIN):
+        self.poll_interval_s = poll_interval_s
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.lease_s = lease_s
+        self.min_send_gap_s = 60.0 / rate_per_min if rate_per_min > 0 else 0.0
+
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake = asyncio.Event()
+        self._next_send_at = 0.0
+
+        self.sent = 0
+        self.failed_attempts = 0
+        self.dead = 0
+        self._latencies_ms: deque = deque(maxlen=200)
+
+    # -- lifecycle -----------------------------------------------------
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="outbox-dispatcher")
+            logger.info("✓ Outbox dispatcher started (%.0f sends/min cap)",
+                        60.0 / self.min_send_gap_s if self.min_send_gap_s else 0)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self) -> None:
+        """Wake the dispatcher early (safe to call from any thread)."""
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # -- draining ------------------------------------------------------
+    async def _run(self) -> None:
+        while True:
+            try:
+                drained = await self.drain_once()
+            except Exception as e:
+                logger.error("Outbox drain failed: %s", str(e)[:200])
+                drained = 0
+            if drained:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def drain_once(self) -> int:
+        """Claim one batch of due work orders and try to send each."""
+        batch = await run_blocking("sqlite", claim_due_work_orders,
+                                   self.batch_size, self.lease_s)
+        for wo in batch:
+            await self._throttle()
+            await self._send(wo)
+        return len(batch)
+
+    async def _throttle(self) -> None:
+        now = time.monotonic()
+        if now < self._next_send_at:
+            await asyncio.sleep(self._next_send_at - now)
+        self._next_send_at = max(now, self._next_send_at) + self.min_send_gap_s
+
+    async def _send(self, wo: dict) -> None:
+        from tools.gmail_tools import gmail_send_work_order
+        started = time.perf_counter()
+        try:
+            result = await run_blocking(
+                "gmail", gmail_send_work_order,
+                to=wo["to"],
+                complaint_id=str(wo["complaint_id"]),
+                subject=wo["subject"],
+                html_body=wo["html_body"],
+                image_path=wo["image_path"],
+                cc=wo["cc"]
+            )
+        except Exception as e:
+            self.failed_attempts += 1
+            attempt = wo["attempts"] + 1
+            if attempt >= self.max_attempts:
+                self.dead += 1
+                retry_at = None
+                logger.error("  ✗ Work order %s failed permanently after %d attempts: %s",
+                             wo["id"], attempt, str(e)[:120])
+            else:
+                delay = min(self.backoff_max_s,
+                            self.backoff_base_s * 2 ** (attempt - 1))
+                retry_at = datetime.utcnow() + timedelta(seconds=delay)
+                logger.warning("  ⚠ Work order %s attempt %d failed (%s); retry in %.0fs",
+                               wo["id"], attempt, str(e)[:120], delay)
+            await run_blocking("sqlite", mark_work_order_failed,
+                               wo["id"], str(e), retry_at)
+            return
+
+        self._latencies_ms.append((time.perf_counter() - started) * 1000)
+        self.sent += 1
+        await run_blocking("sqlite", mark_work_order_sent,
+                           wo["id"], result.get("message_id"))
+        logger.info("  ✓ Work order %s sent for complaint #%s",
+                    wo["id"], wo["complaint_id"])
+
+    # -- metrics -------------------------------------------------------
+    def stats(self) -> dict:
+        counts = count_work_orders_by_status()
+        latencies = list(self._latencies_ms)
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        return {
+            "running": bool(self._task and not self._task.done()),
+            "queue_depth": counts.get("pending", 0) + counts.get("sending", 0),
+            "in_flight": counts.get("sending", 0),
+            "failed_total": counts.get("failed", 0),
+            "sent": self.sent,
+            "failed_attempts": self.failed_attempts,
+            "dead_lettered": self.dead,
+            "send_latency_ms": {
+                "last": round(latencies[-1], 1) if latencies else 0.0,
+                "avg": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "p95": round(p95, 1),
+            },
+        }
+
+outbox_dispatcher = OutboxDispatcher()
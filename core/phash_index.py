@@ -0,0 +1,254 @@
+"""
+core/phash_index.py — perceptual-hash index for near-duplicate photos.
+
+Each complaint photo gets a 64-bit difference hash (dHash).  Photos of
+the same pothole from slightly different angles land within a few bits
+of each other, so near-duplicates are found by Hamming distance.
+
+The index buckets complaints by geohash cell (sized so a radius query
+only touches the 3×3 neighbourhood) and keeps a BK-tree per cell.  A
+lookup therefore walks a handful of small trees instead of scanning the
+whole table, and stays fast with hundreds of thousands of photos.
+
+The trees live in each worker's memory, so a worker does not see photos
+another worker saved after it warmed up.  When a lookup finds nothing
+locally, load_near() reads the same 3×3 cells from SQLite (partial index
+ix_complaints_phash_geohash) and the lookup is repeated.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from core.config import settings
+from core.geo import geohash_encode, geohash_neighbors, haversine_m, precision_for_radius
+
+logger = logging.getLogger(__name__)
+
+
+def dhash_image(img, hash_size: int = 8) -> int:
+    """64-bit difference hash of an already-decoded Pillow image."""
+    from PIL import Image
+    gray = img.convert("L").resize((hash_size + 1, hash_size),
+                                   Image.Resampling.LANCZOS)
+    px = list(gray.getdata())
+    bits = 0
+    width = hash_size + 1
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left, right = px[row * width + col], px[row * width + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def dhash(image_path: str, hash_size: int = 8) -> Optional[int]:
+    """64-bit difference hash of an image file, or None if undecodable."""
+    try:
+        from PIL import Image, ImageOps
+        with Image.open(image_path) as img:
+            return dhash_image(ImageOps.exif_transpose(img), hash_size)
+    except Exception as e:
+        logger.info("     Could not compute perceptual hash: %s", str(e)[:100])
+        return None
+
+
+def phash_to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def phash_from_hex(value: str) -> int:
+    return int(value, 16)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard–Keller tree over 64-bit hashes with Hamming distance."""
+
+    __slots__ = ("_root", "size")
+
+    def __init__(self):
+        # node = [hash, [items...], {distance: child_node}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def add(self, value: int, item) -> None:
+        self.size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> list[tuple[int, object]]:
+        """All (distance, item) pairs within ``max_distance`` of ``value``."""
+        if self._root is None:
+            return []
+        found, stack = [], [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= max_distance:
+                found.extend((d, item) for item in node[1])
+            lo, hi = d - max_distance, d + max_distance
+            for dist, child in node[2].items():
+                if lo <= dist <= hi:
+                    stack.append(child)
+        return found
+
+    def items(self):
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            for item in node[1]:
+                yield node[0], item
+            stack.extend(node[2].values())
+
+
+class PhashIndex:
+    """Geohash-bucketed BK-trees of complaint photo hashes."""
+
+    def __init__(self, radius_m: float = settings.PHASH_RADIUS_M,
+                 window_days: int = settings.PHASH_WINDOW_DAYS):
+        self.radius_m = radius_m
+        self.window = timedelta(days=window_days)
+        self.precision = precision_for_radius(radius_m)
+        self._cells: dict[str, BKTree] = {}
+        self._ids: set[str] = set()
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        self.lookups = 0
+        self.matches = 0
+        self.db_loads = 0
+
+    def __len__(self) -> int:
+        return sum(t.size for t in self._cells.values())
+
+    def add(self, complaint_id: str, phash: int, lat: float, lng: float,
+            submitted_at: Optional[datetime] = None) -> None:
+        cell = geohash_encode(lat, lng, self.precision)
+        item = (complaint_id, lat, lng, submitted_at or datetime.utcnow())
+        with self._lock:
+            if complaint_id in self._ids:
+                return
+            self._ids.add(complaint_id)
+            self._cells.setdefault(cell, BKTree()).add(phash, item)
+        if time.monotonic() - self._last_prune > 3600:
+            self.prune()
+
+    def nearest(self, phash: int, lat: float, lng: float,
+                max_distance: int = settings.PHASH_MAX_DISTANCE,
+                radius_m: Optional[float] = None,
+                since: Optional[datetime] = None) -> list[dict]:
+        """Photos within ``max_distance`` bits, ``radius_m`` metres and the
+        time window, closest hash first (ties broken by distance)."""
+        radius_m = min(radius_m or self.radius_m, self.radius_m)
+        since = since or datetime.utcnow() - self.window
+        results = []
+        with self._lock:
+            self.lookups += 1
+            for cell in geohash_neighbors(geohash_encode(lat, lng, self.precision)):
+                tree = self._cells.get(cell)
+                if tree is None:
+                    continue
+                for bits, (cid, clat, clng, at) in tree.search(phash, max_distance):
+                    if at < since:
+                        continue
+                    meters = haversine_m(lat, lng, clat, clng)
+                    if meters <= radius_m:
+                        results.append({"complaint_id": cid, "hamming": bits,
+                                        "distance_m": round(meters, 1),
+                                        "submitted_at": at})
+            if results:
+                self.matches += 1
+        results.sort(key=lambda r: (r["hamming"], r["distance_m"]))
+        return results
+
+    def load_near(self, lat: float, lng: float) -> int:
+        """Add photos in the 3×3 cells around (lat, lng) that this worker
+        has not seen (saved by other workers); returns how many."""
+        from core.database import SessionLocal, ComplaintDB
+        from sqlalchemy import and_, or_
+        cells = geohash_neighbors(geohash_encode(lat, lng, self.precision))
+        since = datetime.utcnow() - self.window
+        db = SessionLocal()
+        try:
+            rows = db.query(ComplaintDB.id, ComplaintDB.image_phash,
+                            ComplaintDB.lat, ComplaintDB.lng,
+                            ComplaintDB.submitted_at).filter(
+                # the partial-index condition inside each OR term, so every
+                # cell's range is read from ix_complaints_phash_geohash
+                or_(*[and_(ComplaintDB.image_phash.isnot(None),
+                           ComplaintDB.geohash >= cell, ComplaintDB.geohash < cell + "~")
+                      for cell in cells]),
+                ComplaintDB.submitted_at >= since
+            ).all()
+        finally:
+            db.close()
+        with self._lock:
+            self.db_loads += 1
+            new = [row for row in rows if row[0] not in self._ids]
+        for cid, ph, clat, clng, at in new:
+            self.add(cid, phash_from_hex(ph), clat, clng, at)
+        return len(new)
+
+    def prune(self) -> None:
+        """Drop entries older than the window (BK-trees are rebuilt per cell)."""
+        cutoff = datetime.utcnow() - self.window
+        with self._lock:
+            for cell, tree in list(self._cells.items()):
+                kept = BKTree()
+                for value, item in tree.items():
+                    if item[3] >= cutoff:
+                        kept.add(value, item)
+                    else:
+                        self._ids.discard(item[0])
+                if kept.size:
+                    self._cells[cell] = kept
+                else:
+                    del self._cells[cell]
+            self._last_prune = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "cells": len(self._cells),
+                "lookups": self.lookups, "matches": self.matches,
+                "db_loads": self.db_loads}
+
+
+phash_index = PhashIndex()
+
+
+def load_phash_index(index: PhashIndex = phash_index) -> int:
+    """Warm the index from complaints inside the time window."""
+    from core.database import SessionLocal, ComplaintDB
+    since = datetime.utcnow() - index.window
+    db = SessionLocal()
+    try:
+        rows = db.query(ComplaintDB.id, ComplaintDB.image_phash,
+                        ComplaintDB.lat, ComplaintDB.lng,
+                        ComplaintDB.submitted_at).filter(
+            ComplaintDB.image_phash.isnot(None),
+            ComplaintDB.lat.isnot(None),
+            ComplaintDB.lng.isnot(None),
+            ComplaintDB.submitted_at >= since
+        ).yield_per(5000)
+        count = 0
+        for cid, ph, lat, lng, at in rows:
+            index.add(cid, phash_from_hex(ph), lat, lng, at)
+            count += 1
+    finally:
+        db.close()
+    logger.info("✓ Perceptual-hash index loaded: %d photos", count)
+    return count
@@ -0,0 +1,71 @@
+"""
+core/pipeline.py — minimal async stage graph.
+
+A stage is an async function that receives a dict with the results of
+the stages it depends on.  Every stage is scheduled as its own task and
+starts as soon as its dependencies finish, so independent branches
+(e.g. image analysis and geocoding) overlap instead of running serially.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+StageFn = Callable[[dict], Awaitable[Any]]
+
+
+class StageGraph:
+    """Dependency graph of async stages.
+
+    Stages must be registered after the stages they depend on, which
+    keeps the graph acyclic by construction:
+
+        graph = StageGraph()
+
+        @graph.stage("analysis")
+        async def analysis(_): ...
+
+        @graph.stage("save", "analysis")
+        async def save(deps): deps["analysis"] ...
+    """
+
+    def __init__(self):
+        self._stages: dict[str, tuple[tuple[str, ...], StageFn]] = {}
+
+    def stage(self, name: str, *deps: str) -> Callable[[StageFn], StageFn]:
+        def register(fn: StageFn) -> StageFn:
+            self.add(name, fn, deps)
+            return fn
+        return register
+
+    def add(self, name: str, fn: StageFn, deps: tuple[str, ...] = ()) -> None:
+        if name in self._stages:
+            raise ValueError(f"Stage '{name}' already registered")
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (tuple(deps), fn)
+
+    async def run(self) -> dict[str, Any]:
+        """Run every stage; return {stage_name: result}.
+
+        If any stage raises, the remaining stages are cancelled and the
+        exception propagates to the caller.
+        """
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def _run(name: str, deps: tuple[str, ...], fn: StageFn):
+            inputs = {dep: await tasks[dep] for dep in deps}
+            return await fn(inputs)
+
+        for name, (deps, fn) in self._stages.items():
+            tasks[name] = asyncio.create_task(_run(name, deps, fn),
+                                              name=f"stage:{name}")
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for t in tasks.values():
+                t.cancel()
+            raise
+        return {name: t.result() for name, t in tasks.items()}
@@ -1,37 +1,19 @@
 import json
 import logging
-from typing import Optional
+import uuid
+from typing import Iterable, Optional
+
+from core.config import settings
+from core.memory_store import MemoryStore, WatchError
 
 logger = logging.getLogger(__name__)
 
 # ── In-memory fallback store (works without Redis server) ─────────
-# Acts like Redis but uses a plain dict.  When a real Redis is
-# available the app can be switched back by uncommenting the
-# redis.Redis() block below.
+# core/memory_store.py speaks the redis-py API with TTLs, pipelines,
+# maxmemory eviction and a lock per command, so dev / Windows setups
+# run the same code paths as production.
 # ------------------------------------------------------------------
 
-class _MemoryStore:
-    """Minimal Redis-compatible dict for dev / Windows environments."""
-    def __init__(self):
-        self._data: dict[str, str] = {}
-
-    def set(self, key: str, value: str):
-        self._data[key] = value
-
-    def get(self, key: str) -> Optional[str]:
-        return self._data.get(key)
-
-    def keys(self, pattern: str = "*") -> list[str]:
-        import fnmatch
-        return [k for k in self._data if fnmatch.fnmatch(k, pattern)]
-
-    def ping(self):
-        return True
-
-    def flushdb(self):
-        self._data.clear()
-
-
 # Try real Redis first, fall back to in-memory
 _use_memory = True
 try:
@@ -42,7 +24,6 @@ try:
     _s.close()
     # Port is open — try real Redis
     import redis as _redis_lib
-    from core.config import settings
     _real = _redis_lib.Redis(
         host=settings.REDIS_HOST, port=settings.REDIS_PORT,
         db=0, decode_responses=True,
@@ -56,31 +37,163 @@ except Exception as _e:
     pass
 
 if _use_memory:
-    redis_client = _MemoryStore()
+    redis_client = MemoryStore(
+        max_memory_bytes=settings.MEMORY_STORE_MAX_BYTES,
+        eviction_policy=settings.MEMORY_STORE_EVICTION_POLICY,
+        expire_interval_s=settings.MEMORY_STORE_EXPIRE_INTERVAL_S,
+    )
     logger.warning("⚠ Redis unavailable — using in-memory store (dev mode)")
 
 
 # ── Municipality helpers ──────────────────────────────────────────
 
+# Every municipality:<key>:<category> string is also a member of
+#   idx:municipality                       all directory keys
+#   idx:municipality:category:<category>   directory keys per category
+# so enumeration never needs KEYS (which blocks Redis for O(keyspace)).
+# Both sets are kept in the same MULTI as the write; data written by
+# older code without them is found by a SCAN fallback that re-indexes it.
+
+_MUNI_INDEX = "idx:municipality"
+_MUNI_CATEGORY_INDEX = "idx:municipality:category:{}"
+_MGET_CHUNK = 500
+
+def _municipality_key(ward: str, category: str) -> str:
+    return f"municipality:{ward.lower().replace(' ', '_')}:{category}"
+
 def set_municipality(ward: str, category: str, data: dict) -> None:
-    key = f"municipality:{ward.lower().replace(' ', '_')}:{category}"
-    redis_client.set(key, json.dumps(data))
+    key = _municipality_key(ward, category)
+    with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(key, json.dumps(data))
+        pipe.sadd(_MUNI_INDEX, key)
+        pipe.sadd(_MUNI_CATEGORY_INDEX.format(category), key)
+        pipe.execute()
+
+def delete_municipality(ward: str, category: str) -> None:
+    key = _municipality_key(ward, category)
+    with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.srem(_MUNI_INDEX, key)
+        pipe.srem(_MUNI_CATEGORY_INDEX.format(category), key)
+        pipe.execute()
 
 def get_municipality(ward: str, category: str) -> Optional[dict]:
-    key = f"municipality:{ward.lower().replace(' ', '_')}:{category}"
+    key = _municipality_key(ward, category)
     val = redis_client.get(key)
     if val is None:
         return None
     return json.loads(str(val))
 
+# Bumped on every directory change; core/directory.py rebuilds its
+# in-process index when the version moves or an invalidation arrives.
+DIRECTORY_VERSION_KEY = "directory:version"
+DIRECTORY_CHANNEL = "directory:invalidate"
+
+def bump_directory_version() -> int:
+    """Mark the municipal directory as changed (call after writing it)."""
+    version = redis_client.incr(DIRECTORY_VERSION_KEY)
+    redis_client.publish(DIRECTORY_CHANNEL, str(version))
+    return version
+
+def get_directory_version() -> int:
+    return int(redis_client.get(DIRECTORY_VERSION_KEY) or 0)
+
+def municipality_keys(category: Optional[str] = None) -> list[str]:
+    """Directory keys (optionally one category's) from the index sets.
+
+    If idx:municipality is empty it falls back to a non-blocking SCAN
+    and indexes what it finds, so a directory written before the sets
+    existed heals on first read."""
+    index = _MUNI_CATEGORY_INDEX.format(category) if category else _MUNI_INDEX
+    keys = redis_client.smembers(index)
+    if keys:
+        return sorted(keys)
+    if category and redis_client.scard(_MUNI_INDEX):
+        return []                     # indexed directory, empty category
+    # Re-index the whole directory, not just this category, so no
+    # index set is left partial
+    keys = list(redis_client.scan_iter(match=_municipality_key("*", "*"), count=1000))
+    if keys:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.sadd(_MUNI_INDEX, key)
+                pipe.sadd(_MUNI_CATEGORY_INDEX.format(key.rsplit(":", 1)[1]), key)
+            pipe.execute()
+        logger.info("✓ Indexed %d municipality keys found by SCAN", len(keys))
+    return sorted(k for k in keys if category is None or k.rsplit(":", 1)[1] == category)
+
+def mget_json(keys: list[str]) -> list[Optional[dict]]:
+    """JSON values for many string keys, MGET in chunks (None if missing)."""
+    values: list = []
+    for i in range(0, len(keys), _MGET_CHUNK):
+        values.extend(redis_client.mget(keys[i:i + _MGET_CHUNK]))
+    return [json.loads(v) if v else None for v in values]
+
+def get_municipalities(category: Optional[str] = None) -> dict[str, dict]:
+    """{directory key: entry} for the whole directory or one category."""
+    keys = municipality_keys(category)
+    return {k: v for k, v in zip(keys, mget_json(keys)) if v is not None}
+
 def get_all_municipalities() -> list:
-    keys = redis_client.keys("municipality:*")
-    results = []
-    for k in keys:
-        val = redis_client.get(str(k))
-        if val:
-            results.append(json.loads(str(val)))
-    return results
+    return list(get_municipalities().values())
+
+def bulk_set_municipalities(entries: Iterable[tuple[str, str, dict]],
+                            chunk_size: int = _MGET_CHUNK,
+                            prune: bool = False) -> dict:
+    """Write many (ward, category, data) directory entries.
+
+    Each chunk costs two round trips: one MGET to diff against what is
+    stored, then one MULTI that SETs only the changed keys (with their
+    index-set entries).  Re-loading the same data writes nothing.  With
+    ``prune``, directory keys absent from ``entries`` are deleted.  The
+    directory version is bumped once, at the end, and only if anything
+    changed.  Returns counts: received / written / unchanged / deleted."""
+    report = {"received": 0, "written": 0, "unchanged": 0, "deleted": 0}
+    seen: set[str] = set()
+
+    def flush(chunk: list) -> None:
+        stored = redis_client.mget([key for key, _, _ in chunk])
+        changed = [(key, category, data)
+                   for (key, category, data), old in zip(chunk, stored)
+                   if old is None or json.loads(old) != data]
+        if changed:
+            with redis_client.pipeline(transaction=True) as pipe:
+                for key, category, data in changed:
+                    pipe.set(key, json.dumps(data))
+                    pipe.sadd(_MUNI_INDEX, key)
+                    pipe.sadd(_MUNI_CATEGORY_INDEX.format(category), key)
+                pipe.execute()
+        report["written"] += len(changed)
+        report["unchanged"] += len(chunk) - len(changed)
+
+    chunk: list = []
+    for ward, category, data in entries:
+        key = _municipality_key(ward, category)
+        report["received"] += 1
+        if key in seen:                  # later rows win within one load
+            chunk = [c for c in chunk if c[0] != key]
+        seen.add(key)
+        chunk.append((key, category, data))
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    if prune:
+        stale = [key for key in municipality_keys() if key not in seen]
+        for i in range(0, len(stale), chunk_size):
+            with redis_client.pipeline(transaction=True) as pipe:
+                for key in stale[i:i + chunk_size]:
+                    pipe.delete(key)
+                    pipe.srem(_MUNI_INDEX, key)
+                    pipe.srem(_MUNI_CATEGORY_INDEX.format(key.rsplit(":", 1)[1]), key)
+                pipe.execute()
+        report["deleted"] = len(stale)
+
+    if report["written"] or report["deleted"]:
+        report["version"] = bump_directory_version()
+    return report
 
 
 # ── SEED the 3 municipalities on import ────────────────────────────
@@ -123,11 +236,10 @@ _DEPT_NAMES = {
     "parks":       "Parks & Environment",
 }
 
-def _seed_municipalities():
-    count = 0
+def _seed_entries():
     for key, muni in _MUNICIPALITIES.items():
         for cat in _CATEGORIES:
-            data = {
+            yield key, cat, {
                 "ward": key,
                 "zone": muni["zone"],
                 "area": muni["area"],
@@ -140,9 +252,12 @@ def _seed_municipalities():
                 "lat": muni["lat"],
                 "lng": muni["lng"],
             }
-            set_municipality(key, cat, data)
-            count += 1
-    logger.info("✓ Seeded %d municipality entries (Avadi, Tambaram, Kancheepuram)", count)
+
+def _seed_municipalities():
+    # Diffed against Redis, so restarts rewrite nothing and keep the version
+    report = bulk_set_municipalities(_seed_entries())
+    logger.info("✓ Seeded %d municipality entries (Avadi, Tambaram, Kancheepuram), "
+                "%d changed", report["received"], report["written"])
 
 _seed_municipalities()
 
@@ -167,24 +282,29 @@ def cache_official_email(municipality_key: str, email: str) -> None:
 
 # ── Status change log ──────────────────────────────────────────────
 # Tracks every status transition for complaints.
-# Key: "status_log:<complaint_id>" → JSON array of transitions.
+# Key: "status_history:<complaint_id>" → Redis list, one JSON entry per
+# transition.  RPUSH appends atomically in O(1), so concurrent updates
+# never lose an entry.  Older deployments kept a JSON array string at
+# "status_log:<complaint_id>"; migrate_status_logs() converts those.
 # ------------------------------------------------------------------
 
+_HISTORY_KEY = "status_history:{}"
+_LEGACY_LOG_KEY = "status_log:{}"
+_HISTORY_MIGRATED = "migrations:status_history"
+_HISTORY_MIGRATION_LOCK = "migrations:status_history:lock"
+_HISTORY_MIGRATION_LOCK_TTL_S = 300
+
 def log_status_change(complaint_id: str, old_status: str,
                       new_status: str, changed_by: str = "officer") -> dict:
     """Append a status change entry to the complaint's history."""
     from datetime import datetime
-    key = f"status_log:{complaint_id}"
-    existing = redis_client.get(key)
-    history: list = json.loads(existing) if existing else []
     entry = {
         "from": old_status,
         "to": new_status,
         "changed_by": changed_by,
         "timestamp": datetime.utcnow().isoformat(),
     }
-    history.append(entry)
-    redis_client.set(key, json.dumps(history))
+    redis_client.rpush(_HISTORY_KEY.format(complaint_id), json.dumps(entry))
     logger.info("  Status log: %s  %s → %s (by %s)",
                 complaint_id, old_status, new_status, changed_by)
     return entry
@@ -192,8 +312,64 @@ def log_status_change(complaint_id: str, old_status: str,
 
 def get_status_history(complaint_id: str) -> list:
     """Get full status change history for a complaint."""
-    key = f"status_log:{complaint_id}"
-    existing = redis_client.get(key)
-    if not existing:
-        return []
-    return json.loads(existing)
+    return get_status_histories([complaint_id])[complaint_id]
+
+
+def get_status_histories(complaint_ids: list[str]) -> dict[str, list]:
+    """Histories for many complaints in one round trip (pipelined LRANGE)."""
+    with redis_client.pipeline(transaction=False) as pipe:
+        for cid in complaint_ids:
+            pipe.lrange(_HISTORY_KEY.format(cid), 0, -1)
+        rows = pipe.execute()
+    return {cid: [json.loads(entry) for entry in entries]
+            for cid, entries in zip(complaint_ids, rows)}
+
+
+def delete_status_history(*complaint_ids: str) -> None:
+    """Drop the status logs of complaints (after they are archived)."""
+    if complaint_ids:
+        redis_client.delete(*(key.format(cid) for cid in complaint_ids
+                              for key in (_HISTORY_KEY, _LEGACY_LOG_KEY)))
+
+
+def migrate_status_logs() -> int:
+    """Convert legacy status_log:<id> JSON blobs into status_history:<id>
+    lists, keeping any entries already appended to the list after them.
+
+    Called from the app lifespan.  Runs once per Redis database (marker
+    key); concurrent workers are kept out by a SET NX lock, and each blob
+    is converted under WATCH, so even a worker that outlives the lock
+    cannot push a blob's entries twice.  Returns blobs converted."""
+    if redis_client.get(_HISTORY_MIGRATED):
+        return 0
+    token = uuid.uuid4().hex
+    if not redis_client.set(_HISTORY_MIGRATION_LOCK, token, nx=True,
+                            ex=_HISTORY_MIGRATION_LOCK_TTL_S):
+        logger.info("Status log conversion already running in another process")
+        return 0
+    converted = 0
+    try:
+        for key in list(redis_client.scan_iter(match=_LEGACY_LOG_KEY.format("*"), count=500)):
+            cid = key.split(":", 1)[1]
+            with redis_client.pipeline(transaction=True) as pipe:
+                try:
+                    pipe.watch(key)
+                    blob = pipe.get(key)
+                    if blob is None:
+                        continue                # converted meanwhile
+                    entries = [json.dumps(e) for e in json.loads(blob)]
+                    pipe.multi()
+                    if entries:
+                        pipe.lpush(_HISTORY_KEY.format(cid), *reversed(entries))
+                    pipe.delete(key)
+                    pipe.execute()
+                except WatchError:
+                    continue                    # someone else converted it
+            converted += 1
+        redis_client.set(_HISTORY_MIGRATED, "1")
+    finally:
+        if redis_client.get(_HISTORY_MIGRATION_LOCK) == token:
+            redis_client.delete(_HISTORY_MIGRATION_LOCK)
+    if converted:
+        logger.info("✓ Converted %d status logs to Redis lists", converted)
+    return converted
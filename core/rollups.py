@@ -0,0 +1,115 @@
+"""
+core/rollups.py — read API over the complaint_rollups table.
+
+complaint_rollups holds one row per day × zone × ward × issue_type ×
+status × priority × severity bucket.  core/database.py keeps it current
+on every ORM flush, and core/ingest.py on bulk inserts, so these queries
+cost O(buckets) however many complaints there are:
+
+    rollup_counts(["zone", "issue_type"], days=30)
+    rollup_counts(["status"], days=7, bucket="day")
+    dashboard_stats(days=30)
+
+If the table ever drifts (manual SQL against complaints, a restored
+backup), rebuild it with `python seed/rebuild_rollups.py`.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+
+from core.database import (SessionLocal, ComplaintRollupDB, ROLLUP_DIMENSIONS,
+                           engine, rebuild_rollups)
+from core.unit_of_work import read_session
+
+# Bucket label formats, identical to the hour/day/week labels of
+# tools/db_tools.get_trend_data (the rollups hold whole days only).
+ROLLUP_BUCKETS = {
+    "day":  "%Y-%m-%d",
+    "week": "%Y-W%W",
+}
+
+
+def _since_day(days: int) -> str:
+    return (datetime.utcnow() - timedelta(days=days)).date().isoformat()
+
+
+def rollup_counts(group_by: list[str], days: Optional[int] = None,
+                  bucket: Optional[str] = None, **filters) -> list[dict]:
+    """Counts grouped by ``group_by`` dimensions (and an optional day /
+    week bucket) over the last ``days`` days, largest first within each
+    bucket.  ``filters`` are equality filters on dimensions,
+    e.g. status="open"."""
+    unknown = [d for d in list(group_by) + list(filters) if d not in ROLLUP_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown rollup dimensions: {', '.join(unknown)}")
+    if bucket and bucket not in ROLLUP_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(ROLLUP_BUCKETS)}")
+
+    columns = [getattr(ComplaintRollupDB, d).label(d) for d in group_by]
+    if bucket:
+        columns.insert(0, func.strftime(ROLLUP_BUCKETS[bucket],
+                                        ComplaintRollupDB.day).label("bucket"))
+    count = func.sum(ComplaintRollupDB.count).label("count")
+
+    with read_session() as db:
+        q = db.query(*columns, count)
+        if days is not None:
+            q = q.filter(ComplaintRollupDB.day >= _since_day(days),
+                         ComplaintRollupDB.day != "unknown")
+        for name, value in filters.items():
+            q = q.filter(getattr(ComplaintRollupDB, name) == value)
+        if columns:
+            q = q.group_by(*columns)
+        q = q.order_by(columns[0], count.desc()) if bucket else q.order_by(count.desc())
+        return [dict(row._mapping) for row in q.all()]
+
+
+def dashboard_stats(days: Optional[int] = None) -> dict:
+    """KPI counters for the dashboards: totals by status / zone / issue
+    type / priority, open P1s, resolution rate and mean resolution time."""
+    db = SessionLocal()
+    try:
+        q = db.query(ComplaintRollupDB.status, ComplaintRollupDB.zone,
+                     ComplaintRollupDB.issue_type, ComplaintRollupDB.priority,
+                     func.sum(ComplaintRollupDB.count),
+                     func.sum(ComplaintRollupDB.resolution_s),
+                     func.sum(ComplaintRollupDB.resolution_n))
+        if days is not None:
+            q = q.filter(ComplaintRollupDB.day >= _since_day(days),
+                         ComplaintRollupDB.day != "unknown")
+        rows = q.group_by(ComplaintRollupDB.status, ComplaintRollupDB.zone,
+                          ComplaintRollupDB.issue_type,
+                          ComplaintRollupDB.priority).all()
+    finally:
+        db.close()
+
+    total, open_p1, res_s, res_n = 0, 0, 0.0, 0
+    by = {"status": {}, "zone": {}, "issue_type": {}, "priority": {}}
+    for status, zone, issue_type, priority, n, secs, resolved_n in rows:
+        total += n
+        res_s += secs or 0.0
+        res_n += resolved_n or 0
+        for name, value in (("status", status), ("zone", zone),
+                            ("issue_type", issue_type), ("priority", priority)):
+            by[name][value] = by[name].get(value, 0) + n
+        if status == "open" and priority == "P1":
+            open_p1 += n
+
+    done = by["status"].get("resolved", 0) + by["status"].get("closed", 0)
+    return {
+        "days": days,
+        "total": total,
+        "open_p1": open_p1,
+        "resolution_rate": round(done / total, 3) if total else 0.0,
+        "avg_resolution_hours": round(res_s / res_n / 3600, 1) if res_n else None,
+        **{f"by_{name}": dict(sorted(counts.items(), key=lambda kv: -kv[1]))
+           for name, counts in by.items()},
+    }
+
+
+def rebuild() -> int:
+    """Recompute every bucket from complaints and complaint_archive in
+    one transaction."""
+    with engine.begin() as conn:
+        return rebuild_rollups(conn)
@@ -0,0 +1,155 @@
+"""
+core/unit_of_work.py — one transaction for all the writes of one request.
+
+The write tools in tools/db_tools.py (save_complaint, update_complaint_status,
+save_cluster, save_work_order) each commit on their own, so an agent run
+that saves a complaint, clusters it, records its work order and sets its
+status costs four or five transactions — and fsyncs — and a failure
+halfway leaves the complaint partly written.  Inside a unit of work they
+share one session instead, and everything commits once at the end:
+
+    with unit_of_work():
+        async for event in runner.run_async(...):   # agents call db_tools
+            ...
+
+The session is ambient (a context variable) rather than an argument
+because ADK builds each tool's schema from its signature.  Contexts are
+copied into run_blocking pools and tasks, so tools called there join too;
+concurrent requests each get their own.
+
+Read tools take read_session(), which inside a unit of work is the same
+session, flushed first, so an agent sees what earlier tools in its run
+wrote.  Writes are not flushed until then (or the final commit), so a run
+that only writes holds the SQLite write lock for the final flush only.
+Side effects that announce a write — SSE pushes — go through on_commit()
+and fire only once the unit of work has committed.
+
+All or nothing: if any write tool fails, the unit of work rolls back and
+raises UnitOfWorkFailed, so the request returns an error instead of an
+agent reply naming ids that were never stored.  If the final commit fails,
+unit_of_work() rolls back and re-raises.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class UnitOfWorkFailed(Exception):
+    """A write tool failed, so the unit of work was rolled back."""
+
+
+class UnitOfWork:
+    def __init__(self):
+        self.session: Session = SessionLocal(autoflush=False)
+        self.failed = False
+        self.writes = 0
+        self.after_commit: list[Callable[[], None]] = []
+
+
+_current: ContextVar[Optional[UnitOfWork]] = ContextVar("unit_of_work", default=None)
+
+
+def current_unit_of_work() -> Optional[UnitOfWork]:
+    return _current.get()
+
+
+@contextmanager
+def unit_of_work() -> Iterator[UnitOfWork]:
+    """Share one session between every db tool called in this context
+    and commit it once on exit.  Nested calls join the outer unit."""
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+    uow = UnitOfWork()
+    token = _current.set(uow)
+    try:
+        yield uow
+        if uow.failed:
+            raise UnitOfWorkFailed(
+                f"a write failed; rolled back all {uow.writes} writes of the run")
+        uow.session.commit()
+    except Exception:
+        uow.session.rollback()
+        raise
+    finally:
+        _current.reset(token)
+        uow.session.close()
+    for callback in uow.after_commit:
+        try:
+            callback()
+        except Exception as e:
+            logger.warning("After-commit callback failed: %s", e)
+
+
+@contextmanager
+def write_session() -> Iterator[Session]:
+    """Session for one write tool call.
+
+    Inside a unit of work this is the shared session, left uncommitted;
+    otherwise a fresh session committed on exit.  Either way an exception
+    rolls back everything the transaction holds, then propagates."""
+    uow = _current.get()
+    if uow is not None:
+        uow.writes += 1
+        try:
+            yield uow.session
+        except Exception:
+            uow.failed = True
+            raise
+        return
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@contextmanager
+def read_session() -> Iterator[Session]:
+    """Session for one read tool call: the unit of work's, flushed so its
+    pending writes are visible, or a fresh one closed on exit."""
+    uow = _current.get()
+    if uow is not None:
+        try:
+            uow.session.flush()
+        except Exception:
+            uow.failed = True
+            raise
+        yield uow.session
+        return
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def on_commit(callback: Callable[[], None]) -> None:
+    """Run ``callback`` once the current unit of work commits (dropped if
+    it rolls back), or right away outside one."""
+    uow = _current.get()
+    if uow is None:
+        callback()
+    else:
+        uow.after_commit.append(callback)
+
+
+def get_pending(db: Session, model, pk):
+    """db.get that also finds rows added earlier in the same unit of work,
+    which stay unflushed until it commits."""
+    for obj in db.new:
+        if isinstance(obj, model) and obj.id == pk:
+            return obj
+    return db.get(model, pk)
@@ -0,0 +1,172 @@
+"""
+core/upload_store.py — content-addressed storage for complaint photos.
+
+Uploads are streamed to disk in chunks while a SHA-256 is computed, then
+moved to a hash-sharded path:
+
+    uploads/ab/cd/abcd1234….jpg
+
+Two citizens uploading different files with the same name no longer
+overwrite each other, and identical photos are stored once.
+
+Starlette spools the whole multipart body before the endpoint runs, so
+the UPLOAD_MAX_BYTES check in store_stream alone would only reject a
+file after all of it had arrived.  RequestBodyLimit enforces the limit
+on the request stream itself: by Content-Length up front, otherwise by
+counting bytes as they are received.
+"""
+import json
+import hashlib
+import logging
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from core.config import settings
+from core.executors import run_blocking
+
+logger = logging.getLogger(__name__)
+
+_TMP_DIR = ".tmp"
+_EXT_RE = re.compile(r"^[a-z0-9]{1,5}$")
+_EXT_ALIASES = {"jpeg": "jpg", "jpe": "jpg", "tif": "tiff"}
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds UPLOAD_MAX_BYTES."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes / (1024 * 1024):.1f} MB limit")
+        self.max_bytes = max_bytes
+
+
+class RequestBodyLimit:
+    """ASGI middleware: answer 413 as soon as a request body on one of
+    ``limits``' paths (path → max bytes) exceeds its limit."""
+
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        state = {"started": False, "rejected": False}
+
+        async def limited_receive():
+            nonlocal received
+            if state["rejected"]:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    state["rejected"] = True
+                    if not state["started"]:
+                        await self._reject(send, limit)
+                        state["started"] = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if state["rejected"]:
+                return                      # already answered 413
+            state["started"] = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+    @staticmethod
+    async def _reject(send, limit: int) -> None:
+        logger.warning("Request body rejected: over %d bytes", limit)
+        body = json.dumps({"error": str(UploadTooLarge(limit))}).encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode()),
+                                (b"connection", b"close")]})
+        await send({"type": "http.response.body", "body": body})
+
+
+@dataclass
+class StoredUpload:
+    sha256: str
+    path: str            # filesystem path of the stored file
+    url: str             # relative URL served by the /uploads static mount
+    size: int
+    deduplicated: bool   # True if an identical file was already stored
+
+
+def _extension(filename: str | None) -> str:
+    ext = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    ext = _EXT_ALIASES.get(ext, ext)
+    return ext if _EXT_RE.match(ext) else "jpg"
+
+
+def shard_path(sha256: str, ext: str, root: str | None = None) -> str:
+    """uploads/ab/cd/<hash>.<ext> for a given digest."""
+    root = root or settings.UPLOAD_DIR
+    return os.path.join(root, sha256[:2], sha256[2:4], f"{sha256}.{ext}")
+
+
+def store_stream(src: BinaryIO, filename: str | None,
+                 root: str | None = None,
+                 max_bytes: int | None = None,
+                 chunk_size: int | None = None) -> StoredUpload:
+    """Copy ``src`` to content-addressed storage in fixed-size chunks."""
+    root = root or settings.UPLOAD_DIR
+    max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_BYTES
+
+    tmp_dir = os.path.join(root, _TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+
+        sha = digest.hexdigest()
+        final_path = shard_path(sha, _extension(filename), root)
+        deduplicated = os.path.exists(final_path)
+        if deduplicated:
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    rel = os.path.relpath(final_path, root).replace(os.sep, "/")
+    return StoredUpload(sha256=sha, path=final_path, url=f"uploads/{rel}",
+                        size=size, deduplicated=deduplicated)
+
+
+async def save_upload(upload) -> StoredUpload:
+    """Store a FastAPI ``UploadFile`` without loading it into memory."""
+    await upload.seek(0)
+    stored = await run_blocking("files", store_stream, upload.file, upload.filename)
+    logger.info("Image stored: %s (%d bytes%s)", stored.path, stored.size,
+                ", duplicate" if stored.deduplicated else "")
+    return stored
@@ -5,6 +5,10 @@ import { MapPin, Layers } from 'lucide-react';
 import axios from 'axios';
 
 const BASE = process.env.REACT_APP_API_URL || 'http://localhost:8080';
+// Pins only need these fields; pages are followed via X-Next-Cursor
+const PIN_FIELDS = 'id,lat,lng,status,issue_type,location_text';
+const PAGE_SIZE  = 2000;
+const MAX_PINS   = 20000;
 
 const STATUS_COLORS = {
   open:        '#ef4444',
@@ -45,8 +49,16 @@ export default function ClusterMap({ sseEvents }) {
   useEffect(() => {
     const fetch = async () => {
       try {
-        const { data } = await axios.get(`${BASE}/complaints`);
-        setComplaints(data);
+        const pins = [];
+        let cursor;
+        do {
+          const { data, headers } = await axios.get(`${BASE}/complaints`, {
+            params: { fields: PIN_FIELDS, limit: PAGE_SIZE, cursor },
+          });
+          pins.push(...data);
+          cursor = headers['x-next-cursor'];
+        } while (cursor && pins.length < MAX_PINS);
+        setComplaints(pins);
       } catch (e) {
         console.error('Failed to fetch complaints:', e);
       }
@@ -50,7 +50,7 @@ export default function ComplaintCard({ complaint, onClick }) {
       {/* Image */}
       {complaint.image_url && (
         <img
-          src={`${BASE}/${complaint.image_url}`}
+          src={`${BASE}/${complaint.thumbnail_url || complaint.image_url}`}
           alt="complaint"
           className="w-full h-36 object-cover rounded-lg mb-2"
           onError={(e) => {
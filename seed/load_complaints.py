@@ -0,0 +1,65 @@
+# seed/load_complaints.py — bulk-load complaints from NDJSON / CSV / JSON files
+#
+#   python seed/load_complaints.py data/complaints_seed.json
+#   python seed/load_complaints.py export.ndjson other.csv --batch-size 10000
+#   python seed/load_complaints.py export.csv --backfill     # enrich now, too
+#
+# Incomplete rows are queued for the server's backfill worker; --backfill
+# drains that queue here instead (geocoding is rate-limited to ~1/s).
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import settings                         # noqa: E402
+from core.database import init_db                        # noqa: E402
+from core.ingest import FORMATS, detect_format, ingest_file  # noqa: E402
+
+
+async def drain_backfill():
+    from core.backfill import BackfillWorker, count_backfill_pending
+    from core.executors import shutdown_pools
+
+    worker = BackfillWorker()
+    try:
+        while await worker.drain_once():
+            print(f"  backfilled {worker.completed}, "
+                  f"{count_backfill_pending()} pending", end="\r")
+    finally:
+        shutdown_pools()
+    print(f"\n  Backfill complete: {worker.completed} rows enriched")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load complaints.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="default: from each file's extension")
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE)
+    parser.add_argument("--backfill", action="store_true",
+                        help="geocode / classify incomplete rows before exiting")
+    args = parser.parse_args()
+
+    init_db()
+    failed = False
+    for path in args.paths:
+        fmt = args.format or detect_format(path)
+        with open(path, "rb") as src:
+            report = ingest_file(src, fmt, batch_size=args.batch_size).as_dict()
+        errors = report.pop("errors")
+        print(f"\n  {path} ({fmt})")
+        for key, value in report.items():
+            print(f"    {key:16} {value}")
+        for err in errors:
+            print(f"    line {err['line']}: {err['error']}")
+        failed |= report["rejected"] > 0
+
+    if args.backfill:
+        asyncio.run(drain_backfill())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# seed/load_directory.py — bulk-load the municipal directory into Redis
+#
+#   python seed/load_directory.py data/municipalities.xlsx
+#   python seed/load_directory.py wards.json more_wards.ndjson --chunk-size 1000
+#   python seed/load_directory.py statewide.xlsx --prune   # also drop unlisted keys
+#
+# Loads are diffed against Redis, so re-running one writes nothing; running
+# servers rebuild their directory index once, when a load changes anything.
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory_store import MemoryStore                       # noqa: E402
+from core.redis_client import redis_client                      # noqa: E402
+from core.directory_loader import load_directory_file           # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load the municipal directory.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--chunk-size", type=int, default=500,
+                        help="entries per MGET / MULTI round trip")
+    parser.add_argument("--prune", action="store_true",
+                        help="delete directory entries the files do not list")
+    args = parser.parse_args()
+
+    if isinstance(redis_client, MemoryStore):
+        sys.exit("Redis is not reachable (REDIS_HOST / REDIS_PORT) — nothing to load into.")
+    if args.prune and len(args.paths) > 1:
+        sys.exit("--prune takes a single file (it would drop the other files' entries).")
+
+    failed = False
+    for path in args.paths:
+        report = load_directory_file(path, chunk_size=args.chunk_size, prune=args.prune)
+        errors = report.pop("errors")
+        print(f"\n  {path}")
+        for key, value in report.items():
+            print(f"    {key:16} {value}")
+        for err in errors:
+            print(f"    row {err['row']}: {err['error']}")
+        failed |= report["rejected"] > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# seed/rebuild_rollups.py — recompute complaint_rollups from complaints
+#
+#   python seed/rebuild_rollups.py
+#
+# The rollups are maintained on every write; run this to repair them
+# after editing complaints outside the app (manual SQL, restored backup).
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import init_db  # noqa: E402
+from core.rollups import rebuild  # noqa: E402
+
+
+if __name__ == "__main__":
+    init_db()
+    started = time.perf_counter()
+    buckets = rebuild()
+    print(f"  Rebuilt complaint_rollups: {buckets} buckets "
+          f"in {time.perf_counter() - started:.1f}s")
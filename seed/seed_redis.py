@@ -1,8 +1,10 @@
-import redis
-import json
+import os
+import sys
 
-r = redis.Redis(host="localhost", port=6379,
-                db=0, decode_responses=True)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory_store import MemoryStore  # noqa: E402
+from core.redis_client import redis_client, bulk_set_municipalities  # noqa: E402
 
 # Real Chennai wards with actual locality names
 # Format: ward_key, category, officer details
@@ -280,14 +282,14 @@ MUNICIPALITIES = [
 
 
 def seed():
-    count = 0
-    for ward_key, category, data in MUNICIPALITIES:
-        key = f"municipality:{ward_key}:{category}"
-        r.set(key, json.dumps(data))
-        count += 1
-        print(f"  Seeded: {key} -> {data['officer_name']} ({data['email']})")
-
-    print(f"\n  Total records seeded: {count}")
+    if isinstance(redis_client, MemoryStore):
+        sys.exit("Redis is not reachable (REDIS_HOST / REDIS_PORT) — nothing to seed.")
+    # Pipelined and diffed (core/redis_client.bulk_set_municipalities):
+    # unchanged entries are not rewritten, and running servers rebuild
+    # their directory index once if anything changed
+    report = bulk_set_municipalities(MUNICIPALITIES)
+    print(f"\n  Total records seeded: {report['received']} "
+          f"({report['written']} written, {report['unchanged']} unchanged)")
     print(f"  Zones covered: 5,6,8,9,10,11,12,13")
     print(f"  Areas: Perungudi, Sholinganallur, Adyar, T.Nagar,")
     print(f"          Anna Nagar, Ambattur, Velachery, Tondiarpet, Guindy")
@@ -0,0 +1,149 @@
+"""Request-concurrency benchmark: sync vs async database access in handlers.
+
+Serves the same lookup (get_complaint, plus a save for a share of the
+requests) three ways from one FastAPI app, and drives each with
+--concurrency in-flight requests over an in-process ASGI transport:
+
+  inline  sync db_tools (get_complaint / save_complaint) called straight
+          from an async handler — every query blocks the event loop
+  pool    sync db_tools via run_blocking("sqlite", …) — the loop stays
+          free, but concurrency is capped at SQLITE_POOL_SIZE threads
+  async   aget_complaint / asave_complaint_with_work_order (aiosqlite)
+
+Event-loop lag is the worst delay seen by a 5 ms heartbeat task while
+requests run.
+
+    python tests/bench_async_db.py
+    python tests/bench_async_db.py --requests 4000 --concurrency 128
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_TMP = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP.name, 'bench.db')}"
+
+import httpx                                                      # noqa: E402
+from fastapi import FastAPI                                       # noqa: E402
+from sqlalchemy import text                                       # noqa: E402
+
+from core.database import engine, async_engine, init_db           # noqa: E402
+from core.executors import run_blocking, shutdown_pools           # noqa: E402
+from tools.db_tools import (get_complaint, aget_complaint,        # noqa: E402
+                            save_complaint, asave_complaint_with_work_order)
+
+ROWS = 20_000
+WRITE_SHARE = 0.1
+
+
+def seed():
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :rows)
+            INSERT INTO complaints (id, issue_type, status, priority, severity,
+                                    lat, lng, submitted_at)
+            SELECT printf('CIV-%08d', i), 'pothole', 'open', 'P3', 'moderate',
+                   13.0, 80.2, datetime('now') || '.000000'
+            FROM n
+        """), {"rows": ROWS})
+
+
+def _new_complaint() -> dict:
+    return {"issue_type": "pothole", "lat": 13.0 + random.random() / 10,
+            "lng": 80.2 + random.random() / 10}
+
+
+app = FastAPI()
+
+
+@app.get("/inline/{cid}")
+async def inline(cid: str, write: bool = False):
+    if write:
+        save_complaint(description="", location_text="", **_new_complaint())
+    return get_complaint(cid)
+
+
+@app.get("/pool/{cid}")
+async def pooled(cid: str, write: bool = False):
+    if write:
+        await run_blocking("sqlite", save_complaint, description="",
+                           location_text="", **_new_complaint())
+    return await run_blocking("sqlite", get_complaint, cid)
+
+
+@app.get("/async/{cid}")
+async def async_(cid: str, write: bool = False):
+    if write:
+        await asave_complaint_with_work_order(_new_complaint(), None)
+    return await aget_complaint(cid)
+
+
+async def drive(mode: str, requests: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    latencies, lag = [], [0.0]
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lag[0] = max(lag[0], time.perf_counter() - t0 - 0.005)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                cid = f"CIV-{random.randint(1, ROWS):08d}"
+                write = "true" if random.random() < WRITE_SHARE else "false"
+                t0 = time.perf_counter()
+                r = await client.get(f"/{mode}/{cid}", params={"write": write})
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        beat = asyncio.create_task(heartbeat())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await beat
+
+    latencies.sort()
+    return {
+        "req/s": requests / elapsed,
+        "p50 ms": latencies[len(latencies) // 2] * 1000,
+        "p95 ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "loop lag ms": lag[0] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    seed()
+    print("\n=== Async vs sync DB access — request concurrency ===")
+    print(f"  {args.requests} requests, {args.concurrency} in flight, "
+          f"{WRITE_SHARE:.0%} with a save\n")
+    for mode in ("inline", "pool", "async"):
+        await drive(mode, 100, 8)                   # warm connections
+        r = await drive(mode, args.requests, args.concurrency)
+        print(f"  {mode:7} " + "  ".join(f"{k}={v:8.1f}" for k, v in r.items()))
+    print()
+    await async_engine.dispose()
+    shutdown_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""Redis enumeration benchmark: KEYS scans vs index sets, 1M-key keyspace.
+
+Fills a keyspace with --keys unrelated keys (status histories and
+official-email cache entries, the keys that pile up next to the
+directory) plus a directory of --wards × 6 categories, then times:
+
+  keys-all      KEYS municipality:* + one GET per key (old get_all_municipalities)
+  keys-wildcard KEYS municipality:*:roads + GET (old directory fallback)
+  idx-all       get_municipalities() — SMEMBERS idx:municipality + chunked MGET
+  idx-category  get_municipalities("roads") — SMEMBERS of the category set + MGET
+  scan-reindex  municipality_keys() with empty index sets (SCAN fallback)
+
+Runs against the in-memory store by default.  --redis uses a real server
+instead and FLUSHES database --db (default 15) first.
+
+    python tests/bench_redis_index.py
+    python tests/bench_redis_index.py --keys 100000
+    python tests/bench_redis_index.py --redis --db 15
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core.redis_client as rc                                    # noqa: E402
+from core.memory_store import MemoryStore                         # noqa: E402
+
+CATEGORIES = ["roads", "water", "garbage", "electricity", "sewage", "parks"]
+
+
+def fill(store, n_keys: int, wards: int) -> None:
+    entry = json.dumps({"from": "open", "to": "in_progress", "changed_by": "officer"})
+    batch = 10_000
+    for start in range(0, n_keys, batch):
+        with store.pipeline(transaction=False) as pipe:
+            for i in range(start, min(start + batch, n_keys)):
+                if i % 2:
+                    pipe.rpush(f"status_history:CIV-{i:08d}", entry)
+                else:
+                    pipe.set(f"official_email:muni_{i:08d}", f"commr{i}@example.gov.in")
+            pipe.execute()
+    for w in range(wards):
+        for category in CATEGORIES:
+            rc.set_municipality(f"ward_{w}", category, {
+                "ward": f"Ward {w}", "zone": f"Zone {w % 15}",
+                "officer_name": f"Officer {w}", "email": f"ward{w}.{category}@example.gov.in",
+            })
+
+
+def keys_all(store) -> int:
+    return sum(1 for k in store.keys("municipality:*") if store.get(k))
+
+
+def keys_wildcard(store) -> int:
+    keys = store.keys("municipality:*:roads")
+    return 1 if keys and store.get(keys[0]) else 0
+
+
+def timed(fn, repeat: int) -> tuple[float, int]:
+    samples, result = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--wards", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--redis", action="store_true",
+                        help="use a real Redis server (flushes --db)")
+    parser.add_argument("--db", type=int, default=15)
+    args = parser.parse_args()
+
+    if args.redis:
+        import redis
+        from core.config import settings
+        store = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT,
+                            db=args.db, decode_responses=True)
+        store.flushdb()
+    else:
+        store = MemoryStore()
+    rc.redis_client = store           # the helpers read the module global
+
+    t0 = time.perf_counter()
+    fill(store, args.keys, args.wards)
+    backend = f"redis db {args.db}" if args.redis else "in-memory store"
+    print(f"\n=== Directory enumeration — {backend} ===")
+    print(f"  {args.keys:,} other keys + {args.wards * len(CATEGORIES):,} directory "
+          f"entries (filled in {time.perf_counter() - t0:.1f}s)\n")
+
+    cases = [
+        ("keys-all",      lambda: keys_all(store)),
+        ("keys-wildcard", lambda: keys_wildcard(store)),
+        ("idx-all",       lambda: len(rc.get_municipalities())),
+        ("idx-category",  lambda: len(rc.get_municipalities("roads"))),
+    ]
+    for name, fn in cases:
+        ms, n = timed(fn, args.repeat)
+        print(f"  {name:14} {ms:10.2f} ms  ({n} entries)")
+
+    def scan_reindex():
+        store.delete("idx:municipality",
+                     *(f"idx:municipality:category:{c}" for c in CATEGORIES))
+        return len(rc.municipality_keys())
+    ms, n = timed(scan_reindex, 1)
+    print(f"  {'scan-reindex':14} {ms:10.2f} ms  ({n} entries, one-off)\n")
+    if args.redis:
+        store.flushdb()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Mixed read/write SQLite benchmark: rollback journal vs the tuned profile.
+
+Seeds a throwaway database, then runs reader threads (the /complaints
+feed query) and writer threads (insert a complaint, then update a
+status, one commit each) for a fixed time against two engines:
+
+  baseline  the original engine — rollback journal, default pool
+  tuned     core.database.make_engine — WAL, synchronous=NORMAL,
+            busy_timeout, mmap/cache pragmas, pool sized to the sqlite
+            executor
+
+    python tests/bench_sqlite_concurrency.py
+    python tests/bench_sqlite_concurrency.py --readers 16 --writers 4 --seconds 10
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text                     # noqa: E402
+from sqlalchemy.exc import OperationalError                    # noqa: E402
+from sqlalchemy.orm import sessionmaker                        # noqa: E402
+
+from core.database import Base, ComplaintDB, PoolMetrics, make_engine  # noqa: E402
+
+
+def seed(engine, rows):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :rows)
+            INSERT INTO complaints (id, issue_type, status, priority, severity,
+                                    lat, lng, location_text, submitted_at)
+            SELECT printf('CIV-%08d', i), 'pothole',
+                   CASE WHEN i % 10 = 0 THEN 'open' ELSE 'resolved' END,
+                   'P3', 'moderate',
+                   12.8 + (i % 1000) * 0.0005, 79.9 + (i % 997) * 0.0005,
+                   'Anna Nagar, Chennai',
+                   datetime('now', printf('-%d seconds', :rows - i)) || '.000000'
+            FROM n
+        """), {"rows": rows})
+
+
+def run(engine, seconds, readers, writers):
+    Session = sessionmaker(bind=engine)
+    counts = {"reads": 0, "writes": 0, "locked": 0, "errors": 0}
+    read_ms, write_ms = [], []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            db = Session()
+            try:
+                db.query(ComplaintDB.id, ComplaintDB.lat, ComplaintDB.lng,
+                         ComplaintDB.status).order_by(
+                    ComplaintDB.submitted_at.desc()).limit(100).all()
+                ok = "reads"
+            except OperationalError as e:
+                ok = "locked" if "locked" in str(e) else "errors"
+            finally:
+                db.close()
+            with lock:
+                counts[ok] += 1
+                read_ms.append((time.perf_counter() - t0) * 1000)
+
+    def writer():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            db = Session()
+            try:
+                cid = f"BENCH-{uuid.uuid4().hex[:12]}"
+                db.add(ComplaintDB(id=cid, issue_type="pothole", status="open",
+                                   lat=13.0 + random.random() / 10,
+                                   lng=80.2 + random.random() / 10,
+                                   submitted_at=datetime.utcnow()))
+                db.commit()
+                db.query(ComplaintDB).filter(ComplaintDB.id == cid).update(
+                    {"status": "in_progress"})
+                db.commit()
+                ok = "writes"
+            except OperationalError as e:
+                db.rollback()
+                ok = "locked" if "locked" in str(e) else "errors"
+            finally:
+                db.close()
+            with lock:
+                counts[ok] += 1
+                write_ms.append((time.perf_counter() - t0) * 1000)
+
+    threads = ([threading.Thread(target=reader) for _ in range(readers)]
+               + [threading.Thread(target=writer) for _ in range(writers)])
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return counts, read_ms, write_ms
+
+
+def p95(samples):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[int(len(samples) * 0.95) - 1 if len(samples) > 1 else 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    print("\n=== SQLite mixed read/write benchmark ===")
+    print(f"  {args.rows} rows, {args.readers} readers, {args.writers} writers, "
+          f"{args.seconds:.0f}s per profile\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiles = {
+            "baseline": lambda url: create_engine(
+                url, connect_args={"check_same_thread": False}),
+            "tuned": make_engine,
+        }
+        for name, factory in profiles.items():
+            engine = factory(f"sqlite:///{os.path.join(tmp, name + '.db')}")
+            metrics = PoolMetrics(engine)
+            seed(engine, args.rows)
+            mode = engine.connect().exec_driver_sql("PRAGMA journal_mode").scalar()
+            counts, read_ms, write_ms = run(engine, args.seconds,
+                                            args.readers, args.writers)
+            print(f"  {name:9} journal={mode:7} "
+                  f"reads/s={counts['reads'] / args.seconds:8.0f} "
+                  f"writes/s={counts['writes'] / args.seconds:6.0f} "
+                  f"read p95={p95(read_ms):6.1f}ms "
+                  f"write p95={p95(write_ms):6.1f}ms "
+                  f"locked={counts['locked']} errors={counts['errors']} "
+                  f"peak conns={metrics.stats()['peak_checked_out']}")
+            engine.dispose()
+    print()
+
+
+if __name__ == "__main__":
+    main()
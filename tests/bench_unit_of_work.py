@@ -0,0 +1,102 @@
+"""Agent write-path benchmark: one commit per tool call vs a unit of work.
+
+Replays the db_tools writes an agent run makes for one complaint —
+save_complaint, save_cluster, save_work_order, then two
+update_complaint_status calls (assign, then prioritise) — for --complaints
+complaints, two ways against a throwaway database:
+
+  per-call  each tool commits on its own (the tools outside a unit of work)
+  uow       the same calls inside core.unit_of_work.unit_of_work(), one
+            commit per complaint
+
+Commits are counted with an engine event; with synchronous=FULL (the
+default here) each commit is one WAL fsync, so the commit count is the
+fsync count.
+
+    python tests/bench_unit_of_work.py
+    python tests/bench_unit_of_work.py --complaints 500 --synchronous NORMAL
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_TMP = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP.name, 'bench.db')}"
+if "--synchronous" not in sys.argv:
+    os.environ["SQLITE_SYNCHRONOUS"] = "FULL"
+else:
+    os.environ["SQLITE_SYNCHRONOUS"] = sys.argv[sys.argv.index("--synchronous") + 1]
+
+from sqlalchemy import event                                      # noqa: E402
+
+from core.database import engine, init_db                         # noqa: E402
+from core.unit_of_work import unit_of_work                        # noqa: E402
+from tools.db_tools import (save_complaint, save_cluster,         # noqa: E402
+                            save_work_order, update_complaint_status)
+
+commits = [0]
+
+
+@event.listens_for(engine, "commit")
+def _count_commit(conn):
+    commits[0] += 1
+
+
+def agent_run(i: int) -> None:
+    saved = save_complaint(issue_type="pothole", description=f"Pothole #{i}",
+                           location_text="Anna Nagar, Chennai",
+                           lat=13.08, lng=80.21, ward="Ward 100", zone="Zone 8",
+                           severity="high")
+    cid = saved["complaint_id"]
+    cluster = save_cluster(issue_type="pothole", center_lat=13.08, center_lng=80.21,
+                           radius_m=200, size=3, score=0.8,
+                           location_text="Anna Nagar, Chennai")
+    wo = save_work_order(complaint_id=cid, department="Roads",
+                         dept_email="roads@example.gov.in", officer_name="AE Roads",
+                         email_body="<p>Work order</p>",
+                         cluster_id=cluster["cluster_id"])
+    update_complaint_status(cid, "in_progress", work_order_id=wo["work_order_id"],
+                            department="Roads", dept_email="roads@example.gov.in",
+                            officer_name="AE Roads")
+    update_complaint_status(cid, "in_progress", priority="P1")
+
+
+def drive(mode: str, n: int) -> dict:
+    commits[0] = 0
+    t0 = time.perf_counter()
+    for i in range(n):
+        if mode == "uow":
+            with unit_of_work():
+                agent_run(i)
+        else:
+            agent_run(i)
+    elapsed = time.perf_counter() - t0
+    return {"commits": commits[0], "per complaint": commits[0] / n,
+            "ms/complaint": elapsed / n * 1000, "complaints/s": n / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--complaints", type=int, default=300)
+    parser.add_argument("--synchronous", default="FULL",
+                        help="SQLite synchronous pragma (default FULL)")
+    args = parser.parse_args()
+    init_db()
+
+    print("\n=== Agent writes — per-call commits vs unit of work ===")
+    print(f"  {args.complaints} complaints × 5 tool writes, "
+          f"synchronous={args.synchronous}\n")
+    drive("per-call", 20)                           # warm the pool
+    for mode in ("per-call", "uow"):
+        r = drive(mode, args.complaints)
+        print(f"  {mode:9} " + "  ".join(
+            f"{k}={v:8.1f}" if isinstance(v, float) else f"{k}={v:6}"
+            for k, v in r.items()))
+    print()
+
+
+if __name__ == "__main__":
+    main()
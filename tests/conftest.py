@@ -0,0 +1,22 @@
+"""
+Shared pytest setup.
+
+Points DATABASE_URL at a throwaway SQLite file before any core module is
+imported, so no test ever touches the tracked ./civiqai.db.  Tests that
+need the application schema take the ``app_db`` fixture.
+"""
+import os
+import tempfile
+
+import pytest
+
+_TMP = tempfile.TemporaryDirectory(prefix="civiqai-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP.name, 'test.db')}"
+
+
+@pytest.fixture(scope="session")
+def app_db():
+    """The session's temporary database, created and fully migrated."""
+    from core.database import engine, init_db
+    init_db()
+    return engine
@@ -0,0 +1,58 @@
+"""
+Archival tests: which complaints archive_batch moves.
+
+Runs against the session's temporary database.
+
+    pytest tests/test_archive.py -q
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.archive import archive_batch, load_archived
+from core.database import ComplaintArchiveDB, ComplaintDB, SessionLocal
+from tools.db_tools import update_complaint_status
+
+OLD = datetime.utcnow() - timedelta(days=400)
+CUTOFF = datetime.utcnow() - timedelta(days=180)
+
+
+@pytest.fixture
+def complaints(app_db):
+    rows = {
+        "CIV-AR-RESOLVED": dict(status="resolved", resolved_at=OLD + timedelta(days=1)),
+        # closed before resolved_at was stamped on close
+        "CIV-AR-LEGACY-CLOSED": dict(status="closed", resolved_at=None),
+        "CIV-AR-OPEN": dict(status="open", resolved_at=None),
+    }
+    with SessionLocal() as db:
+        for cid, values in rows.items():
+            db.add(ComplaintDB(id=cid, issue_type="pothole", submitted_at=OLD, **values))
+        db.commit()
+    yield list(rows)
+    with SessionLocal() as db:
+        for model in (ComplaintDB, ComplaintArchiveDB):
+            db.query(model).filter(model.id.like("CIV-AR-%")).delete(
+                synchronize_session=False)
+        db.commit()
+
+
+def test_resolved_and_closed_rows_are_archived(complaints):
+    assert archive_batch(CUTOFF, limit=10) == 2
+    assert load_archived("CIV-AR-RESOLVED")["complaint"]["status"] == "resolved"
+    assert load_archived("CIV-AR-LEGACY-CLOSED")["complaint"]["status"] == "closed"
+    with SessionLocal() as db:
+        assert db.get(ComplaintDB, "CIV-AR-OPEN") is not None
+
+
+def test_closing_stamps_resolved_at(complaints):
+    update_complaint_status("CIV-AR-OPEN", "closed")
+    with SessionLocal() as db:
+        closed_at = db.get(ComplaintDB, "CIV-AR-OPEN").resolved_at
+    assert closed_at is not None and closed_at > CUTOFF
+
+    # resolved → closed keeps the original resolution time
+    update_complaint_status("CIV-AR-RESOLVED", "closed")
+    with SessionLocal() as db:
+        assert db.get(ComplaintDB, "CIV-AR-RESOLVED").resolved_at == OLD + timedelta(days=1)
+    assert archive_batch(CUTOFF, limit=10) == 2          # the just-closed one stays
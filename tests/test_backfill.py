@@ -0,0 +1,56 @@
+"""
+Backfill worker tests: one failing row must not stall the queue.
+
+Runs BackfillWorker.drain_once against the session's temporary database
+with enrich() replaced, so no OSM or Gemini calls are made.
+
+    pytest tests/test_backfill.py -q
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import core.backfill as backfill
+from core.database import ComplaintDB, SessionLocal
+
+
+@pytest.fixture
+def queued(app_db):
+    """Three rows awaiting geocoding; the oldest one cannot be geocoded."""
+    ids = ["CIV-BF-BAD", "CIV-BF-2", "CIV-BF-3"]
+    start = datetime(2020, 1, 1)
+    with SessionLocal() as db:
+        for i, cid in enumerate(ids):
+            db.add(ComplaintDB(id=cid, issue_type="pothole", location_text=f"Street {i}",
+                               submitted_at=start + timedelta(minutes=i),
+                               backfill="geocode"))
+        db.commit()
+    yield ids
+    with SessionLocal() as db:
+        db.query(ComplaintDB).filter(ComplaintDB.id.in_(ids)).delete()
+        db.commit()
+
+
+def _backfill_of(cid: str):
+    with SessionLocal() as db:
+        return db.get(ComplaintDB, cid).backfill
+
+
+def test_failing_row_is_skipped_then_parked(queued, monkeypatch):
+    async def enrich(row):
+        if row["id"] == "CIV-BF-BAD":
+            raise ValueError("no geocode result")
+        return {"lat": 13.0, "lng": 80.2, "ward": "Ward 1"}
+
+    monkeypatch.setattr(backfill, "enrich", enrich)
+    worker = backfill.BackfillWorker(batch_size=10, max_attempts=2)
+
+    assert asyncio.run(worker.drain_once()) == 2      # the rows behind it still go
+    assert _backfill_of("CIV-BF-2") is None and _backfill_of("CIV-BF-3") is None
+    assert _backfill_of("CIV-BF-BAD") == "geocode"   # still pending after one failure
+
+    assert asyncio.run(worker.drain_once()) == 0
+    assert _backfill_of("CIV-BF-BAD") == "failed:geocode"
+    assert backfill.pending_backfill(10) == []
+    assert worker.stats()["parked"] == 1 and worker.failed_rows == 2
@@ -0,0 +1,24 @@
+"""
+Directory loader tests: reading and validating directory rows.
+
+    pytest tests/test_directory_loader.py -q
+"""
+import pytest
+
+from core.directory_loader import (DirectoryRowError, iter_directory_rows,
+                                   validate_directory_row)
+
+
+def test_malformed_ndjson_line_is_a_rejected_row(tmp_path):
+    path = tmp_path / "directory.ndjson"
+    path.write_text(
+        '{"category": "roads", "ward": "W1", "email": "w1@example.org"}\n'
+        '{"category": "roads", "ward": \n'
+        '{"category": "water", "key": "W2"}\n')
+    rows = list(iter_directory_rows(str(path)))
+    assert [n for n, _ in rows] == [1, 2, 3]
+
+    assert validate_directory_row(rows[0][1])[:2] == ("W1", "roads")
+    with pytest.raises(DirectoryRowError, match="invalid JSON"):
+        validate_directory_row(rows[1][1])
+    assert validate_directory_row(rows[2][1])[:2] == ("W2", "water")
@@ -0,0 +1,113 @@
+"""
+Migration tests: upgrade a database created by the original schema.
+
+Fresh databases get their tables and indexes from create_all, so the
+ALTER / backfill steps in core/migrations.py only ever run against old
+files.  These tests build the pre-migration schema by hand, insert rows,
+run init_db() on it and check that the result matches the models.
+
+    pytest tests/test_migrations.py -q
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, text
+
+from core.database import (GEOHASH_PRECISION, Base, ComplaintDB, SessionLocal,
+                           engine, init_db, make_engine)
+from core.geo import geohash_encode
+from core.migrations import MIGRATIONS
+
+# Tables as the original core/database.py created them
+_BASELINE = (
+    """CREATE TABLE complaints (
+        id VARCHAR NOT NULL PRIMARY KEY, issue_type VARCHAR NOT NULL,
+        description TEXT, location_text VARCHAR, lat FLOAT, lng FLOAT,
+        ward VARCHAR, zone VARCHAR, severity VARCHAR, status VARCHAR,
+        priority VARCHAR, cluster_id VARCHAR, image_url VARCHAR,
+        streetview_url VARCHAR, citizen_email VARCHAR, department VARCHAR,
+        officer_name VARCHAR, dept_email VARCHAR, work_order_id VARCHAR,
+        prediction TEXT, submitted_at DATETIME, resolved_at DATETIME)""",
+    """CREATE TABLE clusters (
+        id VARCHAR NOT NULL PRIMARY KEY, issue_type VARCHAR NOT NULL,
+        center_lat FLOAT, center_lng FLOAT, radius_m INTEGER, size INTEGER,
+        score FLOAT, priority VARCHAR, location_text VARCHAR,
+        created_at DATETIME, updated_at DATETIME)""",
+    """CREATE TABLE work_orders (
+        id VARCHAR NOT NULL PRIMARY KEY, complaint_id VARCHAR NOT NULL,
+        cluster_id VARCHAR, department VARCHAR, dept_email VARCHAR,
+        officer_name VARCHAR, email_body TEXT, status VARCHAR,
+        sent_at DATETIME, replied_at DATETIME)""",
+)
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    eng = make_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    now = datetime(2025, 1, 15, 10, 0, 0)
+    with eng.begin() as conn:
+        for ddl in _BASELINE:
+            conn.execute(text(ddl))
+        conn.execute(text(
+            "INSERT INTO complaints (id, issue_type, lat, lng, zone, status, priority, "
+            "submitted_at, resolved_at) VALUES "
+            "('CIV-1', 'pothole', 13.08, 80.27, 'Zone 5', 'open', 'P2', :t, NULL), "
+            "('CIV-2', 'water_leak', NULL, NULL, NULL, 'resolved', 'P3', :t, :r)"),
+            {"t": now, "r": now + timedelta(days=2)})
+        conn.execute(text(
+            "INSERT INTO work_orders (id, complaint_id, status, sent_at) "
+            "VALUES ('WO-1', 'CIV-1', 'sent', :t)"), {"t": now})
+    yield eng
+    eng.dispose()
+
+
+def _indexes(eng, table: str) -> dict:
+    """name → column names (None for an expression), read from SQLite
+    directly since SQLAlchemy does not reflect expression indexes."""
+    with eng.connect() as conn:
+        names = [row[1] for row in conn.exec_driver_sql(f"PRAGMA index_list({table})")
+                 if not row[1].startswith("sqlite_autoindex")]
+        return {name: [row[2] for row in conn.exec_driver_sql(f"PRAGMA index_info({name})")]
+                for name in names}
+
+
+def test_upgrade_matches_models(legacy_engine):
+    assert init_db(legacy_engine) == MIGRATIONS[-1].version
+
+    for table in ("complaints", "work_orders", "clusters"):
+        columns = {c["name"] for c in inspect(legacy_engine).get_columns(table)}
+        assert columns == set(Base.metadata.tables[table].columns.keys()), table
+        indexes = _indexes(legacy_engine, table)
+        for index in Base.metadata.tables[table].indexes:
+            expected = [c.name for c in index.columns] or [None]   # expression index
+            assert indexes.get(index.name) == expected, index.name
+
+
+def test_upgrade_backfills_existing_rows(legacy_engine):
+    init_db(legacy_engine)
+    with legacy_engine.connect() as conn:
+        geohashes = dict(conn.execute(text("SELECT id, geohash FROM complaints")).all())
+        rollups = conn.execute(text(
+            "SELECT SUM(count), SUM(resolution_n) FROM complaint_rollups")).one()
+    assert geohashes["CIV-1"] == geohash_encode(13.08, 80.27, GEOHASH_PRECISION)
+    assert geohashes["CIV-2"] is None
+    assert tuple(rollups) == (2, 1)
+
+    # The ORM can read and write upgraded rows
+    SessionLocal.configure(bind=legacy_engine)
+    try:
+        with SessionLocal() as db:
+            complaint = db.get(ComplaintDB, "CIV-1")
+            assert complaint.image_sha256 is None and complaint.backfill is None
+            complaint.thumbnail_url = "/thumbs/CIV-1.jpg"
+            db.commit()
+    finally:
+        SessionLocal.configure(bind=engine)
+
+
+def test_upgrade_is_idempotent(legacy_engine):
+    version = init_db(legacy_engine)
+    assert init_db(legacy_engine) == version
+    with legacy_engine.connect() as conn:
+        applied = conn.execute(text("SELECT COUNT(*) FROM schema_version")).scalar_one()
+    assert applied == len(MIGRATIONS)
@@ -0,0 +1,47 @@
+"""
+Near-duplicate photo index tests: lookups see photos saved by other
+workers through the SQLite read-through.
+
+Runs against the session's temporary database.
+
+    pytest tests/test_phash_index.py -q
+"""
+from datetime import datetime
+
+import pytest
+
+from core.database import ComplaintDB, SessionLocal
+from core.phash_index import PhashIndex, phash_to_hex
+
+PHASH = 0x0F0F_F0F0_0F0F_F0F0
+LAT, LNG = 13.0827, 80.2707
+
+
+@pytest.fixture
+def other_worker_photo(app_db):
+    # saved by another worker after this one's index was warmed
+    with SessionLocal() as db:
+        db.add(ComplaintDB(id="CIV-PH-OTHER", issue_type="pothole", lat=LAT + 0.0001,
+                           lng=LNG, image_phash=phash_to_hex(PHASH ^ 0b101),
+                           submitted_at=datetime.utcnow()))
+        db.commit()
+    yield "CIV-PH-OTHER"
+    with SessionLocal() as db:
+        db.query(ComplaintDB).filter(ComplaintDB.id == "CIV-PH-OTHER").delete()
+        db.commit()
+
+
+def test_load_near_adds_photos_saved_elsewhere(other_worker_photo):
+    index = PhashIndex()
+    assert index.nearest(PHASH, LAT, LNG) == []
+    assert index.load_near(LAT, LNG) == 1
+    [match] = index.nearest(PHASH, LAT, LNG)
+    assert (match["complaint_id"], match["hamming"]) == (other_worker_photo, 2)
+    # already known: a second read-through adds nothing
+    assert index.load_near(LAT, LNG) == 0
+    assert len(index) == 1
+
+
+def test_load_near_ignores_other_cells(other_worker_photo):
+    index = PhashIndex()
+    assert index.load_near(LAT + 1, LNG + 1) == 0
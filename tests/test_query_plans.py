@@ -0,0 +1,202 @@
+"""
+Query-plan regression tests for the hot complaint / work-order queries.
+
+Builds a throwaway SQLite database with QUERY_PLAN_ROWS complaints
+(1,000,000 by default), applies the real migrations, runs the real query
+functions while capturing their SQL, and asserts that EXPLAIN QUERY PLAN
+shows each one searching the expected index — no full table scan and no
+temp B-tree sort.
+
+    pytest tests/test_query_plans.py -q
+    QUERY_PLAN_ROWS=100000 pytest tests/test_query_plans.py -q   # quicker
+"""
+import asyncio
+import os
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+from core.database import Base, SessionLocal
+from core.migrations import run_migrations
+
+ROWS = int(os.environ.get("QUERY_PLAN_ROWS", "1000000"))
+
+# "SCAN t USING INDEX i" walks an index in order (fine for ORDER BY … LIMIT);
+# a bare "SCAN t" reads every row of the table.
+_FULL_SCAN = re.compile(r"SCAN (complaints|work_orders)(?! USING)")
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    eng = create_engine(f"sqlite:///{path}",
+                        connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=eng)
+    with eng.begin() as conn:
+        # 10% open, 10% in progress, 75% resolved, 5% closed; one year of data
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :rows)
+            INSERT INTO complaints (id, issue_type, status, priority, severity,
+                                    lat, lng, image_phash, submitted_at)
+            SELECT printf('CIV-%08d', i),
+                   CASE i % 9 WHEN 0 THEN 'pothole' WHEN 1 THEN 'water_leak'
+                        WHEN 2 THEN 'garbage_overflow' WHEN 3 THEN 'streetlight_failure'
+                        WHEN 4 THEN 'power_outage' WHEN 5 THEN 'waterlogging'
+                        WHEN 6 THEN 'sewage_overflow' WHEN 7 THEN 'tree_fallen'
+                        ELSE 'other' END,
+                   CASE WHEN i % 20 < 2 THEN 'open' WHEN i % 20 < 4 THEN 'in_progress'
+                        WHEN i % 20 < 19 THEN 'resolved' ELSE 'closed' END,
+                   'P' || (i % 3 + 1),
+                   'moderate',
+                   12.8 + (i % 1000) * 0.0005, 79.9 + (i % 997) * 0.0005,
+                   CASE WHEN i % 4 = 0 THEN printf('%016x', i) END,   -- with a photo
+                   -- SQLAlchemy's DateTime storage format (with microseconds)
+                   datetime('now', printf('-%d seconds', (:rows - i) * 31536000 / :rows))
+                       || '.000000'
+            FROM n
+        """), {"rows": ROWS})
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :rows)
+            INSERT INTO work_orders (id, complaint_id, status, next_attempt_at, created_at)
+            SELECT printf('WO-%08d', i), printf('CIV-%08d', i),
+                   CASE WHEN i % 1000 = 0 THEN 'pending' ELSE 'sent' END,
+                   CASE WHEN i % 1000 = 0 THEN datetime('now') END,
+                   datetime('now')
+            FROM n
+        """), {"rows": ROWS // 10})
+    run_migrations(eng)                 # stamps versions, creates indexes, ANALYZE
+    yield eng
+    eng.dispose()
+
+
+@contextmanager
+def captured_selects(engine):
+    """Bind SessionLocal to ``engine`` and collect every SELECT it runs."""
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    old_bind = SessionLocal.kw.get("bind")
+    SessionLocal.configure(bind=engine)
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+        SessionLocal.configure(bind=old_bind)
+
+
+def plan_for(engine, statement, parameters) -> str:
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}",
+                                    tuple(parameters)).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def assert_uses_index(engine, statements, *index_names):
+    assert statements, "query function issued no SELECT"
+    plan = plan_for(engine, *statements[0])
+    assert any(f"USING INDEX {name}" in plan or f"USING COVERING INDEX {name}" in plan
+               for name in index_names), plan
+    assert "USE TEMP B-TREE" not in plan, plan
+    assert not _FULL_SCAN.search(plan), plan
+
+
+# ── /complaints feed ──────────────────────────────────────────────
+
+def _feed_page(engine, cursor=None, **filters):
+    """One page of the async /complaints handler, on an aiosqlite engine
+    opened on the same database file."""
+    from fastapi import Response
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from api.main import get_complaints
+
+    statements = []
+
+    def _capture(conn, cur, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    async def _page():
+        async_engine = create_async_engine(
+            engine.url.set(drivername="sqlite+aiosqlite"))
+        event.listen(async_engine.sync_engine, "before_cursor_execute", _capture)
+        try:
+            async with AsyncSession(async_engine) as db:
+                return await get_complaints(response=response, cursor=cursor,
+                                            limit=100, fields="id,status",
+                                            db=db, **filters)
+        finally:
+            await async_engine.dispose()
+
+    response = Response()
+    rows = asyncio.run(_page())
+    return rows, response.headers.get("X-Next-Cursor"), statements
+
+
+@pytest.mark.parametrize("status, issue_type, indexes", [
+    (None,       None,      ("ix_complaints_submitted_at",)),
+    ("open",     None,      ("ix_complaints_status_submitted",)),
+    (None,       "pothole", ("ix_complaints_type_submitted",)),
+    ("resolved", "pothole", ("ix_complaints_status_submitted",
+                             "ix_complaints_type_submitted")),
+])
+def test_complaints_feed_uses_index(engine, status, issue_type, indexes):
+    rows, cursor, statements = _feed_page(engine, status=status, issue_type=issue_type)
+    assert_uses_index(engine, statements, *indexes)
+    # A later page seeks from the cursor on the same index
+    _, _, statements = _feed_page(engine, cursor=cursor, status=status,
+                                  issue_type=issue_type)
+    assert_uses_index(engine, statements, *indexes)
+
+
+def test_complaints_feed_pages_do_not_overlap(engine):
+    first, cursor, _ = _feed_page(engine)
+    second, _, _ = _feed_page(engine, cursor=cursor)
+    assert len(first) == len(second) == 100
+    assert not {r["id"] for r in first} & {r["id"] for r in second}
+
+
+# ── Analytics agent filters ───────────────────────────────────────
+
+@pytest.mark.parametrize("kwargs, indexes", [
+    ({"days": 7},                                ("ix_complaints_submitted_at",)),
+    ({"status": "in_progress", "days": 30},      ("ix_complaints_status_submitted",)),
+    ({"status": "open", "priority": "P1"},       ("ix_complaints_open_priority",)),
+    ({"issue_type": "water_leak", "days": 30},   ("ix_complaints_type_submitted",)),
+])
+def test_query_complaints_by_filter_uses_index(engine, kwargs, indexes):
+    from tools.db_tools import query_complaints_by_filter
+    with captured_selects(engine) as statements:
+        query_complaints_by_filter(**kwargs)
+    assert_uses_index(engine, statements, *indexes)
+
+
+# ── Clustering / duplicate detection ──────────────────────────────
+
+def test_find_nearby_complaints_uses_index(engine):
+    from tools.maps_tools import find_nearby_complaints
+    with captured_selects(engine) as statements:
+        find_nearby_complaints(13.0, 80.1, radius_m=500, hours=48,
+                               issue_type="pothole")
+    assert_uses_index(engine, statements, "ix_complaints_type_geohash")
+
+
+def test_phash_read_through_uses_partial_index(engine):
+    from core.phash_index import PhashIndex
+    with captured_selects(engine) as statements:
+        PhashIndex().load_near(13.0, 80.1)
+    assert_uses_index(engine, statements, "ix_complaints_phash_geohash")
+
+
+# ── Work-order outbox ─────────────────────────────────────────────
+
+def test_outbox_claim_uses_partial_index(engine):
+    from core.outbox import claim_due_work_orders
+    with captured_selects(engine) as statements:
+        claim_due_work_orders(limit=10, lease_s=60)
+    assert_uses_index(engine, statements, "ix_work_orders_outbox")
@@ -0,0 +1,353 @@
+"""
+Compatibility tests: core.memory_store.MemoryStore vs a real Redis.
+
+Every test runs against both backends through the same redis-py calls,
+so the in-memory fallback keeps returning what Redis returns.  The
+"redis" cases use database REDIS_COMPAT_DB (15 by default) on
+settings.REDIS_HOST:REDIS_PORT, FLUSH it, and are skipped when no
+server answers.
+
+    pytest tests/test_redis_compat.py -q
+"""
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import core.redis_client as rc
+from core.config import settings
+from core.memory_store import MemoryStore, ResponseError, WatchError
+
+REDIS_DB = int(os.environ.get("REDIS_COMPAT_DB", "15"))
+
+
+def _redis_reachable() -> bool:
+    try:
+        socket.create_connection((settings.REDIS_HOST, settings.REDIS_PORT), 0.2).close()
+        return True
+    except OSError:
+        return False
+
+
+_REDIS_UP = _redis_reachable()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def r(request):
+    if request.param == "memory":
+        store = MemoryStore(expire_interval_s=0.05)
+        yield store
+        store.close()
+        return
+    if not _REDIS_UP:
+        pytest.skip(f"no Redis server at {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+    redis = pytest.importorskip("redis")
+    store = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT,
+                        db=REDIS_DB, decode_responses=True)
+    store.flushdb()
+    yield store
+    store.flushdb()
+
+
+def test_strings(r):
+    assert r.set("s", "v") is True
+    assert r.get("s") == "v"
+    assert r.set("s", "w", nx=True) is None
+    assert r.set("missing", "w", xx=True) is None
+    assert r.setnx("n", 1) is True and r.get("n") == "1"
+    assert r.mset({"a": "1", "b": 2.5}) is True
+    assert r.mget(["a", "b", "nope"]) == ["1", "2.5", None]
+    assert r.append("a", "0") == 2
+    assert r.strlen("a") == 2
+    assert r.exists("a", "b", "nope") == 2
+    assert r.type("a") == "string" and r.type("nope") == "none"
+    assert r.delete("a", "nope") == 1
+
+
+def test_counters(r):
+    assert r.incr("c") == 1
+    assert r.incrby("c", 5) == 6
+    assert r.decr("c") == 5
+    assert r.decrby("c", 10) == -5
+    assert r.get("c") == "-5"
+    assert r.incrbyfloat("f", 1.5) == 1.5
+    assert r.incrbyfloat("f", 1) == 2.5
+    r.set("text", "abc")
+    with pytest.raises(ResponseError):
+        r.incr("text")
+
+
+def test_ttl(r):
+    r.set("t", "v", ex=100)
+    assert 99 <= r.ttl("t") <= 100
+    assert r.ttl("plain") == -2
+    r.set("plain", "v")
+    assert r.ttl("plain") == -1
+    assert r.incr("counter") == 1 and r.expire("counter", 100)
+    r.incr("counter")
+    assert r.ttl("counter") > 0          # INCR keeps the TTL
+    r.set("counter", "0")
+    assert r.ttl("counter") == -1        # SET clears it
+    assert r.persist("t") is True and r.ttl("t") == -1
+    r.set("gone", "v", px=50)
+    time.sleep(0.15)
+    assert r.get("gone") is None
+    assert r.exists("gone") == 0
+
+
+def test_periodic_expiry_drops_untouched_keys():
+    store = MemoryStore(expire_interval_s=0.02)
+    for i in range(100):
+        store.set(f"k{i}", "v", px=20)
+    store.set("keep", "v")
+    time.sleep(0.2)
+    assert store.info()["keys"] == 1
+    assert store.info()["expired_keys"] == 100
+    store.close()
+
+
+def test_lists(r):
+    assert r.rpush("l", "a", "b", "c") == 3
+    assert r.lpush("l", "z", "y") == 5
+    assert r.lrange("l", 0, -1) == ["y", "z", "a", "b", "c"]
+    assert r.lrange("l", -2, 100) == ["b", "c"]
+    assert r.lrange("l", 3, 1) == []
+    assert r.lindex("l", -1) == "c"
+    assert r.llen("l") == 5
+    assert r.lpop("l") == "y" and r.rpop("l", 2) == ["c", "b"]
+    assert r.ltrim("l", 0, 0) is True and r.lrange("l", 0, -1) == ["z"]
+    r.rpush("dups", "x", "y", "x", "x")
+    assert r.lrem("dups", -1, "x") == 1
+    assert r.lrange("dups", 0, -1) == ["x", "y", "x"]
+    r.rpop("l")
+    assert r.exists("l") == 0            # emptied lists disappear
+
+
+def test_hashes(r):
+    assert r.hset("h", "a", "1") == 1
+    assert r.hset("h", mapping={"a": "2", "b": "x"}) == 1
+    assert r.hget("h", "a") == "2"
+    assert r.hmget("h", ["a", "b", "c"]) == ["2", "x", None]
+    assert r.hgetall("h") == {"a": "2", "b": "x"}
+    assert r.hincrby("h", "a", 3) == 5
+    assert r.hincrby("h", "new") == 1
+    assert r.hincrbyfloat("h", "fl", 0.5) == 0.5
+    assert r.hsetnx("h", "a", "9") is False
+    assert r.hexists("h", "b") and r.hlen("h") == 4
+    assert sorted(r.hkeys("h")) == ["a", "b", "fl", "new"]
+    with pytest.raises(ResponseError):
+        r.hincrby("h", "b")
+    assert r.hdel("h", "a", "b", "fl", "new", "zz") == 4
+    assert r.exists("h") == 0
+
+
+def test_sets(r):
+    assert r.sadd("s1", "a", "b", "c") == 3
+    assert r.sadd("s1", "a") == 0
+    r.sadd("s2", "b", "c", "d")
+    assert r.smembers("s1") == {"a", "b", "c"}
+    assert r.sismember("s1", "a") and not r.sismember("s1", "d")
+    assert r.sinter("s1", "s2") == {"b", "c"}
+    assert r.sunion(["s1", "s2"]) == {"a", "b", "c", "d"}
+    assert r.scard("s1") == 3
+    assert sorted(r.sscan_iter("s2", match="[bc]")) == ["b", "c"]
+    assert r.srem("s1", "a", "b", "c") == 3
+    assert r.exists("s1") == 0
+
+
+def test_sorted_sets(r):
+    assert r.zadd("z", {"a": 1, "b": 2, "c": 3}) == 3
+    assert r.zadd("z", {"a": 5}, nx=True) == 0
+    assert r.zadd("z", {"a": 0.5, "d": 4}, ch=True) == 2
+    assert r.zscore("z", "a") == 0.5
+    assert r.zincrby("z", 2, "b") == 4.0
+    assert r.zrange("z", 0, -1) == ["a", "c", "b", "d"]      # ties by member
+    assert r.zrevrange("z", 0, 1, withscores=True) == [("d", 4.0), ("b", 4.0)]
+    assert r.zrangebyscore("z", 1, "+inf") == ["c", "b", "d"]
+    assert r.zrangebyscore("z", "(3", 4, start=0, num=1) == ["b"]
+    assert r.zrevrangebyscore("z", 4, "(0.5") == ["d", "b", "c"]
+    assert r.zcount("z", "-inf", "(4") == 2
+    assert r.zrank("z", "c") == 1 and r.zrevrank("z", "c") == 2
+    assert r.zrank("z", "nope") is None
+    assert r.zremrangebyscore("z", 0, 1) == 1
+    assert r.zpopmin("z") == [("c", 3.0)]
+    assert r.zcard("z") == 2
+
+
+def test_wrongtype(r):
+    r.set("str", "v")
+    r.rpush("list", "a")
+    for call in (lambda: r.rpush("str", "x"), lambda: r.get("list"),
+                 lambda: r.sadd("list", "x"), lambda: r.hget("str", "f"),
+                 lambda: r.zadd("str", {"m": 1})):
+        with pytest.raises(ResponseError, match="WRONGTYPE"):
+            call()
+
+
+def test_keys_and_scan(r):
+    for key in ("user:1", "user:2", "order:1"):
+        r.set(key, "v")
+    assert sorted(r.keys("user:*")) == ["user:1", "user:2"]
+    assert sorted(r.scan_iter(match="*:1")) == ["order:1", "user:1"]
+    assert r.dbsize() == 3
+    r.flushdb()
+    assert r.dbsize() == 0
+
+
+def test_pipeline(r):
+    with r.pipeline() as pipe:
+        pipe.set("p", "1").incr("p").rpush("pl", "a", "b").sadd("ps", "x")
+        pipe.hset("ph", mapping={"f": "v"}).get("p")
+        assert pipe.execute() == [True, 2, 2, 1, 1, "2"]
+    pipe = r.pipeline(transaction=False)
+    pipe.set("s", "v").incr("s").get("s")
+    results = pipe.execute(raise_on_error=False)
+    assert results[0] is True and isinstance(results[1], ResponseError)
+    assert results[2] == "v"
+    pipe.incr("s")
+    with pytest.raises(ResponseError):
+        pipe.execute()
+
+
+def test_watch(r):
+    r.set("balance", "10")
+    with r.pipeline() as pipe:
+        pipe.watch("balance")
+        balance = int(pipe.get("balance"))       # runs immediately after WATCH
+        pipe.multi()
+        pipe.set("balance", balance - 3)
+        assert pipe.execute() == [True]
+    assert r.get("balance") == "7"
+
+    with r.pipeline() as pipe:
+        pipe.watch("balance")
+        r.set("balance", "100")                  # another client writes
+        pipe.multi()
+        pipe.set("balance", "0")
+        with pytest.raises(WatchError):
+            pipe.execute()
+    assert r.get("balance") == "100"
+
+
+def test_concurrent_increments(r):
+    def work():
+        for _ in range(500):
+            r.incr("shared")
+            r.hincrby("shared_h", "n")
+            r.rpush("shared_l", "x")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert r.get("shared") == "4000"
+    assert r.hget("shared_h", "n") == "4000"
+    assert r.llen("shared_l") == 4000
+
+
+def test_pubsub(r):
+    sub = r.pubsub(ignore_subscribe_messages=True)
+    sub.subscribe("ch")
+    time.sleep(0.05)
+    assert r.publish("ch", "hello") == 1
+    deadline = time.time() + 1
+    message = None
+    while message is None and time.time() < deadline:
+        message = sub.get_message(timeout=0.1)
+        if message and message["type"] != "message":
+            message = None
+    assert message["channel"] == "ch" and message["data"] == "hello"
+    sub.close()
+
+
+def test_redis_client_helpers(r, monkeypatch):
+    monkeypatch.setattr(rc, "redis_client", r)
+    rc.set_municipality("Ward 1", "roads", {"ward": "Ward 1", "email": "a@x.in"})
+    assert rc.get_municipality("Ward 1", "roads")["email"] == "a@x.in"
+    assert list(rc.get_municipalities("roads")) == ["municipality:ward_1:roads"]
+    rc.log_status_change("CIV-1", "open", "in_progress")
+    assert rc.get_status_histories(["CIV-1"])["CIV-1"][0]["to"] == "in_progress"
+
+
+def test_status_log_migration_converts_each_blob_once(r, monkeypatch):
+    monkeypatch.setattr(rc, "redis_client", r)
+    for i in range(50):
+        r.set(f"status_log:CIV-{i}", json.dumps([{"to": "open"}, {"to": "resolved"}]))
+    r.rpush("status_history:CIV-0", json.dumps({"to": "closed"}))
+
+    # Several workers starting at once
+    threads = [threading.Thread(target=rc.migrate_status_logs) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    histories = rc.get_status_histories([f"CIV-{i}" for i in range(50)])
+    assert [e["to"] for e in histories["CIV-0"]] == ["open", "resolved", "closed"]
+    assert all(len(h) == 2 for cid, h in histories.items() if cid != "CIV-0")
+    assert r.keys("status_log:*") == []
+    assert rc.migrate_status_logs() == 0                 # marker set
+
+
+# ── Memory-store-only behaviour ───────────────────────────────────
+
+def test_allkeys_lru_eviction():
+    store = MemoryStore(max_memory_bytes=20_000, eviction_policy="allkeys-lru",
+                        expire_interval_s=0)
+    for i in range(100):
+        store.set(f"k{i}", "x" * 500)
+        store.get("k0")                      # keep k0 hot
+    info = store.info()
+    assert info["used_memory"] <= 20_000
+    assert info["evicted_keys"] > 0
+    assert store.get("k0") is not None       # recently used survives
+    assert store.get("k1") is None           # least recently used went first
+    assert store.get("k99") is not None
+
+
+def test_volatile_lru_only_evicts_keys_with_ttl():
+    store = MemoryStore(max_memory_bytes=20_000, eviction_policy="volatile-lru",
+                        expire_interval_s=0)
+    store.set("pinned", "x" * 500)
+    for i in range(100):
+        store.set(f"cache{i}", "x" * 500, ex=3600)
+    assert store.get("pinned") is not None
+    assert store.info()["used_memory"] <= 20_000
+
+
+def test_volatile_lru_refuses_writes_when_nothing_can_be_evicted():
+    store = MemoryStore(max_memory_bytes=5_000, expire_interval_s=0)   # volatile-lru
+    with pytest.raises(ResponseError, match="OOM"):
+        for i in range(100):
+            store.rpush("status_history:CIV-1", "x" * 500)
+    assert store.llen("status_history:CIV-1") > 0       # primary data kept
+
+
+def test_noeviction_rejects_writes_over_limit():
+    store = MemoryStore(max_memory_bytes=5_000, eviction_policy="noeviction")
+    with pytest.raises(ResponseError, match="OOM"):
+        for i in range(100):
+            store.set(f"k{i}", "x" * 500)
+    assert store.get("k0") is not None
+    store.delete(*store.keys())
+    assert store.set("again", "v") is True
+
+
+def test_memory_accounting_returns_to_zero():
+    store = MemoryStore()
+    store.rpush("l", "a", "b")
+    store.hset("h", mapping={"f": "v"})
+    store.sadd("s", "m")
+    store.zadd("z", {"m": 1})
+    store.set("s2", "v", ex=60)
+    assert store.info()["used_memory"] > 0
+    store.lpop("l", 2)
+    store.hdel("h", "f")
+    store.srem("s", "m")
+    store.zrem("z", "m")
+    store.delete("s2")
+    assert store.info()["used_memory"] == 0
@@ -0,0 +1,66 @@
+"""
+Unit-of-work tests: tools in one run see each other's writes, and the run
+commits all of them or none.
+
+Runs against the session's temporary database.
+
+    pytest tests/test_unit_of_work.py -q
+"""
+import pytest
+
+from core.database import ComplaintDB, SessionLocal, WorkOrderDB
+from core.sse_queue import sse_queue
+from core.unit_of_work import UnitOfWorkFailed, unit_of_work, write_session
+from tools.db_tools import get_complaint, save_complaint, save_work_order
+from tools.maps_tools import find_nearby_complaints
+from tools.sse_tools import sse_push_map_update
+
+LAT, LNG = 13.0604, 80.2496
+
+
+@pytest.fixture
+def cleanup(app_db):
+    yield
+    with SessionLocal() as db:
+        db.query(WorkOrderDB).filter(WorkOrderDB.email_body == "uow test").delete()
+        db.query(ComplaintDB).filter(ComplaintDB.description == "uow test").delete()
+        db.commit()
+
+
+@pytest.fixture
+def published(monkeypatch):
+    events = []
+    monkeypatch.setattr(sse_queue, "publish", events.append)
+    return events
+
+
+def test_reads_see_writes_of_the_same_run(cleanup, published):
+    with unit_of_work():
+        saved = save_complaint("pothole", "uow test", "Anna Salai", lat=LAT, lng=LNG)
+        cid = saved["complaint_id"]
+        nearby = find_nearby_complaints(LAT, LNG, radius_m=100, hours=1,
+                                        issue_type="pothole")
+        assert cid in [n["complaint_id"] for n in nearby]
+        assert get_complaint(cid)["id"] == cid
+        sse_push_map_update("new_pin", cid, lat=LAT, lng=LNG)
+        assert published == []          # not before the commit
+
+    assert [e["complaint_id"] for e in published] == [cid]
+    assert get_complaint(cid)["description"] == "uow test"
+
+
+def test_failed_write_rolls_back_the_whole_run(cleanup, published):
+    with pytest.raises(UnitOfWorkFailed):
+        with unit_of_work():
+            saved = save_complaint("pothole", "uow test", "Anna Salai", lat=LAT, lng=LNG)
+            save_work_order(saved["complaint_id"], "Roads", "roads@example.org",
+                            "Officer", "uow test")
+            sse_push_map_update("new_pin", saved["complaint_id"])
+            with pytest.raises(RuntimeError):
+                with write_session():
+                    raise RuntimeError("tool failed halfway")
+
+    assert published == []
+    with SessionLocal() as db:
+        assert db.get(ComplaintDB, saved["complaint_id"]) is None
+        assert db.query(WorkOrderDB).filter(WorkOrderDB.email_body == "uow test").count() == 0
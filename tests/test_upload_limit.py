@@ -0,0 +1,55 @@
+"""
+Upload size limit tests: oversized bodies are refused while streaming.
+
+Mounts core.upload_store.RequestBodyLimit on a small app with an
+UploadFile endpoint and checks that the endpoint never runs for a body
+over the limit, whether or not the client sends Content-Length.
+
+    pytest tests/test_upload_limit.py -q
+"""
+import pytest
+from fastapi import FastAPI, UploadFile
+from fastapi.testclient import TestClient
+
+from core.upload_store import RequestBodyLimit
+
+LIMIT = 64 * 1024
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/upload")
+    async def upload(image: UploadFile):
+        app.state.calls += 1
+        return {"size": len(await image.read())}
+
+    app.add_middleware(RequestBodyLimit, limits={"/upload": LIMIT})
+    with TestClient(app) as c:
+        yield c
+
+
+def test_small_upload_passes(client):
+    r = client.post("/upload", files={"image": ("a.jpg", b"x" * 1000)})
+    assert r.status_code == 200 and r.json() == {"size": 1000}
+
+
+def test_content_length_over_limit_is_refused(client):
+    r = client.post("/upload", files={"image": ("a.jpg", b"x" * (LIMIT + 1))})
+    assert r.status_code == 413 and "limit" in r.json()["error"]
+    assert client.app.state.calls == 0
+
+
+def test_chunked_body_over_limit_is_refused(client):
+    def chunks():
+        yield b"--b\r\nContent-Disposition: form-data; name=\"image\"; filename=\"a.jpg\"\r\n\r\n"
+        for _ in range(100):
+            yield b"x" * 4096
+        yield b"\r\n--b--\r\n"
+
+    r = client.post("/upload", content=chunks(),
+                    headers={"content-type": "multipart/form-data; boundary=b"})
+    assert r.status_code == 413
+    assert client.app.state.calls == 0
@@ -1,4 +1,9 @@
-from core.database import SessionLocal, ComplaintDB, ClusterDB, WorkOrderDB
+from core.database import (AsyncSessionLocal, ComplaintDB,
+                           ClusterDB, WorkOrderDB, DONE_STATUSES)
+from sqlalchemy import func
+from core.rollups import rollup_counts
+from core.archive import load_archived, aload_archived, archived_complaint
+from core.unit_of_work import write_session, read_session, get_pending
 from datetime import datetime, timedelta
 from typing import Optional
 import uuid
@@ -24,33 +29,139 @@ def save_complaint(
 ) -> dict:
     """Save new complaint to database."""
     logger.info("  → PortalPublisherAgent: saving complaint to database")
-    db = SessionLocal()
+    complaint_id = gen_id("CIV")
     try:
-        complaint = ComplaintDB(
-            id=gen_id("CIV"),
-            issue_type=issue_type,
-            description=description,
-            location_text=location_text,
-            lat=lat,
-            lng=lng,
-            ward=ward,
-            zone=zone,
-            severity=severity,
-            citizen_email=citizen_email,
-            image_url=image_url,
-            streetview_url=streetview_url
-        )
-        db.add(complaint)
-        db.commit()
-        db.refresh(complaint)
-        logger.info("     ✓ Complaint saved: %s", complaint.id)
-        return {"complaint_id": complaint.id, "status": "saved"}
+        with write_session() as db:
+            db.add(ComplaintDB(
+                id=complaint_id,
+                issue_type=issue_type,
+                description=description,
+                location_text=location_text,
+                lat=lat,
+                lng=lng,
+                ward=ward,
+                zone=zone,
+                severity=severity,
+                citizen_email=citizen_email,
+                image_url=image_url,
+                streetview_url=streetview_url
+            ))
+        logger.info("     ✓ Complaint saved: %s", complaint_id)
+        return {"complaint_id": complaint_id, "status": "saved"}
     except Exception as e:
-        db.rollback()
         logger.error("     ✗ Failed to save complaint: %s", str(e)[:100])
         return {"complaint_id": None, "status": "error", "error": str(e)}
-    finally:
-        db.close()
+
+async def asave_complaint_with_work_order(complaint: dict,
+                                          work_order: Optional[dict]) -> dict:
+    """Save a complaint and its pending work-order email in one transaction.
+
+    The work order lands in the outbox (status 'pending'); the background
+    dispatcher in core/outbox.py sends it.  ``complaint`` takes any
+    ComplaintDB fields plus an optional pre-generated 'id';
+    ``work_order`` takes department, dept_email, officer_name, subject,
+    email_body, cc_email and image_path.  Pass ``work_order=None`` to
+    save the complaint alone (e.g. a near-duplicate attached to an
+    existing work order).
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            rows = _complaint_rows(complaint, work_order)
+            result = _saved(rows)
+            db.add_all(rows)
+            await db.commit()
+            _log_saved(result, queued=len(rows) > 1)
+            return result
+        except Exception as e:
+            await db.rollback()
+            return _save_failed(e)
+
+def _complaint_rows(complaint: dict, work_order: Optional[dict]) -> list:
+    """ComplaintDB row (and its pending WorkOrderDB row, if any) to insert."""
+    complaint = dict(complaint)
+    complaint_id = complaint.pop("id", None) or gen_id("CIV")
+    if not work_order:
+        return [ComplaintDB(id=complaint_id, **complaint)]
+    wo = WorkOrderDB(
+        id=gen_id("WO"),
+        complaint_id=complaint_id,
+        status="pending",
+        sent_at=None,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+        **work_order
+    )
+    complaint.update(
+        work_order_id=wo.id,
+        department=work_order.get("department"),
+        dept_email=work_order.get("dept_email"),
+        officer_name=work_order.get("officer_name"),
+    )
+    return [ComplaintDB(id=complaint_id, **complaint), wo]
+
+def _saved(rows: list) -> dict:
+    return {"complaint_id": rows[0].id, "work_order_id": rows[0].work_order_id,
+            "status": "saved"}
+
+def _log_saved(result: dict, queued: bool) -> None:
+    logger.info("     ✓ Complaint saved: %s%s", result["complaint_id"],
+                f" (work order {result['work_order_id']} queued)" if queued else "")
+
+def _save_failed(e: Exception) -> dict:
+    logger.error("     ✗ Failed to save complaint: %s", str(e)[:100])
+    return {"complaint_id": None, "work_order_id": None,
+            "status": "error", "error": str(e)}
+
+def get_complaint(complaint_id: str) -> dict:
+    """Fetch a single complaint by ID."""
+    try:
+        with read_session() as db:
+            c = db.query(ComplaintDB).filter(ComplaintDB.id == complaint_id).first()
+            if c:
+                return _complaint_dict(c)
+        return _archived_dict(complaint_id, load_archived(complaint_id))
+    except Exception as e:
+        return {"error": str(e)}
+
+async def aget_complaint(complaint_id: str) -> dict:
+    """Async variant of get_complaint (API endpoints)."""
+    async with AsyncSessionLocal() as db:
+        try:
+            c = await db.get(ComplaintDB, complaint_id)
+            if c:
+                return _complaint_dict(c)
+            return _archived_dict(complaint_id, await aload_archived(complaint_id))
+        except Exception as e:
+            return {"error": str(e)}
+
+def _archived_dict(complaint_id: str, payload: Optional[dict]) -> dict:
+    """Read-through to complaint_archive for ids no longer in complaints."""
+    if payload is None:
+        return {"error": f"Complaint {complaint_id} not found"}
+    return {**_complaint_dict(archived_complaint(payload)), "archived": True}
+
+def _complaint_dict(c: ComplaintDB) -> dict:
+    return {
+        "id":            c.id,
+        "issue_type":    c.issue_type,
+        "description":   c.description,
+        "location_text": c.location_text,
+        "lat":           c.lat,
+        "lng":           c.lng,
+        "ward":          c.ward,
+        "zone":          c.zone,
+        "severity":      c.severity,
+        "status":        c.status or "open",
+        "priority":      c.priority or "P3",
+        "image_url":     c.image_url,
+        "department":    c.department,
+        "officer_name":  c.officer_name,
+        "dept_email":    c.dept_email,
+        "work_order_id": c.work_order_id,
+        "duplicate_of":  c.duplicate_of,
+        "submitted_at":  str(c.submitted_at),
+        "resolved_at":   str(c.resolved_at) if c.resolved_at else None,
+    }
 
 def update_complaint_status(
     complaint_id: str,
@@ -63,29 +174,24 @@ def update_complaint_status(
     officer_name: Optional[str] = None
 ) -> dict:
     """Update complaint status and related fields."""
-    db = SessionLocal()
     try:
-        c = db.query(ComplaintDB).filter(
-            ComplaintDB.id == complaint_id
-        ).first()
-        if not c:
-            return {"error": f"Complaint {complaint_id} not found"}
-        c.status = status  # type: ignore[assignment]
-        if priority:      c.priority = priority  # type: ignore[assignment]
-        if work_order_id: c.work_order_id = work_order_id  # type: ignore[assignment]
-        if prediction:    c.prediction = prediction  # type: ignore[assignment]
-        if department:    c.department = department  # type: ignore[assignment]
-        if dept_email:    c.dept_email = dept_email  # type: ignore[assignment]
-        if officer_name:  c.officer_name = officer_name  # type: ignore[assignment]
-        if status == "resolved":
-            c.resolved_at = datetime.utcnow()  # type: ignore[assignment]
-        db.commit()
+        with write_session() as db:
+            c = get_pending(db, ComplaintDB, complaint_id)
+            if not c:
+                return {"error": f"Complaint {complaint_id} not found"}
+            entering_done = status in DONE_STATUSES and c.status not in DONE_STATUSES
+            c.status = status  # type: ignore[assignment]
+            if priority:      c.priority = priority  # type: ignore[assignment]
+            if work_order_id: c.work_order_id = work_order_id  # type: ignore[assignment]
+            if prediction:    c.prediction = prediction  # type: ignore[assignment]
+            if department:    c.department = department  # type: ignore[assignment]
+            if dept_email:    c.dept_email = dept_email  # type: ignore[assignment]
+            if officer_name:  c.officer_name = officer_name  # type: ignore[assignment]
+            if entering_done:
+                c.resolved_at = datetime.utcnow()  # type: ignore[assignment]
         return {"complaint_id": complaint_id, "status": status}
     except Exception as e:
-        db.rollback()
         return {"error": str(e)}
-    finally:
-        db.close()
 
 def query_complaints_by_filter(
     status: Optional[str] = None,
@@ -94,34 +200,32 @@ def query_complaints_by_filter(
     days: int = 7
 ) -> list:
     """Query complaints with optional filters."""
-    db = SessionLocal()
     try:
-        q = db.query(ComplaintDB)
-        since = datetime.utcnow() - timedelta(days=days)
-        q = q.filter(ComplaintDB.submitted_at >= since)
-        if status:     q = q.filter(ComplaintDB.status == status)
-        if priority:   q = q.filter(ComplaintDB.priority == priority)
-        if issue_type: q = q.filter(ComplaintDB.issue_type == issue_type)
-        results = q.order_by(ComplaintDB.submitted_at.desc()).all()
-        return [
-            {
-                "id":           c.id,
-                "type":         c.issue_type,
-                "location":     c.location_text or "",
-                "status":       c.status or "open",
-                "priority":     c.priority or "P3",
-                "lat":          c.lat,
-                "lng":          c.lng,
-                "severity":     c.severity or "moderate",
-                "image_url":    c.image_url,
-                "submitted_at": str(c.submitted_at)
-            }
-            for c in results
-        ]
+        with read_session() as db:
+            q = db.query(ComplaintDB)
+            since = datetime.utcnow() - timedelta(days=days)
+            q = q.filter(ComplaintDB.submitted_at >= since)
+            if status:     q = q.filter(ComplaintDB.status == status)
+            if priority:   q = q.filter(ComplaintDB.priority == priority)
+            if issue_type: q = q.filter(ComplaintDB.issue_type == issue_type)
+            results = q.order_by(ComplaintDB.submitted_at.desc()).all()
+            return [
+                {
+                    "id":           c.id,
+                    "type":         c.issue_type,
+                    "location":     c.location_text or "",
+                    "status":       c.status or "open",
+                    "priority":     c.priority or "P3",
+                    "lat":          c.lat,
+                    "lng":          c.lng,
+                    "severity":     c.severity or "moderate",
+                    "image_url":    c.image_url,
+                    "submitted_at": str(c.submitted_at)
+                }
+                for c in results
+            ]
     except Exception as e:
         return [{"error": str(e)}]
-    finally:
-        db.close()
 
 def save_cluster(
     issue_type: str,
@@ -133,54 +237,47 @@ def save_cluster(
     location_text: str
 ) -> dict:
     """Save a new geo-cluster to database."""
-    db = SessionLocal()
+    cluster_id = gen_id("CLU")
     try:
-        cluster = ClusterDB(
-            id=gen_id("CLU"),
-            issue_type=issue_type,
-            center_lat=center_lat,
-            center_lng=center_lng,
-            radius_m=radius_m,
-            size=size,
-            score=score,
-            priority="pending",
-            location_text=location_text
-        )
-        db.add(cluster)
-        db.commit()
-        db.refresh(cluster)
-        return {"cluster_id": cluster.id, "score": score, "size": size}
+        with write_session() as db:
+            db.add(ClusterDB(
+                id=cluster_id,
+                issue_type=issue_type,
+                center_lat=center_lat,
+                center_lng=center_lng,
+                radius_m=radius_m,
+                size=size,
+                score=score,
+                priority="pending",
+                location_text=location_text
+            ))
+        return {"cluster_id": cluster_id, "score": score, "size": size}
     except Exception as e:
-        db.rollback()
         return {"cluster_id": None, "error": str(e)}
-    finally:
-        db.close()
 
 def fetch_historical_clusters(
     issue_type: str,
     min_size: int = 3
 ) -> list:
     """Fetch past clusters of same type for prediction context."""
-    db = SessionLocal()
     try:
-        clusters = db.query(ClusterDB).filter(
-            ClusterDB.issue_type == issue_type,
-            ClusterDB.size >= min_size
-        ).order_by(ClusterDB.created_at.desc()).limit(10).all()
-        return [
-            {
-                "id":       c.id,
-                "size":     c.size,
-                "score":    c.score,
-                "priority": c.priority or "P3",
-                "location": c.location_text or ""
-            }
-            for c in clusters
-        ]
+        with read_session() as db:
+            clusters = db.query(ClusterDB).filter(
+                ClusterDB.issue_type == issue_type,
+                ClusterDB.size >= min_size
+            ).order_by(ClusterDB.created_at.desc()).limit(10).all()
+            return [
+                {
+                    "id":       c.id,
+                    "size":     c.size,
+                    "score":    c.score,
+                    "priority": c.priority or "P3",
+                    "location": c.location_text or ""
+                }
+                for c in clusters
+            ]
     except Exception as e:
         return [{"error": str(e)}]
-    finally:
-        db.close()
 
 def save_work_order(
     complaint_id: str,
@@ -191,46 +288,83 @@ def save_work_order(
     cluster_id: Optional[str] = None
 ) -> dict:
     """Save dispatched work order to database."""
-    db = SessionLocal()
+    work_order_id = gen_id("WO")
     try:
-        wo = WorkOrderDB(
-            id=gen_id("WO"),
-            complaint_id=complaint_id,
-            cluster_id=cluster_id,
-            department=department,
-            dept_email=dept_email,
-            officer_name=officer_name,
-            email_body=email_body
-        )
-        db.add(wo)
-        db.commit()
-        db.refresh(wo)
-        return {"work_order_id": wo.id, "status": "saved"}
+        with write_session() as db:
+            db.add(WorkOrderDB(
+                id=work_order_id,
+                complaint_id=complaint_id,
+                cluster_id=cluster_id,
+                department=department,
+                dept_email=dept_email,
+                officer_name=officer_name,
+                email_body=email_body
+            ))
+        return {"work_order_id": work_order_id, "status": "saved"}
     except Exception as e:
-        db.rollback()
         return {"work_order_id": None, "error": str(e)}
-    finally:
-        db.close()
 
-def get_trend_data(group_by: str = "zone", days: int = 7) -> list:
-    """Get complaint trend data grouped by zone or type."""
-    db = SessionLocal()
+# Dimensions get_trend_data may group by, and strftime formats for its
+# time buckets (SQLite's %W week starts on Monday).
+TREND_DIMENSIONS = {
+    "zone":       ComplaintDB.zone,
+    "ward":       ComplaintDB.ward,
+    "issue_type": ComplaintDB.issue_type,
+    "status":     ComplaintDB.status,
+    "priority":   ComplaintDB.priority,
+    "severity":   ComplaintDB.severity,
+}
+TREND_BUCKETS = {
+    "hour": "%Y-%m-%d %H:00",
+    "day":  "%Y-%m-%d",
+    "week": "%Y-W%W",
+}
+
+def get_trend_data(group_by: str = "zone", days: int = 7,
+                   bucket: Optional[str] = None) -> list:
+    """Get complaint counts grouped by one or more dimensions.
+
+    group_by: comma-separated dimensions from zone, ward, issue_type,
+              status, priority, severity (e.g. "zone,issue_type").
+    bucket:   optional time bucket — "hour", "day" or "week".
+
+    Each row has "group" (the dimension values joined with " / "),
+    "count", one key per dimension, and "bucket" when bucketing.
+    Rows are ordered by bucket, then count descending.
+
+    Day/week/no bucket read the daily rollups (core/rollups.py), so the
+    window covers whole days; hourly buckets scan complaints.
+    """
+    dimensions = [d.strip() for d in group_by.split(",") if d.strip()]
+    unknown = [d for d in dimensions if d not in TREND_DIMENSIONS]
+    if not dimensions or unknown:
+        return [{"error": f"group_by must be from {', '.join(TREND_DIMENSIONS)}"}]
+    if bucket and bucket not in TREND_BUCKETS:
+        return [{"error": f"bucket must be one of {', '.join(TREND_BUCKETS)}"}]
+
     try:
-        since = datetime.utcnow() - timedelta(days=days)
-        complaints = db.query(ComplaintDB).filter(
-            ComplaintDB.submitted_at >= since
-        ).all()
-
-        from collections import defaultdict
-        groups: dict = defaultdict(int)
-        for c in complaints:
-            key = getattr(c, group_by, "unknown") or "unknown"
-            groups[str(key)] += 1
-
-        return [{"group": k, "count": v}
-                for k, v in sorted(groups.items(),
-                                   key=lambda x: x[1], reverse=True)]
+        if bucket == "hour":
+            rows = _trend_from_complaints(dimensions, days, bucket)
+        else:
+            rows = rollup_counts(dimensions, days=days, bucket=bucket)
+        return [{
+            "group": " / ".join(str(row[d]) for d in dimensions),
+            "count": row["count"],
+            **({"bucket": row["bucket"]} if bucket else {}),
+            **{d: row[d] for d in dimensions},
+        } for row in rows]
     except Exception as e:
         return [{"error": str(e)}]
-    finally:
-        db.close()
+
+def _trend_from_complaints(dimensions: list, days: int, bucket: str) -> list:
+    columns = [func.coalesce(TREND_DIMENSIONS[d], "unknown").label(d)
+               for d in dimensions]
+    columns.insert(0, func.strftime(TREND_BUCKETS[bucket],
+                                    ComplaintDB.submitted_at).label("bucket"))
+    count = func.count().label("count")
+
+    with read_session() as db:
+        since = datetime.utcnow() - timedelta(days=days)
+        q = db.query(*columns, count).filter(ComplaintDB.submitted_at >= since)
+        q = q.group_by(*columns).order_by(columns[0], count.desc())
+        return [dict(row._mapping) for row in q.all()]
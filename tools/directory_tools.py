@@ -1,5 +1,4 @@
-from core.redis_client import redis_client, get_municipality
-import json
+from core.directory import directory
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,58 +16,40 @@ ISSUE_CATEGORY_MAP = {
     "other":               "roads",
 }
 
+_FALLBACK_OFFICER = {
+    "email": "complaints@chennaicorporation.gov.in",
+    "officer_name": "Duty Officer",
+    "department": "Greater Chennai Corporation",
+    "depot_address": "Ripon Building, Chennai",
+    "municipality": "Greater Chennai Corporation",
+}
+
 def search_municipal_directory(ward: str, issue_type: str,
-                                municipality: str | None = None) -> dict:
-    """Find responsible officer and email from Redis.
+                                municipality: str | None = None,
+                                zone: str | None = None) -> dict:
+    """Find responsible officer and email in the municipal directory.
 
-    Lookup priority:
+    Served from the in-process index (core/directory.py), refreshed
+    whenever the directory in Redis changes.  Lookup priority:
       1. municipality key (e.g. 'avadi') + category
-      2. ward key + category
-      3. wildcard scan for category
-      4. hardcoded fallback
+      2. ward key or alias (ward name, area) + category
+      3. any officer for the category in the same zone
+      4. any officer for the category
+      5. hardcoded fallback
     """
     category = ISSUE_CATEGORY_MAP.get(issue_type, "roads")
 
     logger.info("  → DirectoryAgent: searching for %s officer", issue_type)
-    logger.info("    municipality=%s  ward=%s  category=%s",
-                municipality, ward, category)
-
-    result = None
-
-    # 1️⃣ Try municipality key first (from reverse_geocode match)
-    if municipality:
-        result = get_municipality(municipality, category)
-        if result:
-            logger.info("     ✓ Matched by municipality key '%s:%s'",
-                        municipality, category)
-
-    # 2️⃣ Fall back to ward key
-    if not result:
-        result = get_municipality(ward, category)
-        if result:
-            logger.info("     ✓ Matched by ward key '%s:%s'", ward, category)
-
-    # 3️⃣ Wildcard scan
-    if not result:
-        keys = redis_client.keys(f"municipality:*:{category}")
-        if keys:
-            val = redis_client.get(keys[0])
-            if val:
-                result = json.loads(val)
-                logger.info("     ✓ Wildcard match: %s", keys[0])
+    logger.info("    municipality=%s  ward=%s  zone=%s  category=%s",
+                municipality, ward, zone, category)
 
-    # 4️⃣ Hardcoded fallback
-    if not result:
+    result, matched = directory.index.lookup(category, ward=ward,
+                                             municipality=municipality, zone=zone)
+    if result is None:
         logger.info("     ⚠ Using fallback: Duty Officer")
-        return {
-            "email": "complaints@chennaicorporation.gov.in",
-            "officer_name": "Duty Officer",
-            "department": "Greater Chennai Corporation",
-            "depot_address": "Ripon Building, Chennai",
-            "municipality": "Greater Chennai Corporation",
-        }
+        return dict(_FALLBACK_OFFICER)
 
-    logger.info("     ✓ Found: %s — %s <%s>",
+    logger.info("     ✓ Found (%s match): %s — %s <%s>", matched,
                 result.get('municipality'), result.get('officer_name'),
                 result.get('email'))
-    return result
+    return dict(result)
@@ -2,8 +2,14 @@ from google import genai
 from google.genai import types
 from typing import Optional
 from core.config import settings
+from core.cache import TieredCache
+from core.imaging import detect_mime
+from core.redis_client import redis_client
+import hashlib
 import json
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -12,14 +18,54 @@ client = genai.Client(api_key=settings.GEMINI_API_KEY)
 FLASH  = "gemini-2.5-flash"
 FLASH25 = "gemini-2.5-flash"
 
+# Bump whenever the analysis prompt or model changes so cached results
+# produced by the old prompt are no longer served.
+ANALYZE_PROMPT_VERSION = "v1"
 
-def gemini_analyze_image(image_path: str, location: str) -> dict:
-    """Analyze complaint photo using Gemini vision to identify civic issue."""
+# Image analysis results keyed on image content hash + prompt version.
+# Degraded fallbacks (confidence 0) are never cached.
+analysis_cache = TieredCache("gemini_analysis",
+                             maxsize=settings.GEMINI_CACHE_MAX_ENTRIES,
+                             ttl_s=settings.GEMINI_CACHE_TTL_S,
+                             shared=redis_client)
+_analysis_calls = {"count": 0, "total_ms": 0.0}
+_analysis_calls_lock = threading.Lock()     # updated from the gemini pool
+
+
+def analysis_cache_stats() -> dict:
+    """Cache counters plus the Gemini latency the cache has saved."""
+    stats = analysis_cache.stats()
+    with _analysis_calls_lock:
+        calls, total_ms = _analysis_calls["count"], _analysis_calls["total_ms"]
+    avg_ms = total_ms / calls if calls else 0.0
+    hits = stats["local_hits"] + stats["shared_hits"]
+    stats["gemini_calls"] = calls
+    stats["avg_call_ms"] = round(avg_ms, 1)
+    stats["calls_saved"] = hits
+    stats["est_latency_saved_ms"] = round(hits * avg_ms, 1)
+    return stats
+
+
+def gemini_analyze_image(image_path: str, location: str,
+                         mime_type: Optional[str] = None) -> dict:
+    """Analyze complaint photo using Gemini vision to identify civic issue.
+
+    Pass the preprocessed analysis variant (core/imaging.py) rather than
+    the raw upload; ``mime_type`` is detected from the content if omitted.
+    """
     logger.info("  → ImageAnalysisAgent: calling gemini_analyze_image")
     logger.info("     Image: %s | Location: %s", image_path, location)
     
     with open(image_path, "rb") as f:
         image_bytes = f.read()
+    mime_type = mime_type or detect_mime(image_bytes, image_path)
+
+    cache_key = f"{ANALYZE_PROMPT_VERSION}:{hashlib.sha256(image_bytes).hexdigest()}"
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        logger.info("     ✓ Image analysis cache hit: %s (%s severity)",
+                    cached.get('issue_type'), cached.get('severity'))
+        return dict(cached)
 
     prompt = f"""
     A citizen from {location} uploaded this photo as a civic complaint.
@@ -35,13 +81,14 @@ def gemini_analyze_image(image_path: str, location: str) -> dict:
     """
     try:
         logger.info("     Calling Gemini Vision API...")
+        started = time.perf_counter()
         response = client.models.generate_content(
             model=FLASH,
             contents=[
                 types.Part.from_text(text=prompt),
                 types.Part.from_bytes(
                     data=image_bytes,
-                    mime_type="image/jpeg"
+                    mime_type=mime_type
                 )
             ]
         )
@@ -50,10 +97,16 @@ def gemini_analyze_image(image_path: str, location: str) -> dict:
             logger.warning("     ✗ Gemini returned empty response")
             return {"issue_type": "other", "severity": "moderate",
                     "description": "Empty Gemini response", "confidence": 0}
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with _analysis_calls_lock:
+            _analysis_calls["count"] += 1
+            _analysis_calls["total_ms"] += elapsed_ms
         cleaned = text.strip().strip("```json").strip("```").strip()
         result = json.loads(cleaned)
         logger.info("     ✓ Image analysis complete: %s (%s severity)", 
                     result.get('issue_type'), result.get('severity'))
+        if isinstance(result, dict) and result.get("confidence"):
+            analysis_cache.set(cache_key, result)
         return result
     except json.JSONDecodeError as e:
         logger.warning("     ✗ Failed to parse Gemini response as JSON")
@@ -2,56 +2,74 @@
 Geocoding & location tools — powered by OpenStreetMap Nominatim (free, no key).
 Google Maps is NOT used.
 """
-from core.database import SessionLocal, ComplaintDB
+from core.database import ComplaintDB
+from core.unit_of_work import read_session
 from core.redis_client import _MUNICIPALITIES
+from core.geocode_cache import geocode_cache, forward_key, reverse_key
 from datetime import datetime, timedelta
+from core.outbound import outbound
+from core.geo import (bounding_box, geohash_encode, geohash_neighbors,
+                      haversine_m, precision_for_radius)
+from sqlalchemy import and_, or_
+from typing import Optional
 import math
 import logging
-import requests
 
 logger = logging.getLogger(__name__)
 
 # ── Nominatim (OpenStreetMap) — FREE, no API key ─────────────────
 NOMINATIM_URL = "https://nominatim.openstreetmap.org"
-NOMINATIM_HEADERS = {"User-Agent": "CiviqAI/1.0 (civic-complaint-platform)"}
 
 
 # ──────────────────────────────────────────────────────────────────
 #  Core Nominatim helpers
 # ──────────────────────────────────────────────────────────────────
+def _fetch_geocode(address: str) -> dict | None:
+    data = outbound.get_json(f"{NOMINATIM_URL}/search", params={
+        "q": address, "format": "json", "limit": 1,
+        "addressdetails": 1, "countrycodes": "in"
+    })
+    if data:
+        hit = data[0]
+        return {
+            "lat": float(hit["lat"]),
+            "lng": float(hit["lon"]),
+            "display_name": hit.get("display_name", ""),
+            "address": hit.get("address", {})
+        }
+    return None
+
+
+def _fetch_reverse(lat: float, lng: float) -> dict | None:
+    data = outbound.get_json(f"{NOMINATIM_URL}/reverse", params={
+        "lat": lat, "lon": lng, "format": "json", "addressdetails": 1
+    })
+    if "address" in data:
+        return {
+            "display_name": data.get("display_name", ""),
+            "address": data["address"]
+        }
+    return None
+
+
 def _nominatim_geocode(address: str) -> dict | None:
-    """Forward-geocode via OpenStreetMap Nominatim (free)."""
+    """Forward-geocode via OpenStreetMap Nominatim (free), cached by address."""
     try:
-        r = requests.get(f"{NOMINATIM_URL}/search", params={
-            "q": address, "format": "json", "limit": 1,
-            "addressdetails": 1, "countrycodes": "in"
-        }, headers=NOMINATIM_HEADERS, timeout=5)
-        data = r.json()
-        if data:
-            hit = data[0]
-            return {
-                "lat": float(hit["lat"]),
-                "lng": float(hit["lon"]),
-                "display_name": hit.get("display_name", ""),
-                "address": hit.get("address", {})
-            }
+        return geocode_cache.get_or_fetch(forward_key(address),
+                                          lambda: _fetch_geocode(address))
     except Exception as e:
         logger.warning("     ⚠ Nominatim geocode error: %s", str(e)[:60])
     return None
 
 
 def _nominatim_reverse(lat: float, lng: float) -> dict | None:
-    """Reverse-geocode via OpenStreetMap Nominatim (free)."""
+    """Reverse-geocode via OpenStreetMap Nominatim (free), cached per geohash cell.
+
+    Points in the same cell share one answer, so the query is made for
+    the first point seen in that cell."""
     try:
-        r = requests.get(f"{NOMINATIM_URL}/reverse", params={
-            "lat": lat, "lon": lng, "format": "json", "addressdetails": 1
-        }, headers=NOMINATIM_HEADERS, timeout=5)
-        data = r.json()
-        if "address" in data:
-            return {
-                "display_name": data.get("display_name", ""),
-                "address": data["address"]
-            }
+        return geocode_cache.get_or_fetch(reverse_key(lat, lng),
+                                          lambda: _fetch_reverse(lat, lng))
     except Exception as e:
         logger.warning("     ⚠ Nominatim reverse error: %s", str(e)[:60])
     return None
@@ -156,29 +174,41 @@ def reverse_geocode(lat: float, lng: float) -> dict:
 # ──────────────────────────────────────────────────────────────────
 def find_nearby_complaints(lat: float, lng: float,
                             radius_m: int, hours: int,
-                            issue_type: str) -> list:
-    """Find complaints of same type near this location within time window.
-    Uses Haversine-approximation (no external API)."""
-    db = SessionLocal()
+                            issue_type: str,
+                            limit: Optional[int] = None) -> list:
+    """Find complaints of same type near this location within time window,
+    nearest first (no external API).
+
+    The geohash index narrows the search to the 3×3 block of cells around
+    the point (by prefix) and a lat/lng bounding box; only those rows are
+    loaded and checked with exact haversine distance."""
+    precision = precision_for_radius(radius_m, lat)
+    cells = geohash_neighbors(geohash_encode(lat, lng, precision))
+    min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius_m)
     since = datetime.utcnow() - timedelta(hours=hours)
-    complaints = db.query(ComplaintDB).filter(
-        ComplaintDB.issue_type == issue_type,
-        ComplaintDB.submitted_at >= since
-    ).all()
-    db.close()
 
+    with read_session() as db:
+        rows = db.query(ComplaintDB.id, ComplaintDB.lat, ComplaintDB.lng,
+                        ComplaintDB.severity).filter(
+            ComplaintDB.issue_type == issue_type,
+            or_(*[and_(ComplaintDB.geohash >= cell, ComplaintDB.geohash < cell + "~")
+                  for cell in cells]),
+            ComplaintDB.submitted_at >= since,
+            ComplaintDB.lat.between(min_lat, max_lat),
+            ComplaintDB.lng.between(min_lng, max_lng),
+        ).all()
     nearby = []
-    for c in complaints:
-        if c.lat and c.lng:
-            meters = int(math.sqrt((lat - c.lat)**2 + (lng - c.lng)**2) * 111_000)
-            if meters <= radius_m:
-                nearby.append({
-                    "complaint_id": c.id,
-                    "lat": c.lat, "lng": c.lng,
-                    "severity": c.severity,
-                    "distance_m": meters
-                })
-    return nearby
+    for cid, c_lat, c_lng, severity in rows:
+        meters = haversine_m(lat, lng, c_lat, c_lng)
+        if meters <= radius_m:
+            nearby.append({
+                "complaint_id": cid,
+                "lat": c_lat, "lng": c_lng,
+                "severity": severity,
+                "distance_m": int(meters)
+            })
+    nearby.sort(key=lambda n: n["distance_m"])
+    return nearby[:limit] if limit else nearby
 
 
 # ──────────────────────────────────────────────────────────────────
@@ -196,12 +226,10 @@ def get_route_to_site(depot_address: str,
             raise ValueError("could not geocode depot")
         d_lat, d_lng = depot["lat"], depot["lng"]
 
-        r = requests.get(
+        data = outbound.get_json(
             f"{OSRM_URL}/{d_lng},{d_lat};{site_lng},{site_lat}",
-            params={"overview": "false", "steps": "false"},
-            headers=NOMINATIM_HEADERS, timeout=5
+            params={"overview": "false", "steps": "false"}
         )
-        data = r.json()
         if data.get("code") == "Ok" and data.get("routes"):
             route = data["routes"][0]
             dur_min = round(route["duration"] / 60)
@@ -242,9 +270,9 @@ def get_affected_households(lat: float, lng: float, radius_m: int) -> dict:
          way["building"](around:{radius_m},{lat},{lng}););
         out count;
         """
-        r = requests.post("https://overpass-api.de/api/interpreter",
-                          data={"data": query}, timeout=8)
-        count = r.json().get("elements", [{}])[0].get("tags", {}).get("total", 0)
+        data = outbound.post_json("https://overpass-api.de/api/interpreter",
+                                  data={"data": query}, timeout=8)
+        count = data.get("elements", [{}])[0].get("tags", {}).get("total", 0)
         count = int(count) if count else 0
         return {"estimated_households": count * 3, "buildings_found": count}
     except Exception:
@@ -1,4 +1,5 @@
 from core.sse_queue import sse_queue
+from core.unit_of_work import on_commit
 from datetime import datetime
 from typing import Optional
 import json
@@ -9,7 +10,10 @@ def sse_push_map_update(event_type: str, complaint_id: str,
                          issue_type: Optional[str] = None,
                          cluster_size: Optional[int] = None,
                          prediction_json: Optional[str] = None) -> dict:
-    """Push real-time map update to all connected dashboard clients."""
+    """Push real-time map update to all connected dashboard clients.
+
+    Inside a unit of work the push waits for its commit, so clients that
+    refetch on the event find the row."""
     prediction = None
     if prediction_json:
         try:
@@ -28,5 +32,5 @@ def sse_push_map_update(event_type: str, complaint_id: str,
         "prediction": prediction,
         "timestamp": datetime.utcnow().isoformat()
     }
-    sse_queue.publish(event)
+    on_commit(lambda: sse_queue.publish(event))
     return {"published": True, "event_type": event_type}